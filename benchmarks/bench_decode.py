@@ -0,0 +1,141 @@
+"""Micro-benchmark: SearchVehicleAds response decoding, legacy path vs scraper.decoding.
+
+Run with:
+  python -m benchmarks.bench_decode [--responses DIR] [--number N]
+
+DIR holds captured response bodies (``*.json``, optionally ``*.json.gz`` /
+``*.json.br`` / ``*.json.zst``). Without it, a response is synthesized from
+``public/data/vehicles.json`` so the numbers reflect realistic ad payloads.
+
+For every body and Content-Encoding it times:
+- legacy: what the old _decode_json did once the transport had decoded the
+  body (failed second decompress -> ``resp.text`` -> ``json.loads``)
+- new/<backend>: decoding.decode_json on the transport-decoded body, for
+  each installed JSON backend
+- new-raw/<backend>: decoding.decode_json on still-compressed bytes (the
+  path taken when the transport does not know the coding, e.g. zstd)
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import timeit
+
+import brotli
+
+from scraper import decoding
+
+VEHICLE_KEYS = [
+    "id", "model", "year", "partner_location", "retail_price", "dealer_price", "mileage",
+    "first_time_registration", "vin", "stock_images", "exterior", "interior", "wheels",
+    "motor", "edition", "performance", "pilot", "plus", "state", "available",
+    "first_seen_at", "last_seen_at", "previous_price", "price_delta",
+]  # fmt: skip
+
+
+def synthesize_response(path: str = os.path.join("public", "data", "vehicles.json")) -> bytes:
+    """Rebuild a SearchVehicleAds response body from the exported vehicles file."""
+    with open(path, encoding="utf-8") as f:
+        rows = json.load(f)["vehicles"]
+    ads = []
+    for row in rows:
+        v = dict(zip(VEHICLE_KEYS, row)) if isinstance(row, list) else row
+        ads.append(
+            {
+                "id": v["id"],
+                "firstTimeRegistration": v.get("first_time_registration"),
+                "price": {
+                    "retail": v.get("retail_price"),
+                    "dealer": v.get("dealer_price"),
+                    "currency": "USD",
+                },
+                "partnerLocation": {"city": None, "name": v.get("partner_location")},
+                "mileageInfo": {"distance": v.get("mileage"), "metric": "Miles"},
+                "vehicleDetails": {
+                    "vin": v.get("vin"),
+                    "modelDetails": {"displayName": v.get("model"), "modelYear": v.get("year")},
+                    "stockImages": v.get("stock_images") or [],
+                    "cycleState": v.get("state"),
+                },
+            }
+        )
+    meta = {"limit": len(ads), "offset": 0, "resultCount": len(ads), "totalCount": len(ads)}
+    doc = {"data": {"searchVehicleAds": {"metadata": meta, "vehicleAds": ads}}}
+    return json.dumps(doc).encode("utf-8")
+
+
+def load_responses(directory: str | None) -> dict[str, bytes]:
+    if not directory:
+        return {"synthetic": synthesize_response()}
+    out = {}
+    inverse = {".gz": gzip.decompress, ".br": brotli.decompress}
+    if "zstd" in decoding.DECOMPRESSORS:
+        inverse[".zst"] = decoding.DECOMPRESSORS["zstd"]
+    for path in sorted(glob.glob(os.path.join(directory, "*.json*"))):
+        with open(path, "rb") as f:
+            body = f.read()
+        ext = os.path.splitext(path)[1]
+        out[os.path.basename(path)] = inverse[ext](body) if ext in inverse else body
+    return out
+
+
+def _compressors() -> dict[str, object]:
+    comps = {"identity": lambda b: b, "gzip": gzip.compress, "br": brotli.compress}
+    try:
+        import zstandard  # type: ignore
+
+        comps["zstd"] = zstandard.ZstdCompressor().compress
+    except ImportError:
+        pass
+    return comps
+
+
+def _legacy(plain: bytes, enc: str):
+    # Old _decode_json with a transport-decoded body: decompress attempt fails,
+    # falls back to resp.text, then parses the str.
+    if enc in ("br", "gzip"):
+        try:
+            text = (brotli.decompress if enc == "br" else gzip.decompress)(plain).decode("utf-8")
+        except Exception:
+            text = plain.decode("utf-8")
+    else:
+        text = plain.decode("utf-8")
+    return json.loads(text)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--responses", help="directory of captured response bodies")
+    ap.add_argument("--number", type=int, default=200, help="iterations per measurement")
+    args = ap.parse_args()
+
+    backends = {}
+    for name in ("json", "orjson", "msgspec"):
+        try:
+            backends[name] = decoding.get_loads(name)
+        except ImportError:
+            pass
+
+    print(f"{'body':<24}{'encoding':<10}{'path':<22}{'us/op':>10}")
+    for name, plain in load_responses(args.responses).items():
+        for enc, compress in _compressors().items():
+            wire = compress(plain)
+            timings = {"legacy": timeit.timeit(lambda: _legacy(plain, enc), number=args.number)}
+            for bname, loads in backends.items():
+                timings[f"new/{bname}"] = timeit.timeit(
+                    lambda: decoding.decode_json(plain, enc, parse=loads), number=args.number
+                )
+                if enc != "identity":
+                    timings[f"new-raw/{bname}"] = timeit.timeit(
+                        lambda: decoding.decode_json(wire, enc, parse=loads), number=args.number
+                    )
+            for path, secs in timings.items():
+                print(f"{name[:23]:<24}{enc:<10}{path:<22}{secs / args.number * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Micro-benchmarks for the scraper and loader hot paths (pytest-benchmark).
+
+Fixtures are fixed: a seeded SyntheticInventory page (loadtest/synthetic.py)
+for the scraper side and rows derived from it for the loader side, so numbers
+are comparable between runs and machines only differ by hardware.
+
+Covered:
+- code_parser: extract_option_codes (cold and warm cache), classify_codes,
+  enrich_labels
+- scraper: _normalize_vehicle, _decode_json for gzip / br / identity bodies
+- daily_refresh: _normalize_for_db, _split_changes, _export_body
+
+The file is not collected by the regular test run (python_files is test_*.py).
+benchmarks/run_hotpaths.py runs it with the regression gate:
+
+  pip install -e ".[bench]"
+  # record a baseline (.benchmarks/<machine>/0001_*.json)
+  python -m benchmarks.run_hotpaths --save
+  # compare against the latest saved run; a median regression over 20% fails
+  python -m benchmarks.run_hotpaths
+  # plain JSON results, e.g. for CI artifacts
+  python -m benchmarks.run_hotpaths --benchmark-json=bench.json
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import gzip
+import json
+import random
+from decimal import Decimal
+
+import brotli
+import pytest
+
+from benchmarks.bench_decode import VEHICLE_KEYS
+from jobs import daily_refresh
+from loadtest.synthetic import SyntheticInventory
+from scraper import code_parser
+from scraper import scraper as scraper_mod
+
+pytest.importorskip("pytest_benchmark")
+
+PAGE_SIZE = 200  # ads per SearchVehicleAds page, the scraper default
+ROWS = 2000  # vehicles per loader run
+SEED = 0
+OBSERVED_AT = dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc)
+
+
+class _Resp:
+    """Just what _decode_json reads from a requests.Response."""
+
+    def __init__(self, content: bytes, encoding: str):
+        self.content = content
+        self.headers = {"Content-Encoding": encoding} if encoding else {}
+
+
+@pytest.fixture(scope="module")
+def inventory() -> SyntheticInventory:
+    return SyntheticInventory(ROWS, "PS2", "us", SEED)
+
+
+@pytest.fixture(scope="module")
+def ads(inventory) -> list[dict]:
+    return list(inventory.iter_ads())
+
+
+@pytest.fixture(scope="module")
+def page_body(ads) -> bytes:
+    page = ads[:PAGE_SIZE]
+    meta = {"limit": PAGE_SIZE, "offset": 0, "resultCount": len(page), "totalCount": ROWS}
+    doc = {"data": {"searchVehicleAds": {"metadata": meta, "vehicleAds": page}}}
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8")
+
+
+@pytest.fixture(scope="module")
+def code_to_label():
+    return code_parser.default_code_to_label()
+
+
+@pytest.fixture(scope="module")
+def scraped(ads, code_to_label) -> list[dict]:
+    """Enriched scraper dicts, as the loader receives them."""
+    cars = [scraper_mod._normalize_vehicle(ad, "PS2") for ad in ads]
+    return code_parser.enrich_many(cars, code_to_label)
+
+
+@pytest.fixture(scope="module")
+def image_sets(ads) -> list[list[str]]:
+    return [ad["vehicleDetails"]["stockImages"] for ad in ads[:PAGE_SIZE]]
+
+
+# ---------- code_parser ----------
+def test_extract_option_codes_warm(benchmark, image_sets):
+    for urls in image_sets:
+        code_parser.extract_option_codes(urls)
+    benchmark.group = "code_parser"
+    benchmark(lambda: [code_parser.extract_option_codes(urls) for urls in image_sets])
+
+
+def test_extract_option_codes_cold(benchmark, image_sets):
+    benchmark.group = "code_parser"
+    benchmark.pedantic(
+        lambda: [code_parser.extract_option_codes(urls) for urls in image_sets],
+        setup=code_parser._KEY_CACHE.clear,
+        rounds=50,
+    )
+
+
+def test_classify_codes(benchmark, image_sets, code_to_label):
+    codes = [code_parser.extract_option_codes(urls) for urls in image_sets]
+    benchmark.group = "code_parser"
+    benchmark(lambda: [code_parser.classify_codes(c, code_to_label) for c in codes])
+
+
+def test_enrich_labels(benchmark, image_sets, code_to_label):
+    classified = [
+        code_parser.classify_codes(code_parser.extract_option_codes(urls), code_to_label)
+        for urls in image_sets
+    ]
+    benchmark.group = "code_parser"
+    benchmark(lambda: [code_parser.enrich_labels(c, code_to_label) for c in classified])
+
+
+# ---------- scraper ----------
+def test_normalize_vehicle(benchmark, ads):
+    page = ads[:PAGE_SIZE]
+    benchmark.group = "scraper"
+    benchmark(lambda: [scraper_mod._normalize_vehicle(ad, "PS2") for ad in page])
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip", "br"])
+def test_decode_json(benchmark, page_body, encoding):
+    # Content-Encoding header on a still-encoded body: the transport did not decode it
+    if encoding == "gzip":
+        resp = _Resp(gzip.compress(page_body), "gzip")
+    elif encoding == "br":
+        resp = _Resp(brotli.compress(page_body), "br")
+    else:
+        resp = _Resp(page_body, "")
+    benchmark.group = "decode"
+    result = benchmark(scraper_mod._decode_json, resp)
+    assert len(result["data"]["searchVehicleAds"]["vehicleAds"]) == PAGE_SIZE
+
+
+# ---------- loader ----------
+def test_normalize_for_db(benchmark, scraped):
+    benchmark.group = "loader"
+    benchmark(lambda: [daily_refresh._normalize_for_db(v) for v in scraped])
+
+
+def test_split_changes(benchmark, scraped):
+    normalized = [daily_refresh._normalize_for_db(v) for v in scraped]
+    rng = random.Random(SEED)
+    # Upsert RETURNING rows: ~10% new vehicles, ~10% with a changed price (Decimal prices)
+    rows = []
+    for v in normalized:
+        roll = rng.random()
+        new = Decimal(v.retail_price)
+        old = None if roll < 0.1 else new + (500 if roll < 0.2 else 0)
+        rows.append({"id": v.id, "inserted": roll < 0.1, "old_price": old, "new_price": new})
+    benchmark.group = "loader"
+    inserted_ids, changes = benchmark(daily_refresh._split_changes, rows)
+    assert 0 < len(inserted_ids) < len(rows) // 2
+    assert 0 < len(changes) < len(rows) // 2
+
+
+def test_export_body(benchmark, scraped):
+    # Shaped like SELECT_EXPORT rows: Decimal prices, date/datetime columns
+    rows = []
+    for v in scraped:
+        row = {k: v.get(k) for k in VEHICLE_KEYS}
+        row["retail_price"] = Decimal(str(v["retail_price"]))
+        row["dealer_price"] = Decimal(str(v["dealer_price"]))
+        row["first_time_registration"] = dt.date.fromisoformat(v["first_time_registration"])
+        row["available"] = True
+        row["first_seen_at"] = row["last_seen_at"] = OBSERVED_AT
+        row["previous_price"] = row["price_delta"] = None
+        rows.append(row)
+    benchmark.group = "loader"
+    body = benchmark(daily_refresh._export_body, rows)
+    assert json.loads(body)["vehicles"][0]["id"] == rows[0]["id"]
@@ -0,0 +1,36 @@
+"""Run bench_hotpaths with the regression gate: fail on a median slowdown over 20%.
+
+Run with (from the repository root, ``pip install -e ".[bench]"``):
+  python -m benchmarks.run_hotpaths --save   # record a baseline under .benchmarks/
+  python -m benchmarks.run_hotpaths          # compare against the latest saved run
+
+Any other arguments are passed through to pytest, e.g. ``--benchmark-json=bench.json``
+for a CI artifact or ``-k decode`` to run a subset.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCH_FILE = Path(__file__).with_name("bench_hotpaths.py")
+# Largest tolerated slowdown of any benchmark's median versus the saved baseline
+COMPARE_FAIL = "median:20%"
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--save", action="store_true", help="save this run as the new baseline")
+    args, passthrough = ap.parse_known_args(argv)
+    if args.save:
+        opts = ["--benchmark-autosave"]
+    else:
+        opts = ["--benchmark-compare", f"--benchmark-compare-fail={COMPARE_FAIL}"]
+    return int(pytest.main([str(BENCH_FILE), *opts, *passthrough]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,28 @@
+"""Postgres access for the jobs: pooled connections, one-shot helpers, COPY.
+
+Connections come from a small per-process pool (DB_POOL_SIZE idle
+connections kept), so a warm Lambda reuses them across invocations instead of
+paying TCP + TLS + auth on every query. A connection idle for more than
+DB_POOL_PING_AFTER seconds is checked with ``SELECT 1`` before reuse and
+replaced if the server or a NAT dropped it.
+
+Every helper (fetch_all, fetch_one, execute, execute_values) runs in its own
+short transaction, committed when it returns. Inside ``transaction()`` they
+all share one connection and one transaction instead, committed (or rolled
+back) once at the end:
+
+  with db.transaction():
+      execute_values(...)
+      execute(...)
+"""
+
 from contextlib import contextmanager
+import contextvars
+import json
 import logging
 import os
+import threading
+import time
 
 import psycopg2
 from psycopg2 import OperationalError
@@ -13,6 +35,10 @@ load_dotenv()  # take environment variables from .env.
 
 log = logging.getLogger("db")
 
+COPY_BUFFER = 64 * 1024  # characters handed to COPY per read
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "2"))  # idle connections kept per process
+PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))  # seconds idle before a liveness check
+
 
 def get_conn():
     """Return a raw psycopg2 connection. Caller must close.
@@ -58,10 +84,168 @@ def _extract_sslmode(dsn: str) -> str:
     return "?"
 
 
+# ---------- Pool ----------
+class ConnectionPool:
+    """Thread-safe pool of idle connections with a liveness check on reuse."""
+
+    def __init__(self, size: int = POOL_SIZE, ping_after: float = PING_AFTER, connect=None):
+        self.size = max(int(size), 0)
+        self.ping_after = ping_after
+        self._connect = connect or get_conn
+        self._idle = []  # (connection, released_at)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                c, released_at = self._idle.pop()
+            if c.closed:
+                continue
+            if time.monotonic() - released_at > self.ping_after and not _alive(c):
+                _close_quietly(c)
+                continue
+            self.reused += 1
+            return c
+        self.opened += 1
+        return self._connect()
+
+    def release(self, c) -> None:
+        """Return a connection; it is closed instead if broken, mid-transaction or surplus."""
+        if c.closed:
+            return
+        try:
+            if c.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                c.rollback()
+        except psycopg2.Error:
+            _close_quietly(c)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((c, time.monotonic()))
+                return
+        _close_quietly(c)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for c, _ in idle:
+            _close_quietly(c)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"opened": self.opened, "reused": self.reused, "idle": len(self._idle)}
+
+
+def _alive(c) -> bool:
+    try:
+        with c.cursor() as cur:
+            cur.execute("SELECT 1")
+        c.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(c) -> None:
+    try:
+        c.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# connection of the active transaction() unit of work, if any
+_uow: contextvars.ContextVar = contextvars.ContextVar("db_unit_of_work", default=None)
+
+
+def pool() -> ConnectionPool:
+    """The process-wide pool (created on first use, kept across warm invocations)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        current, _pool = _pool, None
+    if current is not None:
+        current.close()
+
+
 @contextmanager
 def conn():
-    with get_conn() as c:
+    """A connection for one unit of work: committed on success, rolled back on error.
+
+    Inside ``transaction()`` this is the transaction's connection and nothing
+    is committed here.
+    """
+    shared = _uow.get()
+    if shared is not None:
+        yield shared
+        return
+    p = pool()
+    c = p.acquire()
+    try:
         yield c
+        c.commit()
+    except BaseException:
+        if not c.closed:
+            try:
+                c.rollback()
+            except psycopg2.Error:
+                _close_quietly(c)
+        raise
+    finally:
+        p.release(c)
+
+
+@contextmanager
+def transaction():
+    """Run every db call in the block on one connection and commit once at the end.
+
+    Nested ``transaction()`` blocks join the outer one.
+    """
+    if _uow.get() is not None:
+        with conn() as c:
+            yield c
+        return
+    with conn() as c:
+        token = _uow.set(c)
+        try:
+            yield c
+        finally:
+            _uow.reset(token)
+
+
+@contextmanager
+def savepoint(name: str = "sp"):
+    """Let a failing block be rolled back without aborting the enclosing ``transaction()``.
+
+    Outside a transaction each call already commits or rolls back on its own,
+    so this is a no-op there.
+    """
+    c = _uow.get()
+    if c is None:
+        yield
+        return
+    with c.cursor() as cur:
+        cur.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        with c.cursor() as cur:
+            cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        raise
+    with c.cursor() as cur:
+        cur.execute(f"RELEASE SAVEPOINT {name}")
 
 
 def fetch_all(sql, params=None):
@@ -79,19 +263,78 @@ def fetch_one(sql, params=None):
 def execute(sql, params=None):
     with conn() as c, c.cursor() as cur:
         cur.execute(sql, params or {})
-        c.commit()
 
 
-def execute_values(sql: str, rows, template: str | None = None, page_size: int = 1000):
+def execute_values(
+    sql: str, rows, template: str | None = None, page_size: int = 1000, fetch: bool = False
+):
     """Execute a VALUES-based bulk statement efficiently.
 
+    With ``fetch=True`` the rows the statement RETURNs (from every page) are
+    returned as DictRows.
+
     Example:
       sql = "INSERT INTO table (col1, col2) VALUES %s ON CONFLICT ..."
       template = "(%(col1)s, %(col2)s)"  # rows are dicts
       execute_values(sql, list_of_dicts, template)
     """
     if not rows:
-        return
-    with conn() as c, c.cursor() as cur:
-        _execute_values(cur, sql, rows, template=template, page_size=page_size)
-        c.commit()
+        return [] if fetch else None
+    with conn() as c, c.cursor(cursor_factory=DictCursor) as cur:
+        return _execute_values(cur, sql, rows, template=template, page_size=page_size, fetch=fetch)
+
+
+# ---------- COPY FROM STDIN ----------
+def _copy_value(value) -> str:
+    """One field in COPY text format (\\N is NULL; backslash, tab and newlines escaped)."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, separators=(",", ":"))
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _CopyReader:
+    """File-like ``read(size)`` over rows, encoding them lazily as COPY text lines."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buf = ""
+        self.rows = 0
+
+    def read(self, size: int = -1) -> str:
+        parts = [self._buf]
+        have = len(self._buf)
+        while size < 0 or have < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = "\t".join(_copy_value(v) for v in row) + "\n"
+            parts.append(line)
+            have += len(line)
+            self.rows += 1
+        data = "".join(parts)
+        if size < 0 or len(data) <= size:
+            self._buf = ""
+            return data
+        self._buf = data[size:]
+        return data[:size]
+
+
+def copy_rows(cur, table: str, columns, rows, size: int = COPY_BUFFER) -> int:
+    """Stream ``rows`` (tuples in ``columns`` order) into ``table`` with COPY FROM STDIN.
+
+    Rows are encoded as they are read, so the whole batch is never held as text.
+    Runs on the caller's cursor/transaction; returns the number of rows sent.
+    """
+    reader = _CopyReader(rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", reader, size)
+    return reader.rows
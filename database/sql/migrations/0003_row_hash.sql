@@ -0,0 +1,4 @@
+-- Content hash of the scraped (normalized) fields of a vehicle.
+-- The loader rewrites a row only when its hash changes; unchanged rows just get
+-- last_seen_at/available bumped. NULL (existing rows) forces one full rewrite.
+ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS row_hash TEXT;
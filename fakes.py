@@ -0,0 +1,61 @@
+"""Fake SearchVehicleAds API shared by the scraper tests.
+
+``FakeSession`` serves TOTAL synthetic ads, paginated by the request's
+offset/limit variables, and records the offsets it was asked for.
+"""
+
+import json
+import threading
+
+TOTAL = 450
+
+
+def make_ad(i):
+    return {
+        "id": f"ad-{i:04d}",
+        "firstTimeRegistration": "2024-01-02",
+        "price": {"retail": 30000 + i, "dealer": 30000 + i, "currency": "USD"},
+        "partnerLocation": {"city": "Detroit", "name": "Polestar Detroit"},
+        "mileageInfo": {"distance": 1000 + i, "metric": "Miles"},
+        "vehicleDetails": {
+            "vin": f"VIN{i:05d}",
+            "modelDetails": {"displayName": "Polestar 2", "modelYear": 2024},
+            "stockImages": [
+                "https://cas.polestar.com/image/dynamic/MY24_2335/534/"
+                "summary-transparent-v1/FE/1/31/72900/R60000/LR01/_/default.png"
+                "?market=us&angle=3&bg=00000000"
+            ],
+            "cycleState": "PreOwned",
+        },
+    }
+
+
+class FakeResp:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.headers = {}
+        self.content = json.dumps(payload).encode()
+        self.text = self.content.decode()
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.headers = {}
+        self.offsets = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        offset = json["variables"]["offset"]
+        limit = json["variables"]["limit"]
+        with self.lock:
+            self.offsets.append(offset)
+        ads = [make_ad(i) for i in range(offset, min(offset + limit, TOTAL))]
+        meta = {"limit": limit, "offset": offset, "resultCount": len(ads), "totalCount": TOTAL}
+        return FakeResp({"data": {"searchVehicleAds": {"metadata": meta, "vehicleAds": ads}}})
+
+
+def strip_dates(rows):
+    return [{k: v for k, v in r.items() if k != "scrape_date"} for r in rows]
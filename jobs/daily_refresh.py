@@ -1,18 +1,31 @@
 # jobs/daily_refresh.py
 from __future__ import annotations
 
+import contextlib
+import hashlib
 import json
 import logging
 import os
-import uuid
-from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
 
 import boto3
-from psycopg2.extras import Json
+from psycopg2.extras import DictCursor, Json
 
 import scraper.scraper as scraper  # your library-style scraper.py
-from scraper.filters import filters as FILTERS  # type: ignore
-from database.db import execute, fetch_all, fetch_one, execute_values
+from scraper import feature_scan, shards
+from scraper.vehicle import DB_KEYS, Vehicle
+from jobs import metrics, profiling
+from database.db import (
+    conn,
+    copy_rows,
+    execute,
+    execute_values,
+    fetch_all,
+    fetch_one,
+    pool,
+    savepoint,
+    transaction,
+)
 
 # ----------------- Config -----------------
 
@@ -22,6 +35,10 @@ REGION = os.getenv("AWS_REGION", "us-east-1")
 BUCKET = os.getenv("PUBLIC_BUCKET", "local")  # "local" => write to disk
 KEY_PREFIX = os.getenv("PUBLIC_KEY_PREFIX", "")  # e.g., "staging/" or ""
 EXPORT_KEY = (KEY_PREFIX + "data/vehicles.json") if KEY_PREFIX else "data/vehicles.json"
+# values: execute_values in chunks of 500; copy: COPY into a staging table + one upsert
+UPSERT_MODE = os.getenv("UPSERT_MODE", "values").lower()
+# Run every statement of a refresh on one connection, committed once at the end
+SINGLE_TRANSACTION = os.getenv("DB_SINGLE_TRANSACTION", "").lower() in {"1", "true", "yes"}
 
 s3 = boto3.client("s3", region_name=REGION)
 log = logging.getLogger("daily_refresh")
@@ -68,11 +85,154 @@ ON CONFLICT (id) DO UPDATE SET
   first_seen_at = vehicles.first_seen_at;
 """
 
-GET_OLD_PRICE = "SELECT retail_price FROM vehicles WHERE id=%(id)s;"
+# Shared by both bulk upsert paths (EXCLUDED is the VALUES row or the staged row)
+_UPSERT_ON_CONFLICT = (
+    "ON CONFLICT (id) DO UPDATE SET\n"
+    "  vin = EXCLUDED.vin,\n"
+    "  model = EXCLUDED.model,\n"
+    "  year = EXCLUDED.year,\n"
+    "  partner_location = EXCLUDED.partner_location,\n"
+    "  state = EXCLUDED.state,\n"
+    "  mileage = EXCLUDED.mileage,\n"
+    "  first_time_registration = EXCLUDED.first_time_registration,\n"
+    "  retail_price = EXCLUDED.retail_price,\n"
+    "  dealer_price = EXCLUDED.dealer_price,\n"
+    "  exterior = EXCLUDED.exterior,\n"
+    "  interior = EXCLUDED.interior,\n"
+    "  wheels = COALESCE(EXCLUDED.wheels, vehicles.wheels),\n"
+    "  motor = COALESCE(EXCLUDED.motor, vehicles.motor),\n"
+    "  edition = EXCLUDED.edition,\n"
+    "  performance = CASE WHEN EXCLUDED.performance THEN TRUE ELSE vehicles.performance END,\n"
+    "  pilot = CASE WHEN EXCLUDED.pilot THEN TRUE ELSE vehicles.pilot END,\n"
+    "  plus = CASE WHEN EXCLUDED.plus THEN TRUE ELSE vehicles.plus END,\n"
+    "  stock_images = EXCLUDED.stock_images,\n"
+    "  available = TRUE,\n"
+    "  last_seen_at = now(),\n"
+    "  first_seen_at = vehicles.first_seen_at,\n"
+    "  row_hash = EXCLUDED.row_hash\n"
+    # unchanged rows were already touched (TOUCH_*): no new tuple, not RETURNed
+    "WHERE vehicles.row_hash IS DISTINCT FROM EXCLUDED.row_hash\n"
+)
+
+_UPSERT_COLUMNS = (
+    "  id, vin, model, year, partner_location, state, mileage,\n"
+    "  first_time_registration, retail_price, dealer_price,\n"
+    "  exterior, interior, wheels, motor, edition,\n"
+    "  performance, pilot, plus, available, stock_images,\n"
+    "  first_seen_at, last_seen_at, row_hash\n"
+)
+
+
+def _with_price_history(upsert: str) -> str:
+    """Wrap an upsert so the same statement writes price_history and reports changes.
+
+    Every CTE reads the snapshot taken before the statement, so ``old`` still
+    sees the prices the upsert is replacing (no preload query, no race with it).
+    ``xmax = 0`` marks rows that were inserted rather than updated. History gets
+    a row for every new vehicle and every changed price (NULL prices skipped).
+    Returns one row per inserted or rewritten vehicle: (id, inserted, old_price, new_price).
+    """
+    return (
+        "WITH upserted AS (\n" + upsert + "  RETURNING id, retail_price, (xmax = 0) AS inserted\n"
+        "),\n"
+        "old AS (\n"
+        "  SELECT id, retail_price FROM vehicles WHERE id IN (SELECT id FROM upserted)\n"
+        "),\n"
+        "changes AS (\n"
+        "  SELECT u.id, u.inserted, o.retail_price AS old_price, u.retail_price AS new_price\n"
+        "  FROM upserted u LEFT JOIN old o USING (id)\n"
+        "),\n"
+        "history AS (\n"
+        "  INSERT INTO price_history (id, vehicle_id, price, observed_at)\n"
+        "  SELECT id || '-' || gen_random_uuid(), id, new_price, now() FROM changes\n"
+        "  WHERE new_price IS NOT NULL AND (inserted OR old_price IS DISTINCT FROM new_price)\n"
+        ")\n"
+        "SELECT id, inserted, old_price, new_price FROM changes;\n"
+    )
+
 
-INSERT_HISTORY = """
-INSERT INTO price_history (id, vehicle_id, price, observed_at)
-VALUES (%(id)s, %(vehicle_id)s, %(price)s, %(observed_at)s);
+# Batch UPSERT using execute_values
+UPSERT_VEHICLE_BULK = _with_price_history(
+    "INSERT INTO vehicles (\n" + _UPSERT_COLUMNS + ") VALUES %s\n" + _UPSERT_ON_CONFLICT
+)
+VALUES_TEMPLATE = (
+    "(%(id)s, %(vin)s, %(model)s, %(year)s, %(partner_location)s, %(state)s, %(mileage)s,\n"
+    " %(first_time_registration)s, %(retail_price)s, %(dealer_price)s,\n"
+    " %(exterior)s, %(interior)s, %(wheels)s, %(motor)s, %(edition)s,\n"
+    " %(performance)s, %(pilot)s, %(plus)s, TRUE, %(stock_images)s, now(), now(), %(row_hash)s)"
+)
+
+# COPY path: typed temp table (gone at commit), then one set-based upsert from it.
+# DISTINCT ON keeps one row per id (ON CONFLICT cannot touch a row twice) and
+# ORDER BY id takes the row locks in a stable order.
+CREATE_STAGE = "CREATE TEMP TABLE vehicles_stage (LIKE vehicles INCLUDING DEFAULTS) ON COMMIT DROP;"
+UPSERT_FROM_STAGE = _with_price_history(
+    "INSERT INTO vehicles (\n" + _UPSERT_COLUMNS + ")\n"
+    "SELECT DISTINCT ON (id)\n"
+    "  id, vin, model, year, partner_location, state, mileage,\n"
+    "  first_time_registration, retail_price, dealer_price,\n"
+    "  exterior, interior, wheels, motor, edition,\n"
+    "  performance, pilot, plus, TRUE, stock_images, now(), now(), row_hash\n"
+    "FROM vehicles_stage\n"
+    "ORDER BY id\n" + _UPSERT_ON_CONFLICT
+)
+
+STAGE_KEYS = DB_KEYS + ("row_hash",)
+
+# Rows whose content hash is unchanged only get seen again: one bulk statement,
+# run before the upsert (which then skips them). Values path: id/hash arrays.
+TOUCH_UNCHANGED = (
+    "UPDATE vehicles AS v SET last_seen_at = now(), available = TRUE\n"
+    "FROM unnest(%(ids)s::text[], %(hashes)s::text[]) AS s (id, row_hash)\n"
+    "WHERE v.id = s.id AND v.row_hash = s.row_hash;"
+)
+TOUCH_FROM_STAGE = (
+    "UPDATE vehicles AS v SET last_seen_at = now(), available = TRUE\n"
+    "FROM vehicles_stage AS s\n"
+    "WHERE v.id = s.id AND v.row_hash = s.row_hash;"
+)
+
+# Deep-scan results: one id -> features table COPY'd in, applied by one UPDATE.
+# Scans only ever add information: wheels/motor are overwritten when found,
+# package flags only go FALSE -> TRUE. Only rows that actually change are
+# updated; the result is exact per-field change counts ("old" is the snapshot
+# from before the UPDATE).
+FEATURE_KEYS = ("id",) + feature_scan.FEATURE_FIELDS
+CREATE_FEATURE_STAGE = (
+    "CREATE TEMP TABLE feature_stage (\n"
+    "  id TEXT PRIMARY KEY, wheels TEXT, motor TEXT,\n"
+    "  performance BOOLEAN NOT NULL, pilot BOOLEAN NOT NULL, plus BOOLEAN NOT NULL\n"
+    ") ON COMMIT DROP;"
+)
+APPLY_FEATURES = """
+WITH old AS (
+  SELECT v.id, v.wheels, v.motor, v.performance, v.pilot, v.plus
+  FROM vehicles v JOIN feature_stage s USING (id)
+),
+changed AS (
+  UPDATE vehicles AS v SET
+    wheels = COALESCE(s.wheels, v.wheels),
+    motor = COALESCE(s.motor, v.motor),
+    performance = v.performance OR s.performance,
+    pilot = v.pilot OR s.pilot,
+    plus = v.plus OR s.plus
+  FROM feature_stage AS s
+  WHERE v.id = s.id
+    AND (v.wheels IS DISTINCT FROM COALESCE(s.wheels, v.wheels)
+      OR v.motor IS DISTINCT FROM COALESCE(s.motor, v.motor)
+      OR (s.performance AND NOT v.performance)
+      OR (s.pilot AND NOT v.pilot)
+      OR (s.plus AND NOT v.plus))
+  RETURNING v.id, v.wheels, v.motor, v.performance, v.pilot, v.plus
+)
+SELECT
+  count(*) AS rows,
+  count(*) FILTER (WHERE c.wheels IS DISTINCT FROM o.wheels) AS wheels,
+  count(*) FILTER (WHERE c.motor IS DISTINCT FROM o.motor) AS motor,
+  count(*) FILTER (WHERE c.performance AND NOT o.performance) AS performance,
+  count(*) FILTER (WHERE c.pilot AND NOT o.pilot) AS pilot,
+  count(*) FILTER (WHERE c.plus AND NOT o.plus) AS plus
+FROM changed c JOIN old o USING (id);
 """
 
 MARK_UNAVAILABLE = """
@@ -125,7 +285,16 @@ ORDER BY v.year DESC, v.retail_price NULLS LAST;
 
 
 # ----------------- Helpers -----------------
-def _load_raw_from_s3():
+def _load_raw_from_s3(run_id: str | None = None):
+    """Vehicles of RAW_KEY, or of every shard of a sharded run (merged by id) when given."""
+    if run_id and RAW_BUCKET:
+        vehicles, _, found = shards.load_merged(s3, RAW_BUCKET, run_id)
+        if not found:
+            raise FileNotFoundError(f"no shards for run {run_id} in s3://{RAW_BUCKET}")
+        log.info(
+            "loader: merged %d shards of run %s (vehicles=%d)", len(found), run_id, len(vehicles)
+        )
+        return vehicles
     if not RAW_BUCKET or not RAW_KEY:
         return None
     obj = s3.get_object(Bucket=RAW_BUCKET, Key=RAW_KEY)
@@ -134,33 +303,141 @@ def _load_raw_from_s3():
     return vehicles
 
 
-def _normalize_for_db(v: dict) -> dict:
+def _normalize_for_db(v: dict) -> Vehicle:
     """
-    Ensure the dict from scraper has all DB keys (even if None).
-    Your scraper already normalizes most fields; fill the remainder.
+    Convert a scraper dict into a compact Vehicle record.
+    Missing optional text/boolean fields are filled by ``to_db_params``.
     """
-    # Fill optional text/boolean fields that may not come from the scraper yet
-    base = {
-        "exterior": v.get("exterior"),
-        "interior": v.get("interior"),
-        "wheels": v.get("wheels"),
-        "motor": v.get("motor"),
-        "edition": v.get("edition"),
-        "performance": bool(v.get("performance", False)),
-        "pilot": bool(v.get("pilot", False)),
-        "plus": bool(v.get("plus", False)),
-    }
-    merged = {**base, **v}
-    # Ensure stock_images is a list/JSONB-compatible
-    imgs = merged.get("stock_images") or []
-    if isinstance(imgs, str):
-        imgs = [p.strip() for p in imgs.split(",") if p.strip()]
-    merged["stock_images"] = Json(imgs)  # <-- wrap with Json
-    return merged
+    return Vehicle.from_dict(v)
+
+
+def _row_hash(v: Vehicle) -> str:
+    """Stable hash of every upserted column (stored as vehicles.row_hash)."""
+    body = json.dumps(v.to_db_params(), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _db_params(v: Vehicle, row_hash: str | None = None) -> dict:
+    """Upsert params for one vehicle, with stock_images wrapped for JSONB."""
+    params = v.to_db_params()
+    params["row_hash"] = row_hash or _row_hash(v)
+    params["stock_images"] = Json(params["stock_images"])  # <-- wrap with Json
+    return params
+
+
+def _upsert_values(normalized: list[Vehicle], chunk: int = 500) -> tuple[list, int]:
+    """Touch unchanged rows, then upsert with execute_values, one statement per chunk.
+
+    Returns (change rows, touched count).
+    """
+    hashes = [_row_hash(v) for v in normalized]
+    with conn() as c, c.cursor() as cur:
+        cur.execute(TOUCH_UNCHANGED, {"ids": [v.id for v in normalized], "hashes": hashes})
+        touched = cur.rowcount
+    changes: list = []
+    for i in range(0, len(normalized), chunk):
+        changes += execute_values(
+            UPSERT_VEHICLE_BULK,
+            [_db_params(v, h) for v, h in zip(normalized[i : i + chunk], hashes[i : i + chunk])],
+            template=VALUES_TEMPLATE,
+            page_size=chunk,
+            fetch=True,
+        )
+    return changes, touched
+
+
+def _copy_row(v: Vehicle) -> tuple:
+    """Staging row in STAGE_KEYS order; copy_rows encodes stock_images as JSON."""
+    params = v.to_db_params()
+    return (*(params[k] for k in DB_KEYS), _row_hash(v))
+
+
+def _upsert_copy(normalized: list[Vehicle]) -> tuple[list, int]:
+    """COPY every row into a temp staging table, touch the unchanged ones, upsert the rest.
+
+    Single connection and transaction: either every row lands or none does.
+    Returns (change rows (see _with_price_history), touched count).
+    """
+    with conn() as c, c.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(CREATE_STAGE)
+        staged = copy_rows(cur, "vehicles_stage", STAGE_KEYS, (_copy_row(v) for v in normalized))
+        log.info("loader: staged rows=%d", staged)
+        cur.execute(TOUCH_FROM_STAGE)
+        touched = cur.rowcount
+        cur.execute(UPSERT_FROM_STAGE)
+        return cur.fetchall(), touched
+
+
+def _feature_rows(scan: feature_scan.FeatureScan):
+    """One FEATURE_KEYS row per scanned id (unmatched wheels/motor None, flags False)."""
+    for vid, found in scan.features.items():
+        yield (
+            vid,
+            found.get("wheels"),
+            found.get("motor"),
+            bool(found.get("performance")),
+            bool(found.get("pilot")),
+            bool(found.get("plus")),
+        )
+
+
+def _apply_features(scan: feature_scan.FeatureScan) -> dict:
+    """Write a deep scan into vehicles in one transaction.
+
+    Returns exact counts: rows changed, and per field the rows whose value changed.
+    """
+    with conn() as c, c.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(CREATE_FEATURE_STAGE)
+        staged = copy_rows(cur, "feature_stage", FEATURE_KEYS, _feature_rows(scan))
+        log.info("feature-scan: staged ids=%d", staged)
+        cur.execute(APPLY_FEATURES)
+        return dict(cur.fetchone())
+
+
+def _as_price(value) -> Decimal | None:
+    """API prices are strings ("33500.00"), stored ones NUMERIC; compare them as Decimal."""
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _split_changes(rows) -> tuple[list[str], list[dict]]:
+    """
+    Classify the upsert's change rows (id, inserted, old_price, new_price).
+    Returns (inserted ids, price change details for existing vehicles); the
+    matching price_history rows were already written by the upsert itself.
+    """
+    inserted_ids: list[str] = []
+    price_change_details: list[dict] = []
+    for r in rows:
+        vid, new_price, old_price = r["id"], r["new_price"], r["old_price"]
+        if r["inserted"]:
+            inserted_ids.append(vid)
+            continue
+        new_dec, old_dec = _as_price(new_price), _as_price(old_price)
+        if new_dec is None or new_dec == old_dec:
+            continue
+        delta = float(new_dec - old_dec) if old_dec is not None else None
+        price_change_details.append(
+            {
+                "id": vid,
+                "old_price": old_price,
+                "new_price": str(new_price),
+                "delta": delta,
+            }
+        )
+    return inserted_ids, price_change_details
+
+
+def _export_body(rows: list[dict]) -> str:
+    return json.dumps({"vehicles": rows}, indent=2, default=str)
 
 
 def _export_json(rows: list[dict]) -> None:
-    body = json.dumps({"vehicles": rows}, indent=2, default=str)
+    body = _export_body(rows)
     if BUCKET == "local":
         # Write to local file so your SPA can read it during dev
         out_path = os.path.join("public", "data", "vehicles.json")
@@ -178,8 +455,121 @@ def _export_json(rows: list[dict]) -> None:
         log.info("Exported %d vehicles to s3://%s/%s", len(rows), BUCKET, EXPORT_KEY)
 
 
+def _load(normalized: list[Vehicle], scan: feature_scan.FeatureScan | None, run) -> dict:
+    """Upsert, apply the deep scan (when given), mark unavailable, query the export.
+
+    Database calls only: in single-transaction mode the handler runs this
+    inside ``transaction()``. Returns the summary counts plus the export ``rows``.
+    """
+    log.info("loader: start db upsert (batched) ...")
+
+    # Unchanged rows (same row_hash) are only touched; upsert + price_history in one
+    # statement for the rest, which reports inserted vs rewritten rows
+    with run.span("upsert"):
+        if UPSERT_MODE == "copy":
+            change_rows, touched = _upsert_copy(normalized)
+        else:
+            change_rows, touched = _upsert_values(normalized)
+    inserted_ids, price_change_details = _split_changes(change_rows)
+    rewritten = len(change_rows) - len(inserted_ids)
+    log.info(
+        "loader: db upsert done via %s (rows=%d new=%d rewritten=%d touched=%d)",
+        UPSERT_MODE,
+        len(normalized),
+        len(inserted_ids),
+        rewritten,
+        touched,
+    )
+
+    features_changed = 0
+    if scan is not None:
+        # All codes' matches as one id -> features table, applied in one UPDATE
+        with run.span("deep_scan_apply"):
+            updates = _apply_features(scan)
+        features_changed = updates["rows"]
+        log.info("feature-scan: vehicles changed=%d", features_changed)
+        log.info("feature-scan: wheels updated rows=%d", updates["wheels"])
+        log.info("feature-scan: motors updated rows=%d", updates["motor"])
+        log.info(
+            "feature-scan: packages updated rows=%d (performance=%d pilot=%d plus=%d)",
+            updates["performance"] + updates["pilot"] + updates["plus"],
+            updates["performance"],
+            updates["pilot"],
+            updates["plus"],
+        )
+        # Coverage snapshot (approximate): counts after updates. A failure must not
+        # abort a single transaction, hence the savepoint.
+        try:
+            with savepoint("coverage"):
+                coverage_rows = fetch_all(
+                    """
+                    SELECT
+                      count(*) FILTER (WHERE wheels IS NOT NULL) AS wheels_set,
+                      count(*) FILTER (WHERE motor IS NOT NULL) AS motor_set,
+                      count(*) FILTER (WHERE performance) AS performance_set,
+                      count(*) FILTER (WHERE pilot) AS pilot_set,
+                      count(*) FILTER (WHERE plus) AS plus_set,
+                      count(*) AS total
+                    FROM vehicles
+                    """
+                )
+            if coverage_rows:
+                cv = coverage_rows[0]
+                log.info(
+                    "feature-scan: coverage wheels=%s/%s motor=%s/%s performance=%s pilot=%s plus=%s",
+                    cv["wheels_set"],
+                    cv["total"],
+                    cv["motor_set"],
+                    cv["total"],
+                    cv["performance_set"],
+                    cv["pilot_set"],
+                    cv["plus_set"],
+                )
+        except Exception as ce:  # pragma: no cover
+            log.warning("feature-scan: coverage query failed: %s", ce)
+
+    # Mark vehicles not seen today as unavailable
+    with run.span("mark_unavailable"):
+        execute(MARK_UNAVAILABLE)
+
+    log.info("loader: export json ...")
+    with run.span("export_query"):
+        rows = fetch_all(SELECT_EXPORT)
+
+    return {
+        "inserted": len(inserted_ids),
+        "updated": rewritten + touched,
+        "rewritten": rewritten,
+        "touched": touched,
+        "price_changes": len(price_change_details),
+        "exported": len(rows),
+        "inserted_ids": inserted_ids,
+        "price_change_ids": [d["id"] for d in price_change_details],
+        "price_change_details": price_change_details,
+        "deep_scan_skipped": scan is None,
+        # codes whose filter query failed: their features were not applied this run
+        "deep_scan_failed_codes": [] if scan is None else [d.code for d in scan.failed],
+        "features_changed": features_changed,
+        "rows": rows,
+    }
+
+
 # ----------------- Entry point -----------------
+@profiling.profiled("daily_refresh")
+@metrics.instrumented("daily_refresh")
 def handler(event=None, context=None):
+    single = SINGLE_TRANSACTION
+    if isinstance(event, dict) and "single_transaction" in event:
+        single = bool(event.get("single_transaction"))
+    summary = _refresh(event, context, single)
+    log.info("db: pool %s (single_transaction=%s)", pool().stats(), single)
+    return summary
+
+
+def _refresh(event=None, context=None, single=False):
+    """Extract (and deep scan) first, then run every db step; with ``single`` the db
+    steps share one transaction, which never stays open across network calls.
+    """
     # 1) Extract
     print("LOADER: handler entered")  # shows even without logging config
     import logging
@@ -190,141 +580,27 @@ def handler(event=None, context=None):
 
     log.info("start: daily_refresh (loader)")
     log.info("loader: get raw from s3 ...")
-    raw = _load_raw_from_s3()
+    run = metrics.current()
+    run_id = event.get("run") if isinstance(event, dict) else None
+    with run.span("s3_read"):
+        raw = _load_raw_from_s3(run_id)
     log.info("loader: got raw, count=%s", None if raw is None else len(raw))
     s3_loaded = raw is not None
     if raw is None:
         log.info("RAW_* not set, scraping directly (local/dev mode)")
-        raw = scraper.fetch_raw()
-    log.info("fetched=%d", len(raw))
+        # Stream straight into normalization; no intermediate list of raw dicts
+        raw = scraper.iter_vehicles()
 
     # 2) Transform + Load (batched upsert + history)
-    log.info("loader: start db upsert (batched) ...")
-    now_utc = datetime.now(timezone.utc)
-    # Normalize all vehicles first
-    normalized: list[dict] = [_normalize_for_db(item) for item in raw]
-    all_ids = [v["id"] for v in normalized]
-
-    # Load existing prices for all ids to classify new vs existing and detect changes
-    existing_price_map: dict[str, float | None] = {}
-    if all_ids:
-        try:
-            rows = fetch_all(
-                "SELECT id, retail_price FROM vehicles WHERE id IN %(ids)s", {"ids": tuple(all_ids)}
-            )
-            existing_price_map = {r["id"]: r["retail_price"] for r in rows}
-        except Exception as e:  # pragma: no cover
-            log.warning("preload existing prices failed: %s", e)
-
-    inserted_ids: list[str] = [vid for vid in all_ids if vid not in existing_price_map]
-    updated_count = len(all_ids) - len(inserted_ids)
-
-    # Batch UPSERT using execute_values
-    UPSERT_VEHICLE_BULK = (
-        "INSERT INTO vehicles (\n"
-        "  id, vin, model, year, partner_location, state, mileage,\n"
-        "  first_time_registration, retail_price, dealer_price,\n"
-        "  exterior, interior, wheels, motor, edition,\n"
-        "  performance, pilot, plus, available, stock_images,\n"
-        "  first_seen_at, last_seen_at\n"
-        ") VALUES %s\n"
-        "ON CONFLICT (id) DO UPDATE SET\n"
-        "  vin = EXCLUDED.vin,\n"
-        "  model = EXCLUDED.model,\n"
-        "  year = EXCLUDED.year,\n"
-        "  partner_location = EXCLUDED.partner_location,\n"
-        "  state = EXCLUDED.state,\n"
-        "  mileage = EXCLUDED.mileage,\n"
-        "  first_time_registration = EXCLUDED.first_time_registration,\n"
-        "  retail_price = EXCLUDED.retail_price,\n"
-        "  dealer_price = EXCLUDED.dealer_price,\n"
-        "  exterior = EXCLUDED.exterior,\n"
-        "  interior = EXCLUDED.interior,\n"
-        "  wheels = COALESCE(EXCLUDED.wheels, vehicles.wheels),\n"
-        "  motor = COALESCE(EXCLUDED.motor, vehicles.motor),\n"
-        "  edition = EXCLUDED.edition,\n"
-        "  performance = CASE WHEN EXCLUDED.performance THEN TRUE ELSE vehicles.performance END,\n"
-        "  pilot = CASE WHEN EXCLUDED.pilot THEN TRUE ELSE vehicles.pilot END,\n"
-        "  plus = CASE WHEN EXCLUDED.plus THEN TRUE ELSE vehicles.plus END,\n"
-        "  stock_images = EXCLUDED.stock_images,\n"
-        "  available = TRUE,\n"
-        "  last_seen_at = now(),\n"
-        "  first_seen_at = vehicles.first_seen_at;\n"
-    )
-    VALUES_TEMPLATE = (
-        "(%(id)s, %(vin)s, %(model)s, %(year)s, %(partner_location)s, %(state)s, %(mileage)s,\n"
-        " %(first_time_registration)s, %(retail_price)s, %(dealer_price)s,\n"
-        " %(exterior)s, %(interior)s, %(wheels)s, %(motor)s, %(edition)s,\n"
-        " %(performance)s, %(pilot)s, %(plus)s, TRUE, %(stock_images)s, now(), now())"
-    )
-
-    # Chunk to keep statements reasonable in size
-    def _chunks(seq, size):
-        for i in range(0, len(seq), size):
-            yield seq[i : i + size]
-
-    for batch in _chunks(normalized, 500):
-        execute_values(UPSERT_VEHICLE_BULK, batch, template=VALUES_TEMPLATE, page_size=500)
-    log.info(
-        "loader: db upsert done (rows=%d new=%d existing=%d)",
-        len(all_ids),
-        len(inserted_ids),
-        updated_count,
-    )
-
-    # Build price history rows in bulk
-    price_change_details: list[dict] = []
-    history_rows: list[dict] = []
-    for v in normalized:
-        vid = v["id"]
-        new_price = v.get("retail_price")
-        old_price = existing_price_map.get(vid)
-        if vid in inserted_ids:
-            if new_price is not None:
-                history_rows.append(
-                    {
-                        "id": f"{vid}-{uuid.uuid4()}",
-                        "vehicle_id": vid,
-                        "price": new_price,
-                        "observed_at": now_utc,
-                    }
-                )
-        else:
-            if new_price is not None and new_price != old_price:
-                history_rows.append(
-                    {
-                        "id": f"{vid}-{uuid.uuid4()}",
-                        "vehicle_id": vid,
-                        "price": new_price,
-                        "observed_at": now_utc,
-                    }
-                )
-                try:
-                    delta = new_price - old_price if old_price is not None else None
-                except Exception:
-                    delta = None
-                price_change_details.append(
-                    {
-                        "id": vid,
-                        "old_price": old_price,
-                        "new_price": new_price,
-                        "delta": delta,
-                    }
-                )
-
-    if history_rows:
-        execute_values(
-            "INSERT INTO price_history (id, vehicle_id, price, observed_at) VALUES %s",
-            history_rows,
-            template="(%(id)s, %(vehicle_id)s, %(price)s, %(observed_at)s)",
-            page_size=1000,
-        )
-
-    inserted = len(inserted_ids)
-    updated = updated_count
-    price_changes = len(price_change_details)
-    price_change_ids = [d["id"] for d in price_change_details]
-    # 3) Secondary deep feature scans (wheels, packages, motors) unless skipped
+    # Normalize all vehicles first, then drop the raw records
+    # (in local mode this span also covers the streaming scrape)
+    with run.span("normalize"):
+        normalized: list[Vehicle] = [_normalize_for_db(item) for item in raw]
+    del raw
+    fetched = len(normalized)
+    log.info("fetched=%d", fetched)
+    # 2) Secondary deep feature scans (wheels, packages, motors) unless skipped;
+    # network only here, applied with the other db steps below
     # Decide deep scan policy
     # Default: if data came from S3 (staging/prod pipeline), skip deep scans to avoid outbound calls from VPC.
     # Allow explicit override via event.skip_deep_scan or env SKIP_DEEP_SCAN.
@@ -346,148 +622,31 @@ def handler(event=None, context=None):
     except Exception:  # pragma: no cover
         pass
 
-    deep_scan_performed = False
+    scan = None
     if not skip_scan:
 
         log.info("loader: starting feature deep scans")
 
-        # Build reverse maps: category -> list of (human_label, code)
-        wheels = []
-        packages = []
-        motors = []
-        for label, mapping in FILTERS.items():
-            for category, code in mapping.items():
-                c_low = category.lower()
-                if c_low == "wheels":
-                    wheels.append((label, code))
-                elif c_low == "package":
-                    packages.append((label, code))
-                elif c_low == "motor":
-                    motors.append((label, code))
-
-        # Helper to batch update list of ids
-        def _update_with_ids(sql_template: str, label: str, ids: list[str]):
-            if not ids:
-                return 0
-            # Use ANY(array) pattern; simpler to build VALUES list then update
-            # For portability, run one UPDATE per chunk
-            chunk_size = 200
-            total_updated = 0
-            for i in range(0, len(ids), chunk_size):
-                subset = ids[i : i + chunk_size]
-                execute(
-                    sql_template,
-                    {"ids": tuple(subset), "label": label},
-                )
-                total_updated += len(subset)
-            return total_updated
-
-        # Map package label -> column
-        package_column = {
-            "Performance": "performance",
-            "Pilot": "pilot",
-            "Plus": "plus",
-        }
-
-        # Wheels: find vehicles for each wheel code
-        wheel_updates = 0
-        for human, code in wheels:
-            ids = scraper.fetch_ids_for_filter(
-                "Wheels", code, scraper.DEFAULT_MODELS[0], scraper.DEFAULT_MARKET
-            )
-            if ids:
-                wheel_updates += _update_with_ids(
-                    "UPDATE vehicles SET wheels=%(label)s WHERE id IN %(ids)s AND (wheels IS NULL OR wheels != %(label)s);",
-                    human,
-                    list(ids),
-                )
-        log.info("feature-scan: wheels updated approx rows=%d", wheel_updates)
-
-        # Motors: similar pattern
-        motor_updates = 0
-        for human, code in motors:
-            ids = scraper.fetch_ids_for_filter(
-                "Motor", code, scraper.DEFAULT_MODELS[0], scraper.DEFAULT_MARKET
-            )
-            if ids:
-                motor_updates += _update_with_ids(
-                    "UPDATE vehicles SET motor=%(label)s WHERE id IN %(ids)s AND (motor IS NULL OR motor != %(label)s);",
-                    human,
-                    list(ids),
-                )
-        log.info("feature-scan: motors updated approx rows=%d", motor_updates)
-
-        # Packages: set boolean flags
-        pkg_updates = 0
-        for human, code in packages:
-            column = package_column.get(human)
-            if not column:
-                continue
-            ids = scraper.fetch_ids_for_filter(
-                "Package", code, scraper.DEFAULT_MODELS[0], scraper.DEFAULT_MARKET
-            )
-            if ids:
-                pkg_updates += _update_with_ids(
-                    f"UPDATE vehicles SET {column}=TRUE WHERE id IN %(ids)s AND {column}=FALSE;",
-                    human,
-                    list(ids),
-                )
-        log.info("feature-scan: packages updated approx rows=%d", pkg_updates)
-        # Coverage snapshot (approximate): counts after updates
-        try:
-            coverage_rows = fetch_all(
-                """
-                SELECT
-                  count(*) FILTER (WHERE wheels IS NOT NULL) AS wheels_set,
-                  count(*) FILTER (WHERE motor IS NOT NULL) AS motor_set,
-                  count(*) FILTER (WHERE performance) AS performance_set,
-                  count(*) FILTER (WHERE pilot) AS pilot_set,
-                  count(*) FILTER (WHERE plus) AS plus_set,
-                  count(*) AS total
-                FROM vehicles
-                """
-            )
-            if coverage_rows:
-                cv = coverage_rows[0]
-                log.info(
-                    "feature-scan: coverage wheels=%s/%s motor=%s/%s performance=%s pilot=%s plus=%s",
-                    cv["wheels_set"],
-                    cv["total"],
-                    cv["motor_set"],
-                    cv["total"],
-                    cv["performance_set"],
-                    cv["pilot_set"],
-                    cv["plus_set"],
-                )
-        except Exception as ce:  # pragma: no cover
-            log.warning("feature-scan: coverage query failed: %s", ce)
-        except Exception as e:
-            log.warning("feature deep scan failed: %s", e)
-        else:
-            deep_scan_performed = True
+        with run.span("deep_scan"):
+            scan = feature_scan.scan_features()  # MODELS[0] / MARKET envs
+        if scan.failed:
+            log.warning("feature-scan: failed codes=%s", [d.code for d in scan.failed])
     else:
         log.info("loader: deep feature scan skipped (%s)", reason or "policy")
 
-    # 4) Mark vehicles not seen today as unavailable
-    execute(MARK_UNAVAILABLE)
+    # 3) Load: every db step, in one transaction when single
+    with transaction() if single else contextlib.nullcontext():
+        loaded = _load(normalized, scan, run)
+    rows = loaded.pop("rows")
 
-    # 5) Export snapshot for the SPA
-    log.info("loader: export json ...")
-    rows = fetch_all(SELECT_EXPORT)
-    _export_json(rows)
+    # 4) Export snapshot for the SPA (after commit)
+    with run.span("export_upload"):
+        _export_json(rows)
     log.info("loader: export json done")
 
-    summary = {
-        "fetched": len(raw),
-        "inserted": inserted,
-        "updated": updated,
-        "price_changes": price_changes,
-        "exported": len(rows),
-        "inserted_ids": inserted_ids,
-        "price_change_ids": price_change_ids,
-        "price_change_details": price_change_details,
-        "deep_scan_skipped": not deep_scan_performed,
-    }
+    summary = {"fetched": fetched, **loaded}
+    inserted_ids = summary["inserted_ids"]
+    price_change_details = summary["price_change_details"]
     if inserted_ids:
         log.info(
             "Inserted IDs (%d):\n%s", len(inserted_ids), "\n".join(str(i) for i in inserted_ids)
@@ -503,6 +662,18 @@ def handler(event=None, context=None):
             len(price_change_details),
             "\n".join(lines),
         )
+    for name in (
+        "fetched",
+        "inserted",
+        "updated",
+        "rewritten",
+        "touched",
+        "price_changes",
+        "exported",
+        "features_changed",
+    ):
+        run.count(name, summary[name])
+    run.count("deep_scan_failed_codes", len(summary["deep_scan_failed_codes"]))
     log.info("Summary: %s", summary)
     return summary
 
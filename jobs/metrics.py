@@ -0,0 +1,132 @@
+# jobs/metrics.py
+"""Per-phase timing spans and one structured metrics record per job run.
+
+The record is a CloudWatch Embedded Metric Format (EMF) document printed to
+stdout as a single JSON line; Lambda ships stdout to CloudWatch Logs, which
+turns it into metrics (namespace METRICS_NAMESPACE, dimension Job) without
+any API calls. Phase timings are milliseconds, counts are plain numbers.
+
+Usage:
+  @metrics.instrumented("daily_refresh")
+  def handler(event=None, context=None):
+      run = metrics.current()
+      with run.span("s3_read"):
+          raw = _load_raw_from_s3()
+      run.count("fetched", len(raw))
+      return summary  # gains "timings_ms"
+
+Set METRICS_EMF=0 to skip printing (timings still land in the summary).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "PolestarFinder")
+EMF_ENABLED = os.getenv("METRICS_EMF", "1").lower() not in {"0", "false", "no"}
+
+_current: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar(
+    "run_metrics", default=None
+)
+
+
+class RunMetrics:
+    """Accumulates phase timings and counts for one job invocation."""
+
+    def __init__(self, job: str, namespace: str = NAMESPACE):
+        self.job = job
+        self.namespace = namespace
+        self.timings: Dict[str, float] = {}  # phase -> seconds (summed if re-entered)
+        self.counts: Dict[str, float] = {}
+        self.properties: Dict[str, object] = {}
+        self._started = time.perf_counter()
+        self.total: Optional[float] = None
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as phase ``name``; recorded even if it raises."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - t0
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def timings_ms(self) -> Dict[str, float]:
+        out = {name: round(secs * 1000, 1) for name, secs in self.timings.items()}
+        total = self.total if self.total is not None else time.perf_counter() - self._started
+        out["total"] = round(total * 1000, 1)
+        return out
+
+    def to_emf(self) -> dict:
+        timings = self.timings_ms()
+        metrics = [{"Name": f"{name}_ms", "Unit": "Milliseconds"} for name in timings]
+        metrics += [{"Name": name, "Unit": "Count"} for name in self.counts]
+        doc: dict = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {"Namespace": self.namespace, "Dimensions": [["Job"]], "Metrics": metrics}
+                ],
+            },
+            "Job": self.job,
+            **self.properties,
+        }
+        doc.update({f"{name}_ms": ms for name, ms in timings.items()})
+        doc.update(self.counts)
+        return doc
+
+    def finish(self, stream=None) -> Dict[str, float]:
+        """Stop the run clock, print the EMF record (unless disabled), return timings_ms."""
+        if self.total is None:
+            self.total = time.perf_counter() - self._started
+        if EMF_ENABLED:
+            out = stream or sys.stdout
+            out.write(json.dumps(self.to_emf(), separators=(",", ":"), default=str) + "\n")
+            out.flush()
+        return self.timings_ms()
+
+
+def current() -> RunMetrics:
+    """The active run's metrics; a throwaway recorder outside ``instrumented`` handlers."""
+    run = _current.get()
+    return run if run is not None else RunMetrics("adhoc")
+
+
+def instrumented(job: str) -> Callable:
+    """Decorator for Lambda handlers: one RunMetrics per call, emitted on success and failure."""
+
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def handler(event=None, context=None):
+            run = RunMetrics(job)
+            request_id = getattr(context, "aws_request_id", None)
+            if request_id:
+                run.properties["RequestId"] = request_id
+            token = _current.set(run)
+            try:
+                result = fn(event, context)
+            except Exception as e:
+                run.properties["Error"] = type(e).__name__
+                run.count("errors")
+                run.finish()
+                raise
+            finally:
+                _current.reset(token)
+            timings = run.finish()
+            if isinstance(result, dict):
+                result["timings_ms"] = timings
+            return result
+
+        return handler
+
+    return wrap
@@ -1,3 +1,7 @@
+from jobs import profiling
+
+
+@profiling.profiled("migrator")
 def handler(event, context):
     from database.migrate import main
 
@@ -0,0 +1,156 @@
+# jobs/profiling.py
+"""On-demand CPU / memory profiling of one job invocation.
+
+Switched per run, no redeploy needed:
+- env PROFILE=cpu|mem, or
+- event {"profile": "cpu"|"mem"} (takes precedence; "" / "off" disables)
+
+cpu runs the handler under cProfile and writes ``<job>-cpu-<ts>.prof``
+(pstats format, open with snakeviz / ``python -m pstats``) plus a ``.txt``
+with the top PROFILE_TOP functions by cumulative and own time. mem runs it
+under tracemalloc and writes ``<job>-mem-<ts>.tracemalloc`` (a Snapshot
+dump) plus a ``.txt`` with the peak and the top PROFILE_TOP allocation sites.
+
+Files go to s3://PROFILE_BUCKET/PROFILE_PREFIX when a bucket is configured
+(default: RAW_BUCKET), otherwise to PROFILE_DIR on local disk. They are
+written even when the handler raises, and their location is added to the
+returned summary under "profile". A failure to write them is logged, never
+raised.
+
+When disabled the wrapper is one dict/env lookup before calling the handler.
+
+Usage:
+  @profiling.profiled("daily_refresh")
+  def handler(event=None, context=None): ...
+"""
+
+from __future__ import annotations
+
+import cProfile
+import datetime as dt
+import functools
+import io
+import logging
+import os
+import pstats
+import tempfile
+import tracemalloc
+from typing import Callable, Dict
+
+PROFILE = os.getenv("PROFILE", "").lower()  # "" | cpu | mem
+PROFILE_BUCKET = os.getenv("PROFILE_BUCKET", os.getenv("RAW_BUCKET", ""))
+PROFILE_PREFIX = os.getenv("PROFILE_PREFIX", "profiles/")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "profiles"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "40"))
+PROFILE_FRAMES = int(os.getenv("PROFILE_FRAMES", "10"))  # tracemalloc traceback depth
+KINDS = ("cpu", "mem")
+
+log = logging.getLogger("profiling")
+
+
+def requested_kind(event=None) -> str:
+    """Profile kind for this invocation ("" when off); the event overrides env PROFILE."""
+    kind = PROFILE
+    if isinstance(event, dict) and "profile" in event:
+        kind = str(event.get("profile") or "").lower()
+    if kind in ("", "off", "0", "false", "none"):
+        return ""
+    if kind not in KINDS:
+        log.warning("profiling: unknown kind %r, expected one of %s", kind, KINDS)
+        return ""
+    return kind
+
+
+def _cpu_report(prof: cProfile.Profile, top: int) -> str:
+    buf = io.StringIO()
+    stats = pstats.Stats(prof, stream=buf)
+    stats.sort_stats("cumulative").print_stats(top)
+    buf.write("\n")
+    stats.sort_stats("tottime").print_stats(top)
+    return buf.getvalue()
+
+
+def _mem_report(snapshot: tracemalloc.Snapshot, peak: int, top: int) -> str:
+    lines = [f"peak traced memory: {peak / 1e6:.1f} MB", "", f"top {top} by line:"]
+    stats = snapshot.statistics("lineno")
+    lines += [str(s) for s in stats[:top]]
+    lines += ["", f"top {min(top, 10)} by traceback:"]
+    for s in snapshot.statistics("traceback")[: min(top, 10)]:
+        lines.append(f"{s.size / 1e6:.1f} MB in {s.count} blocks")
+        lines += [f"    {line}" for line in s.traceback.format()]
+    return "\n".join(lines) + "\n"
+
+
+def _persist(name: str, files: Dict[str, bytes], meta: dict) -> None:
+    try:
+        meta["location"] = _store(name, files)
+        log.info("profiling: %s profile written to %s.*", meta["kind"], meta["location"])
+    except Exception as e:
+        log.warning("profiling: could not write %s profile: %s", meta["kind"], e)
+
+
+def _store(name: str, files: Dict[str, bytes]) -> str:
+    """Write ``{suffix: data}`` as ``<name><suffix>``; returns the common location prefix."""
+    if PROFILE_BUCKET:
+        import boto3
+
+        s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
+        for suffix, data in files.items():
+            s3.put_object(Bucket=PROFILE_BUCKET, Key=f"{PROFILE_PREFIX}{name}{suffix}", Body=data)
+        return f"s3://{PROFILE_BUCKET}/{PROFILE_PREFIX}{name}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    for suffix, data in files.items():
+        with open(os.path.join(PROFILE_DIR, name + suffix), "wb") as f:
+            f.write(data)
+    return os.path.join(PROFILE_DIR, name)
+
+
+def _run_cpu(fn: Callable, event, context, name: str, meta: dict):
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn, event, context)
+    finally:
+        with tempfile.NamedTemporaryFile(suffix=".prof") as tmp:
+            prof.dump_stats(tmp.name)
+            raw = tmp.read()
+        _persist(name, {".prof": raw, ".txt": _cpu_report(prof, PROFILE_TOP).encode()}, meta)
+
+
+def _run_mem(fn: Callable, event, context, name: str, meta: dict):
+    already = tracemalloc.is_tracing()
+    if not already:
+        tracemalloc.start(PROFILE_FRAMES)
+    try:
+        return fn(event, context)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not already:
+            tracemalloc.stop()
+        with tempfile.NamedTemporaryFile(suffix=".tracemalloc") as tmp:
+            snapshot.dump(tmp.name)
+            raw = tmp.read()
+        report = _mem_report(snapshot, peak, PROFILE_TOP).encode()
+        _persist(name, {".tracemalloc": raw, ".txt": report}, meta)
+
+
+def profiled(job: str) -> Callable:
+    """Decorator for Lambda handlers: profile the call when PROFILE / event["profile"] asks."""
+
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def handler(event=None, context=None):
+            kind = requested_kind(event)
+            if not kind:
+                return fn(event, context)
+            name = f"{job}-{kind}-{dt.datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+            runner = _run_cpu if kind == "cpu" else _run_mem
+            meta = {"kind": kind}
+            result = runner(fn, event, context, name, meta)
+            if isinstance(result, dict):
+                result["profile"] = meta
+            return result
+
+        return handler
+
+    return wrap
@@ -5,11 +5,16 @@ import datetime as dt
 import json
 import logging
 import os
+import tempfile
 
 import boto3
 
-import scraper.scraper as scraper  # your scraper.fetch_raw()
-from scraper.filters import filters as FILTERS  # type: ignore
+import scraper.scraper as scraper  # your scraper.iter_vehicles()
+from jobs import metrics, profiling
+from scraper import checkpoint, code_parser, feature_scan, shards
+from scraper.fingerprint import FingerprintCache
+from scraper.inference import FeatureModel
+from scraper.pager import AdaptivePager
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 root_logger = logging.getLogger()
@@ -22,27 +27,347 @@ log.setLevel(LOG_LEVEL)
 REGION = os.getenv("AWS_REGION", "us-east-1")
 RAW_BUCKET = os.getenv("RAW_BUCKET")  # e.g., staging.polestarfinder.com
 RAW_KEY = os.getenv("RAW_KEY", "raw/latest.json")  # where we store latest snapshot
+SPOOL_MAX_BYTES = int(os.getenv("SNAPSHOT_SPOOL_MAX_BYTES", str(16 * 1024 * 1024)))  # then /tmp
+# id -> content hash of the ads in RAW_KEY, stored next to it
+FINGERPRINT_KEY = os.getenv(
+    "FINGERPRINT_KEY", os.path.join(os.path.dirname(RAW_KEY), "fingerprints.json")
+)
+# Reuse previous records for unchanged ads (loads RAW_KEY into memory first)
+REUSE_UNCHANGED = os.getenv("REUSE_UNCHANGED", "").lower() in {"1", "true", "yes"}
+# Token -> feature rules learned from the last deep scan; applied when the scan is skipped
+FEATURE_MODEL_KEY = os.getenv(
+    "FEATURE_MODEL_KEY", os.path.join(os.path.dirname(RAW_KEY), "feature_model.json")
+)
+INFERENCE_MIN_CONFIDENCE = float(os.getenv("INFERENCE_MIN_CONFIDENCE", "0.95"))
+# Size pages from measured latency/bytes, starting from the sizes chosen last run
+ADAPTIVE_PAGING = os.getenv("ADAPTIVE_PAGING", "").lower() in {"1", "true", "yes"}
+PAGE_SIZES_KEY = os.getenv(
+    "PAGE_SIZES_KEY", os.path.join(os.path.dirname(RAW_KEY), "page_sizes.json")
+)
+
+# Resumable scrapes: save progress every N pages (0 = off) and before the Lambda
+# deadline; the next invocation continues from it (see scraper.checkpoint)
+CHECKPOINT_EVERY_PAGES = checkpoint.EVERY_PAGES
+CHECKPOINT_KEY = os.getenv(
+    "CHECKPOINT_KEY", os.path.join(os.path.dirname(RAW_KEY), "checkpoint.json")
+)
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "")  # local directory instead of S3
 
 s3 = boto3.client("s3", region_name=REGION)
 
 
-def _timestamped_key() -> str:
-    ts = dt.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-    return f"raw/{ts}/inventory.json"
+def _write_snapshot(fh, vehicles) -> None:
+    """Serialize ``{"vehicles": [...]}`` into a binary file one vehicle at a time."""
+    fh.write(b'{"vehicles":[')
+    for i, v in enumerate(vehicles):
+        if i:
+            fh.write(b",")
+        fh.write(json.dumps(v, separators=(",", ":")).encode("utf-8"))
+    fh.write(b"]}")
+
+
+def _read_json(key: str):
+    obj = s3.get_object(Bucket=RAW_BUCKET, Key=key)
+    return json.loads(obj["Body"].read())
+
+
+def _load_fingerprints() -> FingerprintCache:
+    """Previous run's fingerprints (and records when REUSE_UNCHANGED); empty on first run."""
+    try:
+        previous = _read_json(FINGERPRINT_KEY).get("fingerprints") or {}
+    except Exception as e:
+        log.info("fingerprints: none loaded from s3://%s/%s (%s)", RAW_BUCKET, FINGERPRINT_KEY, e)
+        return FingerprintCache()
+    vehicles = None
+    if REUSE_UNCHANGED and previous:
+        try:
+            vehicles = _read_json(RAW_KEY).get("vehicles")
+        except Exception as e:
+            log.warning("fingerprints: previous snapshot unavailable, no reuse: %s", e)
+    return FingerprintCache.from_snapshot(previous, vehicles)
+
+
+def _load_feature_model():
+    try:
+        return FeatureModel.from_dict(_read_json(FEATURE_MODEL_KEY))
+    except Exception as e:
+        log.info("inference: no model at s3://%s/%s (%s)", RAW_BUCKET, FEATURE_MODEL_KEY, e)
+        return None
+
+
+def _save_feature_model(tokens_by_id, scan: feature_scan.FeatureScan) -> None:
+    """Train on this run's scanned vehicles and store the rules for skipped runs."""
+    if scan.failed or not tokens_by_id:
+        log.info("inference: not training (failed codes=%d)", len(scan.failed))
+        return
+    model = FeatureModel.train(tokens_by_id, scan.features)
+    log.info(
+        "inference: trained on %d vehicles, rules=%d, eval=%s",
+        model.trained_on,
+        len(model.to_dict()["rules"]),
+        model.evaluate(tokens_by_id, scan.features, INFERENCE_MIN_CONFIDENCE),
+    )
+    s3.put_object(
+        Bucket=RAW_BUCKET,
+        Key=FEATURE_MODEL_KEY,
+        Body=json.dumps(model.to_dict(), separators=(",", ":")).encode(),
+        ContentType="application/json",
+    )
+
+
+def _load_pager():
+    if not ADAPTIVE_PAGING:
+        return None
+    try:
+        state = _read_json(PAGE_SIZES_KEY)
+    except Exception as e:
+        log.info("pager: no sizes at s3://%s/%s (%s)", RAW_BUCKET, PAGE_SIZES_KEY, e)
+        state = None
+    return AdaptivePager.from_dict(state, initial=scraper.DEFAULT_LIMIT)
+
+
+def _checkpoint_store(shard_name: str = ""):
+    """Store for this scrape's checkpoint; each shard of a run gets its own key."""
+    key = CHECKPOINT_KEY
+    if shard_name:
+        stem, ext = os.path.splitext(key)
+        key = f"{stem}-{shard_name}{ext}"
+    if CHECKPOINT_DIR:
+        return checkpoint.LocalCheckpointStore(os.path.join(CHECKPOINT_DIR, os.path.basename(key)))
+    return checkpoint.S3CheckpointStore(s3, RAW_BUCKET, key)
+
+
+def _load_checkpoint(store, event, models, market):
+    """Checkpoint of an unfinished run to resume, or None to start fresh."""
+    if isinstance(event, dict) and event.get("resume") is False:
+        log.info("checkpoint: resume disabled by event")
+        return None
+    ckpt = checkpoint.load(store)
+    if ckpt is None:
+        return None
+    reason = ckpt.stale_reason()
+    if not reason and ckpt.cursor:
+        model, cursor_market, _ = ckpt.cursor
+        if model not in models or cursor_market != market:
+            reason = f"cursor {model}/{cursor_market} not in this scrape's models/market"
+    if reason:
+        log.warning("checkpoint: discarding %s (%s)", store.location, reason)
+        return None
+    ckpt.invocations += 1
+    log.info(
+        "checkpoint: resuming run %s (invocation %d, vehicles=%d, cursor=%s)",
+        ckpt.run_id,
+        ckpt.invocations,
+        len(ckpt.vehicles),
+        ckpt.cursor,
+    )
+    return ckpt
+
+
+def _timestamped_key(run_id: str = "") -> str:
+    ts = run_id or dt.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return f"{shards.RAW_PREFIX}/{ts}/inventory.json"
+
+
+def _merge_shards(run_id: str, expected=None) -> dict:
+    """Merge step of a sharded run: one de-duplicated snapshot, then move 'latest' to it."""
+    run = metrics.current()
+    with run.span("s3_read"):
+        vehicles, prints, found = shards.load_merged(s3, RAW_BUCKET, run_id)
+    if not found or (expected is not None and len(found) < int(expected)):
+        log.warning("shards: run %s has shards %s of %s, not merging", run_id, found, expected)
+        return {"ok": False, "complete": False, "run": run_id, "shards": found}
+
+    tkey = _timestamped_key(run_id)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as body:
+        with run.span("merge"):
+            _write_snapshot(body, vehicles)
+        body.seek(0)
+        with run.span("upload"):
+            s3.upload_fileobj(body, RAW_BUCKET, tkey, ExtraArgs={"ContentType": "application/json"})
+    with run.span("copy_latest"):
+        s3.copy_object(
+            Bucket=RAW_BUCKET,
+            Key=RAW_KEY,
+            CopySource={"Bucket": RAW_BUCKET, "Key": tkey},
+            ContentType="application/json",
+            MetadataDirective="REPLACE",
+        )
+    with run.span("state_save"):
+        s3.put_object(
+            Bucket=RAW_BUCKET,
+            Key=FINGERPRINT_KEY,
+            Body=json.dumps({"fingerprints": prints}, separators=(",", ":")).encode(),
+            ContentType="application/json",
+        )
+    _save_run_state(run_id, vehicles, found)
+    log.info(
+        "shards: merged %d shards of run %s into s3://%s/%s (vehicles=%d)",
+        len(found),
+        run_id,
+        RAW_BUCKET,
+        tkey,
+        len(vehicles),
+    )
+    run.count("vehicles", len(vehicles))
+    run.count("shards", len(found))
+    return {
+        "ok": True,
+        "complete": True,
+        "run": run_id,
+        "shards": found,
+        "vehicles": len(vehicles),
+        "snapshot_key": tkey,
+        "latest_key": RAW_KEY,
+    }
+
+
+def _save_run_state(run_id: str, vehicles, found) -> None:
+    """Run-wide state of a sharded run, which its shards leave to the merge step."""
+    run = metrics.current()
+    try:
+        scan = feature_scan.FeatureScan.from_dict(_read_json(shards.scan_key(run_id)))
+    except Exception as e:
+        log.info("inference: no shared scan for run %s, feature model unchanged (%s)", run_id, e)
+    else:
+        tokens_by_id = {
+            str(v.get("id")): v.get("raw_option_codes") or []
+            for v in vehicles
+            if v.get("model_family") == scan.model
+        }
+        with run.span("state_save"):
+            _save_feature_model(tokens_by_id, scan)
+    if ADAPTIVE_PAGING:
+        sizes = shards.load_page_sizes(s3, RAW_BUCKET, run_id, found)
+        if sizes:
+            log.info("pager: merged sizes of %d shards: %s", len(found), sizes)
+            with run.span("state_save"):
+                s3.put_object(
+                    Bucket=RAW_BUCKET,
+                    Key=PAGE_SIZES_KEY,
+                    Body=json.dumps({"sizes": sizes}).encode(),
+                    ContentType="application/json",
+                )
+
+
+def _scan_run(run_id: str, event: dict) -> dict:
+    """Deep scan step of a sharded run: scan once and store it for every shard."""
+    run = metrics.current()
+    model = event.get("model") or (scraper.DEFAULT_MODELS[0] if scraper.DEFAULT_MODELS else None)
+    with run.span("state_load"):
+        pager = _load_pager()
+    log.info("feature-scan: starting for run %s (shared by its shards)", run_id)
+    with run.span("feature_scan"):
+        scan = feature_scan.scan_features(
+            model=model, market=event.get("market") or None, pager=pager
+        )
+    if scan.failed:
+        log.warning("feature-scan: failed codes=%s", [d.code for d in scan.failed])
+    key = shards.scan_key(run_id)
+    with run.span("state_save"):
+        s3.put_object(
+            Bucket=RAW_BUCKET,
+            Key=key,
+            Body=json.dumps(scan.to_dict(), separators=(",", ":")).encode(),
+            ContentType="application/json",
+        )
+    counts = scan.field_counts()
+    log.info(
+        "feature-scan: wrote s3://%s/%s (%s) in %.1fs",
+        RAW_BUCKET,
+        key,
+        " ".join(f"{k}={v}" for k, v in counts.items()),
+        scan.seconds,
+    )
+    return {
+        "ok": True,
+        "run": run_id,
+        "scan_key": key,
+        "failed": [d.code for d in scan.failed],
+        **counts,
+    }
+
 
+def _load_shared_scan(run_id: str) -> feature_scan.FeatureScan:
+    """The run's shared deep scan; a shard never runs its own."""
+    key = shards.scan_key(run_id)
+    try:
+        return feature_scan.FeatureScan.from_dict(_read_json(key))
+    except Exception as e:
+        raise ValueError(
+            f"no shared deep scan for run {run_id} at s3://{RAW_BUCKET}/{key} ({e}); "
+            f'invoke {{"scan_run": "{run_id}"}} before the shards or set skip_deep_scan'
+        ) from e
+
+
+def _finish_shard(run_id, spec, tkey, counts, fingerprints, pager, store) -> dict:
+    """Shard tail: keep the fingerprints and page sizes next to the shard.
+
+    'latest', the feature model and PAGE_SIZES_KEY are not touched here; the
+    merge step saves them for the whole run (see _save_run_state).
+    """
+    run = metrics.current()
+    changes = fingerprints.summary()
+    with run.span("state_save"):
+        s3.put_object(
+            Bucket=RAW_BUCKET,
+            Key=shards.fingerprints_key(run_id, spec.index),
+            Body=json.dumps({"fingerprints": fingerprints.current}, separators=(",", ":")).encode(),
+            ContentType="application/json",
+        )
+        if pager is not None:
+            s3.put_object(
+                Bucket=RAW_BUCKET,
+                Key=shards.pages_key(run_id, spec.index),
+                Body=json.dumps(pager.to_dict()).encode(),
+                ContentType="application/json",
+            )
+    if store is not None:
+        with run.span("checkpoint"):
+            store.clear()
+    run.count("vehicles", counts["vehicles"])
+    for name in ("changed", "unchanged", "reused"):
+        run.count(name, changes[name])
+    return {
+        "ok": True,
+        "complete": True,
+        "run": run_id,
+        "shard": spec.index,
+        "vehicles": counts["vehicles"],
+        "snapshot_key": tkey,
+        **changes,
+    }
 
+
+@profiling.profiled("scrape_to_s3")
+@metrics.instrumented("scrape_to_s3")
 def handler(event=None, context=None):
+    run = metrics.current()
     log.info(
         "startup: LOG_LEVEL=%s, SKIP_DEEP_SCAN=%r, event_has_skip=%s",
         os.getenv("LOG_LEVEL"),
         os.getenv("SKIP_DEEP_SCAN"),
         isinstance(event, dict) and ("skip_deep_scan" in event),
     )
-    # 1) Scrape (internet OK, this lambda is NOT in a VPC)
-    data = scraper.fetch_raw()  # uses MODELS, MARKET, PAGE_LIMIT envs
-    log.info("scraped vehicles=%d", len(data))
+    if isinstance(event, dict) and event.get("merge_run"):
+        return _merge_shards(str(event["merge_run"]), event.get("shards"))
+    if isinstance(event, dict) and event.get("scan_run"):
+        return _scan_run(str(event["scan_run"]), event)
+
+    # Sharded fan-out: this invocation scrapes one slice of run event["run"]
+    spec = None
+    run_id = ""
+    if isinstance(event, dict) and event.get("shard") is not None:
+        spec = shards.ShardSpec.from_event(event["shard"])
+        run_id = str(event.get("run") or "")
+        if not run_id:
+            raise ValueError("a shard event needs the run id shared by all shards of the run")
+        log.info("shards: run %s shard %s", run_id, spec)
+    models = list(spec.models) if spec is not None and spec.models else scraper.DEFAULT_MODELS
+    market = (spec.market if spec is not None else None) or scraper.DEFAULT_MARKET
 
-    # 1b) Optional deep feature scans (outside VPC): enrich wheels/motor/packages
+    # 1) Optional deep feature scans (outside VPC): collect wheels/motor/packages
+    #    by id first so vehicles can be enriched while they stream in below.
     skip_scan = False
     reason = ""
     try:
@@ -55,127 +380,227 @@ def handler(event=None, context=None):
     except Exception:
         pass
 
-    if not skip_scan and data:
-        log.info("feature-scan: starting (outside VPC)")
-        # Build reverse lists from FILTERS
-        wheel_defs = []
-        package_defs = []
-        motor_defs = []
-        for label, mapping in FILTERS.items():
-            for category, code in mapping.items():
-                c_low = category.lower()
-                if c_low == "wheels":
-                    wheel_defs.append((label, code))
-                elif c_low == "package":
-                    package_defs.append((label, code))
-                elif c_low == "motor":
-                    motor_defs.append((label, code))
-
-        # Accumulators: id -> label/flags
-        wheels_by_id: dict[str, str] = {}
-        motors_by_id: dict[str, str] = {}
-        pkg_perf: set[str] = set()
-        pkg_pilot: set[str] = set()
-        pkg_plus: set[str] = set()
-
-        # Package label -> target set
-        package_target = {
-            "Performance": pkg_perf,
-            "Pilot": pkg_pilot,
-            "Plus": pkg_plus,
-        }
-
-        model = scraper.DEFAULT_MODELS[0] if scraper.DEFAULT_MODELS else "PS2"
-        market = scraper.DEFAULT_MARKET
+    # Checkpointing: resume an unfinished run (keeping its scan decision) or start one
+    store = None
+    if CHECKPOINT_EVERY_PAGES > 0:
+        store = _checkpoint_store(f"{run_id}-shard-{spec.index}" if spec is not None else "")
+    ckpt = None
+    if store is not None:
+        with run.span("state_load"):
+            ckpt = _load_checkpoint(store, event, models, market)
+        if ckpt is not None:
+            skip_scan = ckpt.skip_scan
+            reason = "checkpointed run"
+        else:
+            ckpt = checkpoint.ScrapeCheckpoint.new(skip_scan)
+    deadline = checkpoint.Deadline(context)
 
-        # Wheels
-        total_wheel_ids = 0
-        for human, code in wheel_defs:
-            try:
-                ids = scraper.fetch_ids_for_filter("Wheels", code, model, market)
-            except Exception as e:
-                log.warning("feature-scan: wheels code=%s failed: %s", code, e)
-                ids = set()
-            for vid in ids:
-                wheels_by_id[vid] = human
-            total_wheel_ids += len(ids)
-        log.info("feature-scan: wheels matched ids=%d unique=%d", total_wheel_ids, len(wheels_by_id))
-
-        # Motors
-        total_motor_ids = 0
-        for human, code in motor_defs:
-            try:
-                ids = scraper.fetch_ids_for_filter("Motor", code, model, market)
-            except Exception as e:
-                log.warning("feature-scan: motor code=%s failed: %s", code, e)
-                ids = set()
-            for vid in ids:
-                motors_by_id[vid] = human
-            total_motor_ids += len(ids)
-        log.info("feature-scan: motors matched ids=%d unique=%d", total_motor_ids, len(motors_by_id))
-
-        # Packages
-        total_pkg_ids = 0
-        for human, code in package_defs:
-            target = package_target.get(human)
-            if target is None:
-                continue
-            try:
-                ids = scraper.fetch_ids_for_filter("Package", code, model, market)
-            except Exception as e:
-                log.warning("feature-scan: package %s code=%s failed: %s", human, code, e)
-                ids = set()
-            target.update(ids)
-            total_pkg_ids += len(ids)
+    def _suspend():
+        with run.span("checkpoint"):
+            store.save(ckpt.to_bytes())
         log.info(
-            "feature-scan: packages matched ids=%d perf=%d pilot=%d plus=%d",
-            total_pkg_ids,
-            len(pkg_perf),
-            len(pkg_pilot),
-            len(pkg_plus),
+            "checkpoint: saved %s (vehicles=%d, cursor=%s), stopping before the deadline",
+            store.location,
+            len(ckpt.vehicles),
+            ckpt.cursor,
         )
+        run.count("suspended")
+        return {
+            "ok": True,
+            "complete": False,
+            "vehicles": len(ckpt.vehicles),
+            "checkpoint": store.location,
+            "cursor": ckpt.cursor,
+            "invocations": ckpt.invocations,
+        }
 
-        # Apply enrichment onto vehicles
-        wheels_set = motors_set = perf_set = pilot_set = plus_set = 0
-        for v in data:
-            vid = str(v.get("id"))
-            if vid in wheels_by_id:
-                v["wheels"] = wheels_by_id[vid]
-                wheels_set += 1
-            if vid in motors_by_id:
-                v["motor"] = motors_by_id[vid]
-                motors_set += 1
-            if vid in pkg_perf:
-                v["performance"] = True
-                perf_set += 1
-            if vid in pkg_pilot:
-                v["pilot"] = True
-                pilot_set += 1
-            if vid in pkg_plus:
-                v["plus"] = True
-                plus_set += 1
-
+    with run.span("state_load"):
+        pager = _load_pager()
+    scan = feature_scan.FeatureScan()
+    if not skip_scan:
+        previous = None
+        if ckpt is not None and ckpt.scan:
+            previous = feature_scan.FeatureScan.from_dict(ckpt.scan)
+        if previous is not None and not previous.pending:
+            log.info("feature-scan: reusing checkpointed scan")
+            scan = previous
+        elif spec is not None:
+            with run.span("state_load"):
+                scan = _load_shared_scan(run_id)
+            log.info("feature-scan: using the shared scan of run %s", run_id)
+        else:
+            log.info("feature-scan: starting (outside VPC)")
+            with run.span("feature_scan"):
+                scan = feature_scan.scan_features(
+                    model=models[0],
+                    market=market,
+                    pager=pager,
+                    previous=previous,
+                    stop=deadline.expired if store is not None else None,
+                )
+        if ckpt is not None:
+            ckpt.scan = scan.to_dict()
+            if scan.pending:
+                log.info("feature-scan: %d codes left for the next invocation", len(scan.pending))
+                return _suspend()
+        for d, ids in scan.ids_by_def.items():
+            log.debug("feature-scan: %s %s matched ids=%d", d.filter_type, d.code, len(ids))
+        if scan.failed:
+            log.warning("feature-scan: failed codes=%s", [d.code for d in scan.failed])
         log.info(
-            "feature-scan: applied wheels=%d motors=%d performance=%d pilot=%d plus=%d over total=%d",
-            wheels_set,
-            motors_set,
-            perf_set,
-            pilot_set,
-            plus_set,
-            len(data),
+            "feature-scan: matched %s in %.1fs",
+            " ".join(f"{k}={v}" for k, v in scan.field_counts().items()),
+            scan.seconds,
         )
     else:
         log.info("feature-scan: skipped (%s)", reason or "not requested")
+    # Skipped scan: predict the same fields from raw option tokens instead
+    with run.span("state_load"):
+        feature_model = _load_feature_model() if skip_scan else None
 
-    body = json.dumps({"vehicles": data}, separators=(",", ":")).encode("utf-8")
+    # 2) Scrape (internet OK, this lambda is NOT in a VPC), streaming each
+    #    enriched vehicle straight into the snapshot body.
+    counts = {"vehicles": 0, **dict.fromkeys(feature_scan.FEATURE_FIELDS, 0)}
+    with run.span("state_load"):
+        fingerprints = _load_fingerprints()
+    # Training samples: raw tokens of vehicles from the scanned model family
+    tokens_by_id = {}
+    # Checkpointed runs keep every vehicle (the partial snapshot) in ckpt.vehicles
+    resumed = len(ckpt.vehicles) if ckpt is not None else 0
+    start = None
+    if ckpt is not None and ckpt.invocations > 1:
+        counts.update(ckpt.counts)
+        fingerprints.merge(ckpt.fingerprints, ckpt.changes)
+        if ckpt.cursor:
+            start = (ckpt.cursor[0], ckpt.cursor[2])
+    pages = 0
+
+    def _on_page(model, offset):
+        nonlocal pages
+        pages += 1
+        ckpt.cursor = [model, market, offset]
+        ckpt.counts = dict(counts)
+        ckpt.fingerprints = fingerprints.current
+        ckpt.changes = fingerprints.summary()
+        if deadline.expired():
+            raise checkpoint.Suspended(ckpt.cursor)
+        if pages % CHECKPOINT_EVERY_PAGES == 0:
+            with run.span("checkpoint"):
+                store.save(ckpt.to_bytes())
+
+    def _enriched():
+        for v in ckpt.vehicles[:resumed] if ckpt is not None else ():
+            if not skip_scan and v.get("model_family") == scan.model:
+                tokens_by_id[str(v.get("id"))] = v.get("raw_option_codes") or []
+            yield v
+        # uses PAGE_LIMIT env
+        for v in scraper.iter_vehicles(
+            models=models,
+            market=market,
+            offset_range=spec.offset_range if spec is not None else None,
+            fingerprints=fingerprints,
+            pager=pager,
+            start=start,
+            on_page=_on_page if ckpt is not None else None,
+        ):
+            if feature_model is not None:
+                filled = feature_model.apply(v, INFERENCE_MIN_CONFIDENCE)
+            else:
+                filled = scan.apply(v)
+                if not skip_scan and v.get("model_family") == scan.model:
+                    tokens_by_id[str(v.get("id"))] = v.get("raw_option_codes") or []
+            for f in filled:
+                counts[f] += 1
+            counts["vehicles"] += 1
+            if ckpt is not None:
+                ckpt.vehicles.append(v)
+            yield v
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as body:
+        # fetch + parse + enrich + serialize, interleaved as the pages stream in
+        with run.span("scrape"):
+            try:
+                _write_snapshot(body, _enriched())
+            except checkpoint.Suspended:
+                return _suspend()
+        log.info("scraped vehicles=%d", counts["vehicles"])
+        log.info("code-parser: cache %s", code_parser.cache_stats())
+        if not skip_scan or feature_model is not None:
+            log.info(
+                "%s: applied wheels=%d motors=%d performance=%d pilot=%d plus=%d over total=%d",
+                "inference" if skip_scan else "feature-scan",
+                counts["wheels"],
+                counts["motor"],
+                counts["performance"],
+                counts["pilot"],
+                counts["plus"],
+                counts["vehicles"],
+            )
 
-    # 2) Write timestamped snapshot
-    tkey = _timestamped_key()
-    s3.put_object(Bucket=RAW_BUCKET, Key=tkey, Body=body, ContentType="application/json")
-    log.info("wrote s3://%s/%s", RAW_BUCKET, tkey)
+        # 3) Write timestamped snapshot (a shard writes its slot of the run instead)
+        tkey = _timestamped_key() if spec is None else shards.shard_key(run_id, spec.index)
+        body.seek(0)
+        with run.span("upload"):
+            s3.upload_fileobj(body, RAW_BUCKET, tkey, ExtraArgs={"ContentType": "application/json"})
+        log.info("wrote s3://%s/%s", RAW_BUCKET, tkey)
 
-    # 3) Overwrite 'latest' pointer (stable key the loader will read)
-    s3.put_object(Bucket=RAW_BUCKET, Key=RAW_KEY, Body=body, ContentType="application/json")
+    if spec is not None:
+        return _finish_shard(run_id, spec, tkey, counts, fingerprints, pager, store)
+
+    # 4) Overwrite 'latest' pointer (stable key the loader will read); server-side copy
+    with run.span("copy_latest"):
+        s3.copy_object(
+            Bucket=RAW_BUCKET,
+            Key=RAW_KEY,
+            CopySource={"Bucket": RAW_BUCKET, "Key": tkey},
+            ContentType="application/json",
+            MetadataDirective="REPLACE",
+        )
     log.info("updated s3://%s/%s", RAW_BUCKET, RAW_KEY)
+    if store is not None:
+        with run.span("checkpoint"):
+            store.clear()
+        log.info("checkpoint: run %s complete after %d invocations", ckpt.run_id, ckpt.invocations)
+
+    if not skip_scan:
+        with run.span("state_save"):
+            _save_feature_model(tokens_by_id, scan)
+
+    if pager is not None:
+        for key, stats in pager.summary().items():
+            log.info("pager: %s %s", key, stats)
+        with run.span("state_save"):
+            s3.put_object(
+                Bucket=RAW_BUCKET,
+                Key=PAGE_SIZES_KEY,
+                Body=json.dumps(pager.to_dict()).encode(),
+                ContentType="application/json",
+            )
+
+    # 5) Fingerprints of this snapshot, for the next run's change detection
+    changes = fingerprints.summary()
+    with run.span("state_save"):
+        s3.put_object(
+            Bucket=RAW_BUCKET,
+            Key=FINGERPRINT_KEY,
+            Body=json.dumps({"fingerprints": fingerprints.current}, separators=(",", ":")).encode(),
+            ContentType="application/json",
+        )
+    log.info(
+        "fingerprints: changed=%d unchanged=%d reused=%d",
+        changes["changed"],
+        changes["unchanged"],
+        changes["reused"],
+    )
 
-    return {"ok": True, "vehicles": len(data), "snapshot_key": tkey, "latest_key": RAW_KEY}
+    run.count("vehicles", counts["vehicles"])
+    for name in ("changed", "unchanged", "reused"):
+        run.count(name, changes[name])
+    return {
+        "ok": True,
+        "complete": True,
+        "vehicles": counts["vehicles"],
+        "snapshot_key": tkey,
+        "latest_key": RAW_KEY,
+        **changes,
+    }
@@ -0,0 +1,256 @@
+"""Local fake of the Polestar SearchVehicleAds GraphQL endpoint, for load tests.
+
+Serves SyntheticInventory data with the contract the scraper relies on:
+offset/limit paging with metadata, equalFilters/excludeFilters,
+sortOrder/sortProperty, the per-use-case selections (listing/ids/price/count)
+and the aliased ``SearchVehicleAdsBatch`` documents of the feature scan.
+Latency, 429s (with Retry-After) and 503s can be injected. Bodies are
+gzip-encoded when the client asks for it.
+
+Point the scraper at it with POLESTAR_API_URL:
+
+  python -m loadtest.server --count 100000 --port 8765 --latency 0.05 --throttle-rate 0.02
+  POLESTAR_API_URL=http://127.0.0.1:8765/ python -m scraper.scraper
+
+In-process (tests, benchmarks):
+  with serve(FakeApiConfig(count=10_000)) as (url, api): ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .synthetic import SyntheticInventory
+
+_ALIAS_RE = re.compile(r"\b(q\d+)\s*:\s*searchVehicleAds\b")
+
+
+@dataclass
+class FakeApiConfig:
+    count: int = 10_000  # ads per (model, market)
+    seed: int = 0
+    latency: float = 0.0  # seconds per request
+    latency_per_ad: float = 0.0  # extra seconds per ad returned
+    throttle_rate: float = 0.0  # share of requests answered 429
+    retry_after: float = 1.0  # Retry-After seconds on injected 429s
+    error_rate: float = 0.0  # share of requests answered 503
+    max_limit: int = 1000  # larger limits are capped, like the real API
+
+
+@dataclass
+class FakeApiStats:
+    requests: int = 0
+    throttled: int = 0
+    errors: int = 0
+    ads_served: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class FakeApi:
+    """Request handling independent of HTTP, so it can be driven directly too."""
+
+    def __init__(self, config: FakeApiConfig):
+        self.config = config
+        self.stats = FakeApiStats()
+        self._rng = random.Random(config.seed)
+        self._inventories: Dict[Tuple[str, str], SyntheticInventory] = {}
+        self._selections: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def inventory(self, model: str, market: str) -> SyntheticInventory:
+        with self._lock:
+            key = (model, market)
+            if key not in self._inventories:
+                self._inventories[key] = SyntheticInventory(
+                    self.config.count, model, market, self.config.seed
+                )
+            return self._inventories[key]
+
+    def _selected(self, inv: SyntheticInventory, variables: dict, equal) -> List[int]:
+        exclude = variables.get("excludeFilters") or []
+        sort = (variables.get("sortProperty") or "Price", variables.get("sortOrder") or "Ascending")
+        key = json.dumps([inv.model, inv.market, equal, exclude, sort], sort_keys=True)
+        with self._lock:
+            cached = self._selections.get(key)
+        if cached is None:
+            cached = inv.select(equal, exclude, *sort)
+            with self._lock:
+                self._selections[key] = cached
+        return cached
+
+    def search(self, variables: dict, offset: int, equal, shape: str) -> dict:
+        """One ``searchVehicleAds`` field result."""
+        inv = self.inventory(variables.get("carModel") or "PS2", variables.get("market") or "us")
+        selected = self._selected(inv, variables, equal or [])
+        limit = min(int(variables.get("limit") or 0), self.config.max_limit)
+        page = selected[offset : offset + limit]
+        ads = []
+        for i in page:
+            ad = inv.ad(i)
+            if shape == "ids":
+                ad = {"id": ad["id"]}
+            elif shape == "price":
+                ad = {"id": ad["id"], "price": ad["price"]}
+            ads.append(ad)
+        meta = {
+            "limit": limit,
+            "offset": offset,
+            "resultCount": len(ads),
+            "totalCount": len(selected),
+        }
+        return {"metadata": meta, "vehicleAds": ads}
+
+    def handle(self, body: dict) -> Tuple[int, dict, Dict[str, str]]:
+        """Return (status, json body, extra headers) for one GraphQL request."""
+        cfg = self.config
+        with self.stats.lock:
+            self.stats.requests += 1
+            roll = self._rng.random()
+        if roll < cfg.throttle_rate:
+            with self.stats.lock:
+                self.stats.throttled += 1
+            return (
+                429,
+                {"errors": [{"message": "Too Many Requests"}]},
+                {"Retry-After": f"{cfg.retry_after:g}"},
+            )
+        if roll < cfg.throttle_rate + cfg.error_rate:
+            with self.stats.lock:
+                self.stats.errors += 1
+            return 503, {"errors": [{"message": "Service Unavailable"}]}, {}
+
+        variables = body.get("variables") or {}
+        query = body.get("query") or ""
+        shape = _shape(query)
+        if body.get("operationName") == "SearchVehicleAdsBatch":
+            # alias q{i} reads offset $o{i} and equalFilters $f{i}
+            data = {}
+            for alias in _ALIAS_RE.findall(query):
+                i = alias[1:]
+                offset = int(variables.get(f"o{i}") or 0)
+                data[alias] = self.search(variables, offset, variables.get(f"f{i}"), shape)
+        else:
+            data = {
+                "searchVehicleAds": self.search(
+                    variables,
+                    int(variables.get("offset") or 0),
+                    variables.get("equalFilters"),
+                    shape,
+                )
+            }
+        served = sum(len(part["vehicleAds"]) for part in data.values())
+        with self.stats.lock:
+            self.stats.ads_served += served
+        delay = cfg.latency + cfg.latency_per_ad * served
+        if delay > 0:
+            time.sleep(delay)
+        return 200, {"data": data}, {}
+
+
+def _shape(query: str) -> str:
+    """Which selection set a query asks for (see scraper.SHAPE_SELECTIONS)."""
+    if "vehicleDetails" in query:
+        return "listing"
+    if "price" in query:
+        return "price"
+    return "ids"
+
+
+def _handler_for(api: FakeApi):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def do_POST(self):  # noqa: N802 (http.server naming)
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                status, payload, headers = 400, {"errors": [{"message": "bad json"}]}, {}
+            else:
+                status, payload, headers = api.handle(body)
+            out = json.dumps(payload, separators=(",", ":")).encode()
+            if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                out = gzip.compress(out, compresslevel=1)
+                headers["Content-Encoding"] = "gzip"
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):  # quiet by default
+            pass
+
+    return Handler
+
+
+def make_server(
+    config: FakeApiConfig, host: str = "127.0.0.1", port: int = 0
+) -> Tuple[ThreadingHTTPServer, FakeApi]:
+    api = FakeApi(config)
+    server = ThreadingHTTPServer((host, port), _handler_for(api))
+    server.daemon_threads = True
+    return server, api
+
+
+@contextlib.contextmanager
+def serve(config: Optional[FakeApiConfig] = None) -> Iterator[Tuple[str, FakeApi]]:
+    """Run a fake API on a free local port in a background thread; yields (url, api)."""
+    server, api = make_server(config or FakeApiConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        yield f"http://{host}:{port}/", api
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--count", type=int, default=10_000, help="ads per model/market")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    ap.add_argument("--latency-per-ad", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429s")
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of 503s")
+    args = ap.parse_args()
+
+    config = FakeApiConfig(
+        count=args.count,
+        seed=args.seed,
+        latency=args.latency,
+        latency_per_ad=args.latency_per_ad,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+    )
+    server, api = make_server(config, args.host, args.port)
+    print(f"POLESTAR_API_URL=http://{args.host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(api.stats)
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Synthetic SearchVehicleAds inventory at any scale (10k-1M ads).
+
+Option codes come from ``scraper/filters.py`` and the stock image URL layouts
+from the real ads in ``public/data/vehicles.json`` (one layout per model year),
+so code_parser, the feature deep scan and the inference rules see realistic
+input. Package flags leave a trace in the URL the same way the real layouts do
+(pilot -> JT02, plus -> JB11, performance -> ET02 + motor ET).
+
+The inventory is stored column-wise (one small array per attribute), and ads
+are only materialized as dicts when a page is served. That keeps 1M listings at
+tens of MB. Everything is derived from ``seed``, so runs are repeatable.
+
+Usage:
+  inv = SyntheticInventory(100_000, seed=1)
+  inv.ad(0)                     # vehicleAd dict as the API returns it
+  inv.matches(0, "Wheels", "R184")
+  python -m loadtest.synthetic --count 10000 --out ads.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import random
+import uuid
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from scraper.filters import filters as FILTERS  # type: ignore
+
+
+def _codes(category: str) -> List[str]:
+    return [m[category] for m in FILTERS.values() if category in m]
+
+
+EXTERIORS = _codes("Exterior")
+INTERIORS = _codes("Interior")
+WHEELS = _codes("Wheels")
+MOTORS = _codes("Motor")
+EDITIONS = [None] + _codes("Edition")
+PACKAGES = {"Performance": 1, "Pilot": 2, "Plus": 4}  # bit per package
+PACKAGE_CODES = {FILTERS[name]["Package"]: bit for name, bit in PACKAGES.items()}
+CYCLE_STATES = ["CertifiedPreOwned", "PreOwned", "New"]
+CYCLE_WEIGHTS = [0.65, 0.3, 0.05]
+
+LOCATIONS = [
+    "Austin", "Bellevue", "Boston", "Charlotte", "Columbus", "Denver", "Detroit", "Houston",
+    "Lisle", "Los Angeles", "Manhattan", "Marin", "Nashville", "New Canaan", "Palm Beach",
+    "Portland", "Princeton", "San Jose", "Scottsdale", "Short Hills", "Tampa", "Washington DC",
+]  # fmt: skip
+
+# Model year -> stock image path layout observed in public/data/vehicles.json
+YEARS = [2021, 2022, 2023, 2024]
+YEAR_WEIGHTS = [0.15, 0.55, 0.2, 0.1]
+IMAGE_LAYOUTS = {
+    2021: "MY20_1909/534/summary-transparent-v1/{ext}/{int}/{wheel}",
+    2022: "MY22_2108/534/summary-transparent-v2/{motor}/{ext}/{int}/{wheel}/{pilot}/BD02/EV01/"
+    "{plus}/_/_/_/_",
+    2023: "MY23_2215/534/summary-transparent-v2/{motor}/1/{ext}/{int}/{wheel}/LR01/{pilot}/BD02/"
+    "EV01/{plus}/_/{perf}",
+    2024: "MY24_2335/534/summary-transparent-v1/{motor}/1/31/{ext}/{int}/{wheel}/LR01/{pilot}/"
+    "BD02/EV01/{plus}/2G03/{perf}",
+}
+IMAGE_HOST = "https://cas.polestar.com/image/dynamic/"
+ANGLES = (0, 2, 3)
+
+REGISTRATION_EPOCH = dt.date(2020, 1, 1)
+MODEL_NAMES = {"PS2": "Polestar 2", "PS3": "Polestar 3", "PS4": "Polestar 4"}
+
+# Filter type -> column holding that attribute
+FILTER_COLUMNS = {
+    "Exterior": ("exterior", EXTERIORS),
+    "Interior": ("interior", INTERIORS),
+    "Wheels": ("wheels", WHEELS),
+    "Motor": ("motor", MOTORS),
+    "Edition": ("edition", EDITIONS),
+    "CycleState": ("cycle", CYCLE_STATES),
+}
+
+# sortProperty -> column used as the sort key
+SORT_COLUMNS = {"Price": "price", "Mileage": "mileage", "ModelYear": "year"}
+
+
+class SyntheticInventory:
+    """Column-wise synthetic inventory for one (model, market)."""
+
+    def __init__(self, count: int, model: str = "PS2", market: str = "us", seed: int = 0):
+        self.count = count
+        self.model = model
+        self.market = market
+        self.seed = seed
+        rng = random.Random(seed)
+        cols: Dict[str, array] = {
+            name: array(code)
+            for name, code in (
+                ("year", "H"),
+                ("price", "I"),
+                ("mileage", "I"),
+                ("location", "B"),
+                ("cycle", "B"),
+                ("exterior", "B"),
+                ("interior", "B"),
+                ("wheels", "B"),
+                ("motor", "B"),
+                ("edition", "B"),
+                ("packages", "B"),
+                ("registered", "H"),  # days after 2020-01-01
+            )
+        }
+        motor_perf = MOTORS.index("ET")
+        for _ in range(count):
+            year = rng.choices(YEARS, YEAR_WEIGHTS)[0]
+            cycle = rng.choices(range(len(CYCLE_STATES)), CYCLE_WEIGHTS)[0]
+            packages = 0
+            for bit, share in ((1, 0.1), (2, 0.55), (4, 0.45)):
+                if rng.random() < share:
+                    packages |= bit
+            motor = motor_perf if packages & 1 else rng.randrange(len(MOTORS))
+            mileage = 0 if CYCLE_STATES[cycle] == "New" else int(rng.expovariate(1 / 18000))
+            price = max(19000, int(rng.gauss(30000 + (year - 2021) * 4000, 5000)))
+            price += 3000 * bool(packages & 1) - min(mileage // 10, 8000)
+            cols["year"].append(year)
+            cols["price"].append(price - price % 50)
+            cols["mileage"].append(mileage)
+            cols["location"].append(rng.randrange(len(LOCATIONS)))
+            cols["cycle"].append(cycle)
+            cols["exterior"].append(rng.randrange(len(EXTERIORS)))
+            cols["interior"].append(rng.randrange(len(INTERIORS)))
+            cols["wheels"].append(rng.randrange(len(WHEELS)))
+            cols["motor"].append(motor)
+            cols["edition"].append(rng.choices(range(len(EDITIONS)), (0.96, 0.02, 0.02))[0])
+            cols["packages"].append(packages)
+            cols["registered"].append((year - 2020) * 365 + rng.randrange(365))
+        self.columns = cols
+
+    # ---------- Matching ----------
+    def matches(self, i: int, filter_type: str, value: str) -> bool:
+        """True if ad ``i`` has ``value`` for ``filter_type`` (API EqualFilter semantics)."""
+        if filter_type == "Package":
+            return bool(self.columns["packages"][i] & PACKAGE_CODES.get(value, 0))
+        column = FILTER_COLUMNS.get(filter_type)
+        if column is None:
+            return False
+        name, values = column
+        return values[self.columns[name][i]] == value
+
+    def select(
+        self,
+        equal: Sequence[dict] = (),
+        exclude: Sequence[dict] = (),
+        sort_property: str = "Price",
+        sort_order: str = "Ascending",
+    ) -> List[int]:
+        """Indices matching all ``equal`` and none of ``exclude`` filters, sorted."""
+        keep = range(self.count)
+        for f in equal or ():
+            keep = [i for i in keep if self.matches(i, f["filterType"], f["value"])]
+        for f in exclude or ():
+            keep = [i for i in keep if not self.matches(i, f["filterType"], f["value"])]
+        column = self.columns[SORT_COLUMNS.get(sort_property, "price")]
+        # index as tie-breaker keeps pages stable across requests
+        return sorted(
+            keep, key=lambda i: (column[i], i), reverse=sort_order.lower().startswith("desc")
+        )
+
+    # ---------- Materialization ----------
+    def ad_id(self, i: int) -> str:
+        rng = random.Random(f"{self.seed}:{self.model}:{self.market}:{i}")
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+
+    def image_urls(self, i: int) -> List[str]:
+        c = self.columns
+        packages = c["packages"][i]
+        path = IMAGE_LAYOUTS[c["year"][i]].format(
+            motor=MOTORS[c["motor"][i]],
+            ext=EXTERIORS[c["exterior"][i]],
+            int=INTERIORS[c["interior"][i]],
+            wheel=WHEELS[c["wheels"][i]],
+            pilot="JT02" if packages & 2 else "_",
+            plus="JB11" if packages & 4 else "JB13",
+            perf="ET02" if packages & 1 else "ET01",
+        )
+        return [
+            f"{IMAGE_HOST}{path}/default.png?market={self.market}&angle={a}&bg=00000000"
+            for a in ANGLES
+        ]
+
+    def ad(self, i: int) -> dict:
+        """vehicleAd dict with every field the listing query selects."""
+        c = self.columns
+        reg = c["registered"][i]
+        price = f"{c['price'][i]}.00"
+        return {
+            "id": self.ad_id(i),
+            "firstTimeRegistration": (REGISTRATION_EPOCH + dt.timedelta(days=reg)).isoformat(),
+            "price": {"retail": price, "dealer": price, "currency": "USD"},
+            "partnerLocation": {
+                "city": LOCATIONS[c["location"][i]],
+                "name": f"Polestar {LOCATIONS[c['location'][i]]}",
+            },
+            "mileageInfo": {"distance": c["mileage"][i], "metric": "Miles"},
+            "vehicleDetails": {
+                "vin": f"YSMSYN{self.seed % 100:02d}{i:09d}",
+                "modelDetails": {
+                    "displayName": MODEL_NAMES.get(self.model, self.model),
+                    "modelYear": c["year"][i],
+                },
+                "stockImages": self.image_urls(i),
+                "cycleState": CYCLE_STATES[c["cycle"][i]],
+            },
+        }
+
+    def iter_ads(self, indices: Optional[Sequence[int]] = None) -> Iterator[dict]:
+        for i in range(self.count) if indices is None else indices:
+            yield self.ad(i)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--count", type=int, default=10_000)
+    ap.add_argument("--model", default="PS2")
+    ap.add_argument("--market", default="us")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write {'vehicleAds': [...]} here instead of a summary")
+    args = ap.parse_args()
+
+    inv = SyntheticInventory(args.count, args.model, args.market, args.seed)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"vehicleAds": list(inv.iter_ads())}, f)
+        print(f"wrote {args.count} ads to {args.out}")
+    else:
+        print(json.dumps(inv.ad(0), indent=2))
+        sizes = sum(col.itemsize * len(col) for col in inv.columns.values())
+        print(f"{args.count} ads, {sizes / 1e6:.1f} MB of columns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Asyncio variant of the SearchVehicleAds scraper.
+
+One event loop drives every model in DEFAULT_MODELS and every page within each
+model concurrently over a single keep-alive connection pool (HTTP/2 when the
+``h2`` package is available). Payloads, normalization and option-code
+enrichment are shared with ``scraper.scraper`` so records are identical to
+``fetch_raw``.
+
+Requires the optional ``httpx`` dependency (``pip install polestarfinder[async]``)
+unless a client is passed in explicitly.
+
+Usage:
+  import asyncio
+  from scraper.async_scraper import fetch_raw_async
+  cars = asyncio.run(fetch_raw_async())
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Dict, List, Optional, Set
+
+from . import scraper as sync
+from .code_parser import default_code_to_label
+from .scheduler import parse_retry_after
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+# Upper bound on in-flight requests across all models/pages of one run
+DEFAULT_CONCURRENCY = int(os.getenv("ASYNC_CONCURRENCY", "8"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+# Connect/read timeouts, resets, protocol errors: retried like a 5xx
+TRANSPORT_ERRORS = (httpx.TransportError,) if httpx is not None else ()
+
+
+def _client(max_connections: int):
+    """Build the shared AsyncClient (HTTP/2 if h2 is installed)."""
+    if httpx is None:  # pragma: no cover - optional dependency
+        raise RuntimeError("httpx is required for the async scraper: pip install httpx[http2]")
+    try:
+        import h2  # noqa: F401
+
+        http2 = True
+    except ImportError:
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    return httpx.AsyncClient(headers=sync.HEADERS, http2=http2, limits=limits, timeout=20)
+
+
+async def _post_json(client, sem: asyncio.Semaphore, payload: dict) -> dict:
+    """POST one payload, retrying 429/5xx and transport errors with _session()'s backoff.
+
+    A 429's Retry-After header, when present, replaces the backoff delay.
+    """
+    attempt = 0
+    while True:
+        wait = None
+        try:
+            async with sem:
+                resp = await client.post(sync.API_URL, json=payload, timeout=20)
+        except TRANSPORT_ERRORS:
+            if attempt >= MAX_RETRIES:
+                raise
+        else:
+            if resp.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                resp.raise_for_status()
+                return sync._decode_json(resp)
+            if resp.status_code == 429:
+                wait = parse_retry_after(resp.headers.get("Retry-After"))
+        await asyncio.sleep(BACKOFF_FACTOR * (2**attempt) if wait is None else wait)
+        attempt += 1
+
+
+async def _fetch_model_pages(
+    client, sem: asyncio.Semaphore, model: str, market: str, limit: int, build
+) -> List[dict]:
+    """Fetch page one, then all remaining offsets of a model concurrently.
+
+    A page that still fails after its retries fails the model (as in
+    ``fetch_raw``), but only once every other page has settled, so no request
+    is left running against a client that is about to be closed.
+    """
+    first = await _post_json(client, sem, build(0))
+    meta, ads = sync._page_parts(first)
+    step = int(meta.get("resultCount") or len(ads))
+    total = int(meta.get("totalCount") or step)
+    if step <= 0 or step >= total:
+        return [first]
+    rest = await asyncio.gather(
+        *(_post_json(client, sem, build(off)) for off in range(step, total, step)),
+        return_exceptions=True,
+    )
+    for block in rest:
+        if isinstance(block, BaseException):
+            raise block
+    return [first, *rest]
+
+
+async def fetch_raw_async(
+    models: Optional[List[str]] = None,
+    market: Optional[str] = None,
+    page_limit: Optional[int] = None,
+    client=None,
+    max_concurrency: Optional[int] = None,
+) -> List[Dict]:
+    """Async counterpart of ``fetch_raw``: same records, same order.
+
+    Models are scraped concurrently; results are concatenated in model order
+    and offset order within each model.
+    """
+    models = models or sync.DEFAULT_MODELS
+    market = market or sync.DEFAULT_MARKET
+    limit = page_limit or sync.DEFAULT_LIMIT
+    concurrency = max(int(max_concurrency or DEFAULT_CONCURRENCY), 1)
+
+    code_to_label = default_code_to_label()
+
+    sem = asyncio.Semaphore(concurrency)
+    owns_client = client is None
+    if owns_client:
+        client = _client(concurrency)
+    try:
+        per_model = await asyncio.gather(
+            *(
+                _fetch_model_pages(
+                    client,
+                    sem,
+                    model,
+                    market,
+                    limit,
+                    lambda off, m=model: sync._payload(m, market, off, limit),
+                )
+                for model in models
+            )
+        )
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    out: List[Dict] = []
+    for model, blocks in zip(models, per_model):
+        for block in blocks:
+            _, ads = sync._page_parts(block)
+            for ad in ads:
+                out.append(sync._build_vehicle(ad, model, code_to_label))
+    return out
+
+
+async def fetch_ids_for_filter_async(
+    filter_type: str,
+    code: str,
+    model: str,
+    market: str,
+    page_limit: int = 200,
+    client=None,
+    max_concurrency: Optional[int] = None,
+) -> Set[str]:
+    """Async counterpart of ``fetch_ids_for_filter``.
+
+    Best-effort like the sync version: a failure logs and returns what was
+    collected (nothing, since pages are gathered together).
+    """
+    concurrency = max(int(max_concurrency or DEFAULT_CONCURRENCY), 1)
+    sem = asyncio.Semaphore(concurrency)
+    owns_client = client is None
+    if owns_client:
+        client = _client(concurrency)
+    ids: Set[str] = set()
+    try:
+        blocks = await _fetch_model_pages(
+            client,
+            sem,
+            model,
+            market,
+            page_limit,
+            lambda off: sync._build_feature_payload(
+                model, market, filter_type, code, off, page_limit
+            ),
+        )
+    except Exception as e:  # pragma: no cover - network variability
+        print(f"[feature-scan] {filter_type}={code} failed: {e}")
+        blocks = []
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    for block in blocks:
+        _, ads = sync._page_parts(block)
+        for ad in ads:
+            vid = ad.get("id")
+            if vid is not None:
+                ids.add(str(vid))
+    return ids
+
+
+if __name__ == "__main__":
+    cars = asyncio.run(fetch_raw_async())
+    print(f"Fetched {len(cars)} vehicles")
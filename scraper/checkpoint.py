@@ -0,0 +1,182 @@
+"""Checkpointed, resumable scrapes for invocations that may time out.
+
+A scrape that outlives one Lambda invocation used to start over from zero.
+``ScrapeCheckpoint`` holds everything needed to continue it instead:
+
+- ``scan``: the feature deep scan so far (FeatureScan.to_dict(); completed
+  codes are reused, pending/failed ones run again)
+- ``cursor``: [model, market, offset] of the next SearchVehicleAds page
+- ``vehicles``: every enriched vehicle already scraped, in snapshot order
+- ``counts`` / ``fingerprints`` / ``changes``: running totals for the summary
+
+The scrape job saves it every CHECKPOINT_EVERY_PAGES pages and whenever the
+invocation gets within CHECKPOINT_RESERVE_SECONDS of its deadline, then stops
+with ``Suspended``. The next invocation resumes from it unless it is older
+than CHECKPOINT_MAX_AGE_SECONDS or has already been resumed
+CHECKPOINT_MAX_INVOCATIONS times; the final invocation writes the merged
+snapshot and clears the checkpoint.
+
+Stores: ``LocalCheckpointStore`` (one file) or ``S3CheckpointStore`` (one key).
+
+Usage:
+  store = S3CheckpointStore(s3, bucket, "raw/checkpoint.json")
+  ckpt = load(store) or ScrapeCheckpoint.new()
+  deadline = Deadline(context)
+  ... store.save(ckpt.to_bytes()); raise Suspended(...) when deadline.expired()
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+EVERY_PAGES = int(os.getenv("CHECKPOINT_EVERY_PAGES", "0"))  # 0 disables checkpointing
+RESERVE_SECONDS = float(os.getenv("CHECKPOINT_RESERVE_SECONDS", "60"))
+MAX_AGE_SECONDS = float(os.getenv("CHECKPOINT_MAX_AGE_SECONDS", str(6 * 3600)))
+MAX_INVOCATIONS = int(os.getenv("CHECKPOINT_MAX_INVOCATIONS", "10"))
+
+VERSION = 1
+
+
+class Suspended(Exception):
+    """Raised to stop a scrape after its checkpoint was saved."""
+
+
+@dataclass
+class ScrapeCheckpoint:
+    run_id: str
+    started_at: float
+    updated_at: float = 0.0
+    invocations: int = 1
+    skip_scan: bool = False
+    scan: Optional[dict] = None
+    cursor: Optional[list] = None  # [model, market, next offset]
+    vehicles: List[dict] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=dict)
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    changes: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def new(cls, skip_scan: bool = False) -> "ScrapeCheckpoint":
+        now = time.time()
+        return cls(
+            run_id=uuid.uuid4().hex[:12], started_at=now, updated_at=now, skip_scan=skip_scan
+        )
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.started_at
+
+    def stale_reason(
+        self, max_age: float = MAX_AGE_SECONDS, max_invocations: int = MAX_INVOCATIONS
+    ) -> str:
+        """Why this checkpoint must not be resumed ("" when it may)."""
+        if self.age() > max_age:
+            return f"older than {max_age:.0f}s"
+        if self.invocations >= max_invocations:
+            return f"already resumed {self.invocations - 1} times"
+        return ""
+
+    def to_bytes(self) -> bytes:
+        self.updated_at = time.time()
+        return json.dumps({"version": VERSION, **asdict(self)}, separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "ScrapeCheckpoint":
+        data = json.loads(raw)
+        if data.pop("version", None) != VERSION:
+            raise ValueError("unsupported checkpoint version")
+        return cls(**data)
+
+
+class LocalCheckpointStore:
+    """Checkpoint kept in one file on local disk."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @property
+    def location(self) -> str:
+        return self.path
+
+    def load(self) -> Optional[bytes]:
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, raw: bytes) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # write-then-rename so a timeout mid-write leaves the previous checkpoint intact
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class S3CheckpointStore:
+    """Checkpoint kept in one S3 object (PUTs are atomic)."""
+
+    def __init__(self, client, bucket: str, key: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+
+    @property
+    def location(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+    def load(self) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key)["Body"].read()
+        except Exception:
+            return None
+
+    def save(self, raw: bytes) -> None:
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key, Body=raw, ContentType="application/json"
+        )
+
+    def clear(self) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.key)
+
+
+def load(store) -> Optional[ScrapeCheckpoint]:
+    """The stored checkpoint, or None if there is none or it cannot be read."""
+    raw = store.load()
+    if not raw:
+        return None
+    try:
+        return ScrapeCheckpoint.from_bytes(raw)
+    except (ValueError, TypeError) as e:
+        print(f"[checkpoint] ignoring unreadable checkpoint at {store.location}: {e}")
+        return None
+
+
+class Deadline:
+    """Whether the Lambda invocation is within ``reserve`` seconds of its timeout.
+
+    Never expires without a context exposing ``get_remaining_time_in_millis``
+    (local runs, tests).
+    """
+
+    def __init__(self, context=None, reserve: float = RESERVE_SECONDS):
+        self._remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+        self.reserve = reserve
+
+    def expired(self) -> bool:
+        if self._remaining_ms is None:
+            return False
+        return self._remaining_ms() / 1000.0 < self.reserve
@@ -8,6 +8,16 @@ Exposed functions:
 - extract_option_codes(image_urls) -> set[str]
 - classify_codes(codes) -> dict with keys: exterior_code, interior_code, motor_code, raw_option_codes (set)
 - build_reverse_maps(filters_dict) -> (code_to_label, label_to_code)
+- default_code_to_label() -> code_to_label built once from filters.py
+- configuration_key(url) -> image URL minus host and query (angle etc.)
+- enrich_vehicle(vehicle) / enrich_many(vehicles) -> set raw_option_codes + labels in place
+- cache_stats() -> hit/miss counters of the parse caches
+
+Memoization: all stock images of a vehicle share one configurator path and
+differ only in the query string (``angle=``), and many vehicles share a
+configuration. Each unique configuration key is parsed once and each unique
+set of keys is classified once; both live in bounded LRU caches
+(CODE_CACHE_SIZE entries each).
 
 Classification rules:
 - Motor codes: EG, FE, FD, ED, ET
@@ -21,8 +31,12 @@ these tokens without stronger validation.
 
 from __future__ import annotations
 
+import os
 import re
-from typing import Dict, Iterable, Set, Tuple
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
 MOTOR_CODES = {"EG", "FE", "FD", "ED", "ET"}
 
@@ -33,33 +47,112 @@ FILE_END_RE = re.compile(r"\.png$", re.IGNORECASE)
 NUMERIC_5_RE = re.compile(r"^\d{5}$")
 INTERIOR_RE = re.compile(r"^(R[A-Z0-9]{5}|BST230)$")  # includes special BST interior code
 
+CACHE_SIZE = int(os.getenv("CODE_CACHE_SIZE", "4096"))
+
+
+class LRUCache:
+    """Small thread-safe LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(maxsize, 1)
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[object, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# configuration key -> frozenset of tokens
+_KEY_CACHE = LRUCache(CACHE_SIZE)
+# frozenset of configuration keys -> enrichment tuple (see _enrich_keys)
+_ENRICH_CACHE = LRUCache(CACHE_SIZE)
+
+
+def configuration_key(url: str) -> Optional[str]:
+    """Return the configurator path of an image URL (no scheme, host or query).
+
+    Stock images of one configuration differ only in query parameters such as
+    ``angle``, so they share a key. Returns None for unparsable URLs.
+    """
+    if not url or "//" not in url:
+        return None
+    try:
+        path = url.split("//", 1)[1]
+        # drop domain
+        path = path.split("/", 1)[1]
+    except IndexError:
+        return None
+    return path.split("?", 1)[0]
+
+
+def _tokens_for_key(key: str) -> FrozenSet[str]:
+    """Split one configuration key into candidate code tokens (uncached)."""
+    codes: Set[str] = set()
+    segments = TOKEN_SPLIT_RE.split(key)
+    for seg in segments:
+        if not seg or seg in {"_", "summary-transparent-v1", "summary-transparent-v2"}:
+            continue
+        if FILE_END_RE.search(seg):
+            continue
+        # Keep plausible segments; final classification later.
+        # Avoid very long segments (like MY24_2335) unless they are codes we care about; skip those now.
+        if len(seg) > 12:
+            continue
+        codes.add(seg)
+    return frozenset(codes)
+
+
+def _cached_tokens(key: str) -> FrozenSet[str]:
+    tokens = _KEY_CACHE.get(key)
+    if tokens is None:
+        tokens = _tokens_for_key(key)
+        _KEY_CACHE.put(key, tokens)
+    return tokens
+
 
 def extract_option_codes(image_urls: Iterable[str]) -> Set[str]:
     """Extract raw code tokens from image URL paths.
 
     Strategy: split path into segments, discard obvious non-code segments, collect candidate tokens.
+    Query strings never carry option codes and are ignored; each configuration
+    key is parsed once and then served from the LRU cache.
     """
     codes: Set[str] = set()
     for url in image_urls:
-        if not url or "//" not in url:
-            continue
-        try:
-            path = url.split("//", 1)[1]
-            # drop domain
-            path = path.split("/", 1)[1]
-        except IndexError:
-            continue
-        segments = TOKEN_SPLIT_RE.split(path)
-        for seg in segments:
-            if not seg or seg in {"_", "summary-transparent-v1", "summary-transparent-v2"}:
-                continue
-            if FILE_END_RE.search(seg):
-                continue
-            # Keep plausible segments; final classification later.
-            # Avoid very long segments (like MY24_2335) unless they are codes we care about; skip those now.
-            if len(seg) > 12:
-                continue
-            codes.add(seg)
+        key = configuration_key(url)
+        if key is not None:
+            codes |= _cached_tokens(key)
     return codes
 
 
@@ -145,6 +238,81 @@ def enrich_labels(classified: Dict[str, object], code_to_label: Dict[str, Tuple[
     return result
 
 
+@lru_cache(maxsize=1)
+def default_code_to_label() -> Dict[str, Tuple[str, str]]:
+    """code_to_label for scraper/filters.py, built once per process.
+
+    Enrichment results are only cached for this map (identity check), so pass it
+    (or nothing) to enrich_vehicle to benefit from the caches.
+    """
+    from .filters import filters as FILTERS  # type: ignore
+
+    code_to_label, _ = build_reverse_maps(FILTERS)
+    return code_to_label
+
+
+def _enrich_keys(
+    keys: FrozenSet[str], code_to_label: Dict[str, Tuple[str, str]]
+) -> Tuple[Tuple[str, ...], Optional[str], Optional[str], Optional[str]]:
+    """(sorted raw tokens, exterior_label, interior_label, motor_label) for a key set."""
+    raw: Set[str] = set()
+    for key in keys:
+        raw |= _cached_tokens(key)
+    enriched = enrich_labels(classify_codes(raw, code_to_label), code_to_label)
+    return (
+        tuple(sorted(raw)),
+        enriched.get("exterior_label"),
+        enriched.get("interior_label"),
+        enriched.get("motor_label"),
+    )
+
+
+def enrich_vehicle(
+    vehicle: Dict, code_to_label: Optional[Dict[str, Tuple[str, str]]] = None
+) -> Dict:
+    """Attach raw_option_codes and exterior/interior/motor labels from stock_images.
+
+    Existing exterior/interior/motor values are not overwritten. Results are
+    memoized per unique configuration when using the default map.
+    """
+    default = default_code_to_label()
+    code_to_label = default if code_to_label is None else code_to_label
+    keys = frozenset(
+        k for k in (configuration_key(u) for u in vehicle.get("stock_images") or []) if k
+    )
+    if code_to_label is default:
+        result = _ENRICH_CACHE.get(keys)
+        if result is None:
+            result = _enrich_keys(keys, code_to_label)
+            _ENRICH_CACHE.put(keys, result)
+    else:
+        result = _enrich_keys(keys, code_to_label)
+
+    raw, exterior, interior, motor = result
+    # Attach raw codes (list for JSON friendliness) for future heuristic use
+    vehicle["raw_option_codes"] = list(raw)
+    if not vehicle.get("exterior") and exterior:
+        vehicle["exterior"] = exterior
+    if not vehicle.get("interior") and interior:
+        vehicle["interior"] = interior
+    if not vehicle.get("motor") and motor:
+        vehicle["motor"] = motor
+    # Wheel label intentionally not populated from URL parsing (unreliable)
+    return vehicle
+
+
+def enrich_many(
+    vehicles: Iterable[Dict], code_to_label: Optional[Dict[str, Tuple[str, str]]] = None
+) -> List[Dict]:
+    """Batch form of enrich_vehicle; returns the (mutated) vehicles as a list."""
+    return [enrich_vehicle(v, code_to_label) for v in vehicles]
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    """Hit/miss counters of the configuration-key and enrichment caches."""
+    return {"config_keys": _KEY_CACHE.stats(), "enrichment": _ENRICH_CACHE.stats()}
+
+
 # Convenience: ephemeral test harness (manual run)
 if __name__ == "__main__":
     from scraper.filters import filters as FILTERS  # type: ignore
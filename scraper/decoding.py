@@ -0,0 +1,154 @@
+"""Response body decoding for the Polestar API: decompress at most once, parse from bytes.
+
+requests/urllib3 (and httpx) already undo gzip/deflate/br, and zstd when the
+``zstandard`` package is installed, before ``resp.content`` is read. The old
+``_decode_json`` then tried to decompress again, failed, and fell back to
+``resp.text`` (charset detection + a str copy). Here a body is only
+decompressed if it still looks compressed, and JSON is parsed straight from
+bytes.
+
+JSON backend (env JSON_BACKEND): ``auto`` (default) picks orjson, then msgspec,
+then the stdlib; ``orjson``/``msgspec``/``json`` force one.
+
+Exposed:
+- ACCEPT_ENCODING: Accept-Encoding value listing only codecs we can decode
+- decode_body(body, content_encoding) -> bytes
+- loads(data) -> object
+- decode_json(body, content_encoding, parse=None) -> object
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import zlib
+from typing import Callable, Dict
+
+import brotli
+
+# ---------- Codecs ----------
+try:  # Python 3.14+
+    from compression import zstd as _zstd_std  # type: ignore
+
+    def _zstd_decompress(data: bytes) -> bytes:
+        return _zstd_std.decompress(data)
+
+except ImportError:
+    try:
+        import zstandard as _zstandard  # type: ignore
+
+        def _zstd_decompress(data: bytes) -> bytes:
+            # stream reader copes with frames that omit the content size
+            return _zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+    except ImportError:
+        _zstd_decompress = None  # type: ignore[assignment]
+
+
+def _deflate_decompress(data: bytes) -> bytes:
+    try:
+        return zlib.decompress(data)
+    except zlib.error:  # raw deflate stream without zlib header
+        return zlib.decompress(data, -zlib.MAX_WBITS)
+
+
+DECOMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    "gzip": gzip.decompress,
+    "deflate": _deflate_decompress,
+    "br": brotli.decompress,
+}
+if _zstd_decompress is not None:
+    DECOMPRESSORS["zstd"] = _zstd_decompress
+
+ACCEPT_ENCODING = ", ".join(DECOMPRESSORS)
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_JSON_START = frozenset(b"{[")
+_WHITESPACE = b" \t\r\n"
+
+
+def _looks_decoded(body: bytes) -> bool:
+    start = body.lstrip(_WHITESPACE)[:1]
+    return not start or start[0] in _JSON_START
+
+
+def decode_body(body: bytes, content_encoding: str = "") -> bytes:
+    """Return the plain body, decompressing only if the transport has not already.
+
+    ``content_encoding`` may list several codings ("gzip, br"); they are undone
+    in reverse order. Unknown codings are left alone and will fail in ``loads``.
+    """
+    if _looks_decoded(body):
+        return body
+    codings = [c.strip().lower() for c in (content_encoding or "").split(",") if c.strip()]
+    if not codings:
+        # No header but compressed bytes: trust the magic numbers
+        if body[:2] == _GZIP_MAGIC:
+            codings = ["gzip"]
+        elif body[:4] == _ZSTD_MAGIC and "zstd" in DECOMPRESSORS:
+            codings = ["zstd"]
+    for coding in reversed(codings):
+        fn = DECOMPRESSORS.get(coding)
+        if fn is None or _looks_decoded(body):
+            break
+        body = fn(body)
+    return body
+
+
+# ---------- JSON backends ----------
+def _stdlib_loads(data: bytes):
+    return json.loads(data)
+
+
+def _orjson_loads():
+    import orjson  # type: ignore
+
+    return orjson.loads
+
+
+def _msgspec_loads():
+    import msgspec  # type: ignore
+
+    return msgspec.json.decode
+
+
+_BACKENDS: Dict[str, Callable[[], Callable[[bytes], object]]] = {
+    "orjson": _orjson_loads,
+    "msgspec": _msgspec_loads,
+    "json": lambda: _stdlib_loads,
+}
+
+
+def get_loads(name: str = "auto") -> Callable[[bytes], object]:
+    """Return a bytes -> object JSON parser for ``name`` (auto = fastest installed)."""
+    if name != "auto":
+        return _BACKENDS[name]()
+    for candidate in ("orjson", "msgspec"):
+        try:
+            return _BACKENDS[candidate]()
+        except ImportError:
+            continue
+    return _stdlib_loads
+
+
+BACKEND = os.getenv("JSON_BACKEND", "auto")
+loads = get_loads(BACKEND)
+
+
+def decode_json(body: bytes, content_encoding: str = "", parse=None):
+    """Parse a response body, decompressing it at most once.
+
+    Brotli has no magic number and its output can begin with ``[`` or ``{``, so
+    a body that looked decoded but fails to parse is decompressed explicitly.
+    ``parse`` overrides the configured JSON backend.
+    """
+    parse = parse or loads
+    try:
+        return parse(decode_body(body, content_encoding))
+    except Exception:
+        fn = DECOMPRESSORS.get((content_encoding or "").strip().lower())
+        if fn is None:
+            raise
+        return parse(fn(body))
@@ -0,0 +1,227 @@
+"""Feature deep scan: learn wheels/motor/packages per vehicle id via filtered searches.
+
+URL parsing (code_parser) cannot reliably see wheels or packages, so for every
+Wheels/Motor/Package code in ``filters.py`` we ask the API which vehicle ids
+match. All codes run concurrently over one pooled session and each code's pages
+are fetched in parallel (PAGE_WORKERS). With FEATURE_SCAN_BATCH_SIZE > 1 the
+pages are instead packed into aliased GraphQL batches, falling back to single
+queries if the server rejects them.
+
+Exposed:
+- feature_defs(filters) -> list[FeatureDef]
+- scan_features(model, market, ...) -> FeatureScan (id -> {field: value} map)
+- FeatureScan.to_dict() / from_dict(): completed codes, for checkpoints; pass
+  the restored scan as ``previous`` to only run the codes still missing
+
+Both jobs consume the result: ``scrape_to_s3`` applies it onto vehicles before
+writing the snapshot, ``daily_refresh`` writes it into the vehicles table.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from . import scraper
+from .filters import filters as FILTERS  # type: ignore
+from .pager import AdaptivePager
+from .vehicle import FEATURE_FIELDS
+
+# Filter codes scanned concurrently
+DEFAULT_WORKERS = int(os.getenv("FEATURE_SCAN_WORKERS", "8"))
+# >1 packs that many filter pages into one aliased GraphQL request instead
+DEFAULT_BATCH_SIZE = int(os.getenv("FEATURE_SCAN_BATCH_SIZE", "0"))
+
+# filters.py category (lowercased) -> API filterType
+FILTER_TYPES = {"wheels": "Wheels", "motor": "Motor", "package": "Package"}
+
+# Package label -> boolean vehicle field
+PACKAGE_FIELDS = {"Performance": "performance", "Pilot": "pilot", "Plus": "plus"}
+
+# scan_features result marker: code skipped because stop() asked to
+_PENDING = object()
+
+
+@dataclass(frozen=True)
+class FeatureDef:
+    filter_type: str  # API filterType, e.g. "Wheels"
+    code: str  # API filter value, e.g. "R184"
+    label: str  # human label from filters.py
+    field: str  # vehicle field it sets: wheels | motor | performance | pilot | plus
+
+    @property
+    def value(self):
+        """Value written to ``field`` for a matching vehicle."""
+        return self.label if self.field in ("wheels", "motor") else True
+
+
+def feature_defs(filters: Dict[str, Dict[str, str]] = FILTERS) -> List[FeatureDef]:
+    """Wheels, then motors, then packages, each in filters.py order."""
+    by_type: Dict[str, List[FeatureDef]] = {t: [] for t in FILTER_TYPES.values()}
+    for label, mapping in filters.items():
+        for category, code in mapping.items():
+            filter_type = FILTER_TYPES.get(category.lower())
+            if filter_type == "Package":
+                column = PACKAGE_FIELDS.get(label)
+                if column:
+                    by_type[filter_type].append(FeatureDef(filter_type, code, label, column))
+            elif filter_type:
+                by_type[filter_type].append(
+                    FeatureDef(filter_type, code, label, filter_type.lower())
+                )
+    return [d for defs in by_type.values() for d in defs]
+
+
+@dataclass
+class FeatureScan:
+    """Result of one deep scan.
+
+    ``ids_by_def`` keeps the raw per-code matches; ``features`` folds them into
+    id -> {field: value}. When several codes of one field match the same id the
+    later code in filters.py wins, as in the original serial loops.
+    ``pending`` lists codes never started because the scan was told to stop.
+    """
+
+    ids_by_def: Dict[FeatureDef, Set[str]] = field(default_factory=dict)
+    features: Dict[str, Dict[str, object]] = field(default_factory=dict)
+    failed: List[FeatureDef] = field(default_factory=list)
+    pending: List[FeatureDef] = field(default_factory=list)
+    seconds: float = 0.0
+    model: Optional[str] = None  # model family the filters were run against
+
+    def add(self, d: FeatureDef, ids: Set[str]) -> None:
+        self.ids_by_def[d] = ids
+        for vid in ids:
+            self.features.setdefault(vid, {})[d.field] = d.value
+
+    def apply(self, vehicle: dict) -> List[str]:
+        """Set scanned fields on ``vehicle`` in place; return the fields set."""
+        found = self.features.get(str(vehicle.get("id")))
+        if not found:
+            return []
+        vehicle.update(found)
+        return list(found)
+
+    def field_counts(self) -> Dict[str, int]:
+        """Number of distinct ids per field."""
+        counts = dict.fromkeys(FEATURE_FIELDS, 0)
+        for found in self.features.values():
+            for f in found:
+                counts[f] += 1
+        return counts
+
+    # ---------- Persistence ----------
+    def to_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "seconds": self.seconds,
+            "completed": [{**asdict(d), "ids": sorted(ids)} for d, ids in self.ids_by_def.items()],
+            "failed": [asdict(d) for d in self.failed],
+            "pending": [asdict(d) for d in self.pending],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureScan":
+        scan = cls(model=data.get("model"), seconds=float(data.get("seconds") or 0.0))
+        for item in data.get("completed") or []:
+            item = dict(item)
+            ids = item.pop("ids", [])
+            scan.add(FeatureDef(**item), set(ids))
+        scan.failed = [FeatureDef(**d) for d in data.get("failed") or []]
+        scan.pending = [FeatureDef(**d) for d in data.get("pending") or []]
+        return scan
+
+
+def scan_features(
+    model: Optional[str] = None,
+    market: Optional[str] = None,
+    defs: Optional[List[FeatureDef]] = None,
+    workers: Optional[int] = None,
+    page_workers: Optional[int] = None,
+    page_limit: int = 200,
+    batch_size: Optional[int] = None,
+    pager: Optional[AdaptivePager] = None,
+    previous: Optional[FeatureScan] = None,
+    stop: Optional[Callable[[], bool]] = None,
+) -> FeatureScan:
+    """Run every feature filter concurrently and fold matches into a FeatureScan.
+
+    A failing code is logged and recorded in ``failed``; the rest still apply.
+    ``pager`` sizes the per-code pages adaptively (not used by alias batches).
+    Codes already completed in ``previous`` (a checkpointed scan) are reused
+    instead of fetched. Once ``stop()`` returns True, codes not yet started
+    are recorded in ``pending`` instead of run (not checked by alias batches).
+    """
+    model = model or (scraper.DEFAULT_MODELS[0] if scraper.DEFAULT_MODELS else "PS2")
+    market = market or scraper.DEFAULT_MARKET
+    defs = feature_defs() if defs is None else defs
+    workers = max(int(workers or DEFAULT_WORKERS), 1)
+    page_workers = max(int(page_workers or scraper.DEFAULT_WORKERS), 1)
+    batch_size = DEFAULT_BATCH_SIZE if batch_size is None else int(batch_size)
+
+    started = time.monotonic()
+    scan = FeatureScan(model=model)
+    if not defs:
+        return scan
+    reused = previous.ids_by_def if previous is not None else {}
+    prior_seconds = previous.seconds if previous is not None else 0.0
+    todo = [d for d in defs if d not in reused]
+    if batch_size > 1:
+        by_spec, failed = scraper.fetch_ids_for_filters_batched(
+            [(d.filter_type, d.code) for d in todo],
+            model,
+            market,
+            page_limit=page_limit,
+            batch_size=batch_size,
+            sess=scraper._session(),
+        )
+        for d in defs:
+            if d in reused:
+                scan.add(d, reused[d])
+            elif (d.filter_type, d.code) in failed:
+                scan.failed.append(d)
+            else:
+                scan.add(d, by_spec[(d.filter_type, d.code)])
+        scan.seconds = round(prior_seconds + time.monotonic() - started, 3)
+        return scan
+
+    sess = scraper._walk_session(workers * page_workers, pager, page_workers)
+
+    def _one(d: FeatureDef):
+        if stop is not None and stop():
+            return _PENDING
+        try:
+            return scraper.fetch_ids_for_filter(
+                d.filter_type,
+                d.code,
+                model,
+                market,
+                page_limit=page_limit,
+                sess=sess,
+                workers=page_workers,
+                pager=pager,
+                strict=True,
+            )
+        except Exception as e:
+            print(f"[feature-scan] {d.filter_type}={d.code} failed: {e}")
+            return None
+
+    results: Dict[FeatureDef, object] = {}
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            results = dict(zip(todo, pool.map(_one, todo)))
+
+    # Fold in definition order so overlaps resolve deterministically
+    for d in defs:
+        ids = reused[d] if d in reused else results[d]
+        if ids is _PENDING:
+            scan.pending.append(d)
+        elif ids is None:
+            scan.failed.append(d)
+        else:
+            scan.add(d, ids)
+    scan.seconds = round(prior_seconds + time.monotonic() - started, 3)
+    return scan
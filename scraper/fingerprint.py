@@ -0,0 +1,107 @@
+"""Per-ad content fingerprints to skip re-normalizing unchanged listings.
+
+Each raw vehicleAd is hashed over a canonical (sorted-key) JSON encoding. The
+scrape job stores the id -> fingerprint map next to ``raw/latest.json``; on the
+next run an ad whose fingerprint matches can reuse its previous normalized
+record instead of going through _normalize_vehicle and option-code enrichment
+again.
+
+Usage:
+  cache = FingerprintCache(previous_fingerprints, previous_records_by_id)
+  for v in scraper.iter_vehicles(fingerprints=cache): ...
+  cache.summary()  # {"changed": .., "unchanged": .., "reused": ..}
+  cache.current    # map to persist for the next run
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+from typing import Dict, Iterable, Optional, Union
+
+from .code_parser import enrich_vehicle
+from .vehicle import FEATURE_FIELDS, Vehicle
+
+try:
+    import orjson  # type: ignore
+
+    def _canonical(ad: dict) -> bytes:
+        return orjson.dumps(ad, option=orjson.OPT_SORT_KEYS)
+
+except ImportError:
+
+    def _canonical(ad: dict) -> bytes:
+        return json.dumps(ad, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def ad_fingerprint(ad: dict) -> str:
+    """Stable hash of one raw vehicleAd (key order independent)."""
+    return hashlib.blake2b(_canonical(ad), digest_size=16).hexdigest()
+
+
+class FingerprintCache:
+    """Compares ads against the previous run and serves reusable records.
+
+    ``previous``: id -> fingerprint from the last snapshot.
+    ``records``: id -> normalized record (dict or compact Vehicle) from the last
+    snapshot (optional; without it, changed/unchanged are still counted but
+    nothing is reused).
+    """
+
+    def __init__(
+        self,
+        previous: Optional[Dict[str, str]] = None,
+        records: Optional[Dict[str, Union[dict, Vehicle]]] = None,
+    ):
+        self.previous = previous or {}
+        self.records = records or {}
+        self.current: Dict[str, str] = {}
+        self.changed = 0
+        self.unchanged = 0
+        self.reused = 0
+
+    @classmethod
+    def from_snapshot(
+        cls, fingerprints: Optional[Dict[str, str]], vehicles: Optional[Iterable[dict]] = None
+    ) -> "FingerprintCache":
+        # Held for the whole run, so keep them as slotted records
+        records = {str(v.get("id")): Vehicle.from_dict(v) for v in vehicles or ()}
+        return cls(fingerprints, records)
+
+    def check(self, ad: dict, code_to_label=None) -> Optional[dict]:
+        """Record the ad's fingerprint; return a reusable record copy if unchanged.
+
+        The copy matches a fresh _normalize_vehicle + code-parser enrichment:
+        the previous run's deep-scan/inferred features are dropped (this run's
+        scan or model fills them again) and the URL-derived labels are
+        re-applied from the memoized enrichment (``code_to_label`` as for
+        enrich_vehicle).
+        """
+        vid = str(ad.get("id"))
+        fp = ad_fingerprint(ad)
+        self.current[vid] = fp
+        if self.previous.get(vid) != fp:
+            self.changed += 1
+            return None
+        self.unchanged += 1
+        record = self.records.get(vid)
+        if record is None:
+            return None
+        self.reused += 1
+        out = record.to_dict() if isinstance(record, Vehicle) else dict(record)
+        for f in FEATURE_FIELDS:
+            out.pop(f, None)
+        enrich_vehicle(out, code_to_label)
+        out["scrape_date"] = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        return out
+
+    def merge(self, current: Dict[str, str], summary: Dict[str, int]) -> None:
+        """Fold in what an earlier invocation of the same (checkpointed) run already saw."""
+        self.current.update(current)
+        self.changed += summary.get("changed", 0)
+        self.unchanged += summary.get("unchanged", 0)
+        self.reused += summary.get("reused", 0)
+
+    def summary(self) -> Dict[str, int]:
+        return {"changed": self.changed, "unchanged": self.unchanged, "reused": self.reused}
@@ -0,0 +1,178 @@
+"""Predict wheels/motor/packages from raw option tokens, trained on deep-scan results.
+
+code_parser keeps every URL token in ``raw_option_codes`` but only trusts
+exterior/interior/motor. This module learns token -> feature rules against the
+ground truth of a feature deep scan (scraper.feature_scan) so later runs can
+fill those fields locally and skip most of the per-code network calls.
+
+Training is bitset based: every token and every (field, value) label gets a
+Python int whose bit i is set when vehicle i has it. Rule support is
+``(token_bits & label_bits).bit_count()`` and confidence is support divided by
+the token's own count. Prediction encodes a vehicle's tokens as a bitset over
+the token vocabulary and tests it against each field's rule mask.
+
+Ground truth conventions:
+- wheels/motor: a vehicle with no scanned value is unknown and not used
+- performance/pilot/plus: the scan is exhaustive, so "not matched" is False;
+  only rules that predict True are kept (False is already the default)
+
+Usage:
+  model = FeatureModel.train(tokens_by_id, scan.features)
+  model.predict(vehicle["raw_option_codes"])  # {"wheels": ("19\\" ...", 0.98), ...}
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .feature_scan import FEATURE_FIELDS, PACKAGE_FIELDS
+
+BOOLEAN_FIELDS = tuple(PACKAGE_FIELDS.values())
+
+DEFAULT_MIN_SUPPORT = 5
+DEFAULT_MIN_CONFIDENCE = 0.9
+
+
+@dataclass(frozen=True)
+class Rule:
+    token: str
+    field: str
+    value: object
+    support: int
+    confidence: float
+
+
+class FeatureModel:
+    """Token -> feature rules plus the vocabulary/bit masks used to apply them."""
+
+    def __init__(self, rules: Iterable[Rule], trained_on: int = 0):
+        # Best rule first per field; ties broken by support
+        self.rules: Dict[str, List[Rule]] = {f: [] for f in FEATURE_FIELDS}
+        for r in sorted(rules, key=lambda r: (-r.confidence, -r.support, r.token)):
+            self.rules[r.field].append(r)
+        self.trained_on = trained_on
+        self.vocabulary: Dict[str, int] = {}
+        for field_rules in self.rules.values():
+            for r in field_rules:
+                self.vocabulary.setdefault(r.token, len(self.vocabulary))
+        self._masks = {
+            f: self._encode(r.token for r in field_rules) for f, field_rules in self.rules.items()
+        }
+
+    def _encode(self, tokens: Iterable[str]) -> int:
+        bits = 0
+        for t in tokens:
+            idx = self.vocabulary.get(t)
+            if idx is not None:
+                bits |= 1 << idx
+        return bits
+
+    # ---------- Training ----------
+    @classmethod
+    def train(
+        cls,
+        tokens_by_id: Mapping[str, Iterable[str]],
+        features_by_id: Mapping[str, Mapping[str, object]],
+        min_support: int = DEFAULT_MIN_SUPPORT,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    ) -> "FeatureModel":
+        """Learn rules from vehicles' raw tokens and their deep-scan features."""
+        token_bits: Dict[str, int] = {}
+        label_bits: Dict[Tuple[str, object], int] = {}
+        known_bits: Dict[str, int] = dict.fromkeys(FEATURE_FIELDS, 0)
+
+        for i, (vid, tokens) in enumerate(tokens_by_id.items()):
+            bit = 1 << i
+            for t in tokens:
+                token_bits[t] = token_bits.get(t, 0) | bit
+            found = features_by_id.get(vid) or {}
+            for f in FEATURE_FIELDS:
+                value = found.get(f)
+                if value is None and f in BOOLEAN_FIELDS:
+                    value = False
+                if value is None:
+                    continue
+                known_bits[f] |= bit
+                if value is False:
+                    continue
+                label_bits[(f, value)] = label_bits.get((f, value), 0) | bit
+
+        rules: List[Rule] = []
+        for token, tbits in token_bits.items():
+            for (f, value), lbits in label_bits.items():
+                support = (tbits & lbits).bit_count()
+                if support < min_support:
+                    continue
+                # confidence among vehicles where this field is known
+                seen = (tbits & known_bits[f]).bit_count()
+                confidence = support / seen
+                if confidence >= min_confidence:
+                    rules.append(Rule(token, f, value, support, round(confidence, 4)))
+        return cls(rules, trained_on=len(tokens_by_id))
+
+    # ---------- Prediction ----------
+    def predict(
+        self, tokens: Iterable[str], min_confidence: float = 0.0
+    ) -> Dict[str, Tuple[object, float]]:
+        """Return {field: (value, confidence)} for every field a rule covers."""
+        bits = self._encode(tokens)
+        out: Dict[str, Tuple[object, float]] = {}
+        for f, field_rules in self.rules.items():
+            if not bits & self._masks[f]:
+                continue
+            for r in field_rules:
+                if r.confidence < min_confidence:
+                    break
+                if bits >> self.vocabulary[r.token] & 1:
+                    out[f] = (r.value, r.confidence)
+                    break
+        return out
+
+    def apply(self, vehicle: dict, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> List[str]:
+        """Fill fields the vehicle does not have yet; return the fields set."""
+        filled = []
+        for f, (value, _) in self.predict(
+            vehicle.get("raw_option_codes") or (), min_confidence
+        ).items():
+            if vehicle.get(f) in (None, False):
+                vehicle[f] = value
+                filled.append(f)
+        return filled
+
+    def evaluate(
+        self,
+        tokens_by_id: Mapping[str, Iterable[str]],
+        features_by_id: Mapping[str, Mapping[str, object]],
+        min_confidence: float = 0.0,
+    ) -> Dict[str, Dict[str, float]]:
+        """Per-field coverage (share predicted) and precision against ground truth."""
+        stats = {f: {"predicted": 0, "correct": 0} for f in FEATURE_FIELDS}
+        total = len(tokens_by_id)
+        for vid, tokens in tokens_by_id.items():
+            found = features_by_id.get(vid) or {}
+            for f, (value, _) in self.predict(tokens, min_confidence).items():
+                truth = found.get(f, False if f in BOOLEAN_FIELDS else None)
+                if truth is None:
+                    continue
+                stats[f]["predicted"] += 1
+                stats[f]["correct"] += int(truth == value)
+        return {
+            f: {
+                "coverage": round(s["predicted"] / total, 4) if total else 0.0,
+                "precision": round(s["correct"] / s["predicted"], 4) if s["predicted"] else 0.0,
+            }
+            for f, s in stats.items()
+        }
+
+    # ---------- Persistence ----------
+    def to_dict(self) -> dict:
+        return {
+            "trained_on": self.trained_on,
+            "rules": [asdict(r) for field_rules in self.rules.values() for r in field_rules],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "FeatureModel":
+        data = data or {}
+        return cls((Rule(**r) for r in data.get("rules") or []), data.get("trained_on", 0))
@@ -0,0 +1,147 @@
+"""Adaptive page sizing for SearchVehicleAds pagination.
+
+PAGE_LIMIT is a guess. ``AdaptivePager`` measures every page (latency, body
+bytes, transport retries) and picks the next ``limit`` within bounds:
+
+- failure (timeout, connection error, 5xx after retries) or a retried page:
+  halve the limit
+- page slower than PAGER_TARGET_SECONDS or bigger than PAGER_MAX_BYTES: shrink
+  proportionally
+- page faster than half the target: grow by PAGER_GROWTH, but stay below
+  any limit that failed this run while probing above every limit that had
+  worked (a failure at a limit that already worked counts as transient)
+- otherwise keep it
+
+The last good limit per (model, market, shape) is kept in ``sizes``; persist
+``to_dict()`` and pass it to ``from_dict()`` on the next run so it starts from
+there instead of PAGE_LIMIT.
+
+Usage:
+  pager = AdaptivePager.from_dict(previous_state)
+  scraper.iter_vehicles(pager=pager)
+  save(pager.to_dict())
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+MIN_LIMIT = int(os.getenv("PAGER_MIN_LIMIT", "25"))
+MAX_LIMIT = int(os.getenv("PAGER_MAX_LIMIT", "1000"))
+TARGET_SECONDS = float(os.getenv("PAGER_TARGET_SECONDS", "2.0"))
+MAX_BYTES = int(os.getenv("PAGER_MAX_BYTES", str(8 * 1024 * 1024)))
+GROWTH = float(os.getenv("PAGER_GROWTH", "1.5"))
+# Attempts per offset before a failing page is re-raised
+MAX_FAILURES = int(os.getenv("PAGER_MAX_FAILURES", "4"))
+
+
+def pager_key(model: str, market: str, shape: str = "listing") -> str:
+    return f"{model}/{market}/{shape}"
+
+
+def retries_of(resp) -> int:
+    """Number of urllib3 retries behind a requests response (0 if unknown)."""
+    retries = getattr(getattr(resp, "raw", None), "retries", None)
+    return len(getattr(retries, "history", None) or ())
+
+
+@dataclass
+class PageStats:
+    pages: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    retries: int = 0
+    failures: int = 0
+
+
+class AdaptivePager:
+    """Per-key page size controller; thread-safe so concurrent jobs can share one."""
+
+    def __init__(
+        self,
+        initial: int = 200,
+        minimum: int = MIN_LIMIT,
+        maximum: int = MAX_LIMIT,
+        target_seconds: float = TARGET_SECONDS,
+        max_bytes: int = MAX_BYTES,
+        sizes: Optional[Dict[str, int]] = None,
+    ):
+        self.minimum = max(int(minimum), 1)
+        self.maximum = max(int(maximum), self.minimum)
+        self.initial = self._clamp(initial)
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.sizes: Dict[str, int] = {k: self._clamp(v) for k, v in (sizes or {}).items()}
+        self.stats: Dict[str, PageStats] = {}
+        # smallest probed limit that failed this run; growth stays below it
+        self._ceilings: Dict[str, int] = {}
+        # largest limit that succeeded this run
+        self._worked: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _clamp(self, limit: float) -> int:
+        return int(min(max(int(limit), self.minimum), self.maximum))
+
+    def start(self, key: str, default: Optional[int] = None) -> int:
+        """Limit to open ``key`` with: last run's choice, else ``default``/``initial``."""
+        with self._lock:
+            if key in self.sizes:
+                return self.sizes[key]
+            return self._clamp(default) if default else self.initial
+
+    def observe(self, key: str, limit: int, seconds: float, nbytes: int, retries: int = 0) -> int:
+        """Record a successful page fetched with ``limit``; return the next limit."""
+        with self._lock:
+            s = self.stats.setdefault(key, PageStats())
+            s.pages += 1
+            s.bytes += nbytes
+            s.seconds += seconds
+            s.retries += retries
+            self._worked[key] = max(self._worked.get(key, 0), limit)
+            if retries:
+                nxt = limit / 2
+            else:
+                # shrink towards whichever budget is exceeded the most
+                scale = max(
+                    seconds / self.target_seconds if self.target_seconds > 0 else 0.0,
+                    nbytes / self.max_bytes if self.max_bytes > 0 else 0.0,
+                )
+                if scale > 1:
+                    nxt = limit / scale
+                elif scale < 0.5:
+                    nxt = min(limit * GROWTH, self._ceilings.get(key, self.maximum))
+                else:
+                    nxt = limit
+                # only remember limits that stayed within budget
+                if scale <= 1:
+                    self.sizes[key] = self._clamp(limit)
+            return self._clamp(nxt)
+
+    def on_failure(self, key: str, limit: int) -> int:
+        """Record a failed page; return the (halved) limit to retry it with."""
+        with self._lock:
+            self.stats.setdefault(key, PageStats()).failures += 1
+            if limit > self._worked.get(key, 0):
+                self._ceilings[key] = min(self._ceilings.get(key, limit), limit) - 1
+            nxt = self._clamp(limit / 2)
+            self.sizes[key] = min(self.sizes.get(key, nxt), nxt)
+            return nxt
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                k: {**asdict(s), "limit": self.sizes.get(k, self.initial)}
+                for k, s in self.stats.items()
+            }
+
+    # ---------- Persistence ----------
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"sizes": dict(self.sizes)}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], **kw) -> "AdaptivePager":
+        return cls(sizes=(data or {}).get("sizes"), **kw)
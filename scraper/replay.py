@@ -0,0 +1,154 @@
+"""Record/replay transport for the Polestar GraphQL client.
+
+``ReplayAdapter`` is a requests ``HTTPAdapter`` mounted by ``scraper._session()``
+when SCRAPER_REPLAY is set. Every request is keyed by a sha256 of its method,
+URL and canonical (sorted-key) JSON body, and stored as one gzip file per key
+under SCRAPER_REPLAY_DIR:
+
+- ``record``: go to the network (with the usual urllib3 retries) and store
+  every 2xx response
+- ``replay``: serve from the store only; a missing key raises ReplayMiss,
+  nothing touches the network
+- ``cache``: serve stored responses younger than SCRAPER_REPLAY_TTL seconds,
+  otherwise fetch and store (dev mode)
+
+Bodies are stored already decoded (the transport undid Content-Encoding), so
+replayed responses carry no Content-Encoding header.
+
+Usage:
+  SCRAPER_REPLAY=record python -m scraper.scraper        # capture once
+  SCRAPER_REPLAY=replay python -m jobs.daily_refresh     # offline, repeatable
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.structures import CaseInsensitiveDict
+
+MODE = os.getenv("SCRAPER_REPLAY", "").lower()  # "" | record | replay | cache
+STORE_DIR = os.getenv("SCRAPER_REPLAY_DIR", os.path.join(".replay", "polestar"))
+TTL_SECONDS = float(os.getenv("SCRAPER_REPLAY_TTL", "3600"))
+MODES = ("record", "replay", "cache")
+
+# Response headers worth keeping; Content-Encoding/Length no longer apply
+_KEPT_HEADERS = ("Content-Type", "Date", "Retry-After")
+
+
+class ReplayMiss(RequestsConnectionError):
+    """Raised in replay mode when no stored response matches a request."""
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """Stable hash of a request; JSON bodies are canonicalized first."""
+    if body:
+        raw = body.encode("utf-8") if isinstance(body, str) else body
+        try:
+            raw = json.dumps(json.loads(raw), sort_keys=True, separators=(",", ":")).encode()
+        except ValueError:
+            pass
+    else:
+        raw = b""
+    h = hashlib.sha256()
+    h.update(f"{method.upper()} {url}\n".encode())
+    h.update(raw)
+    return h.hexdigest()
+
+
+class ResponseStore:
+    """One ``<key>.gz`` per response: a JSON header line followed by the body."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or STORE_DIR
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.gz")
+
+    def load(self, key: str, max_age: Optional[float] = None) -> Optional[tuple]:
+        """Return (meta, body) or None if missing/expired."""
+        path = self.path(key)
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+                return None
+            with gzip.open(path, "rb") as f:
+                header, _, body = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        return json.loads(header), body
+
+    def save(self, key: str, meta: dict, body: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write-then-rename so concurrent page workers never see partial files
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            f.write(json.dumps(meta).encode() + b"\n" + body)
+        os.replace(tmp, path)
+
+
+class ReplayAdapter(HTTPAdapter):
+    """HTTPAdapter that records to / replays from a ResponseStore."""
+
+    def __init__(
+        self,
+        mode: str = MODE,
+        store: Optional[ResponseStore] = None,
+        ttl: float = TTL_SECONDS,
+        **kw,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"SCRAPER_REPLAY must be one of {MODES}, got {mode!r}")
+        super().__init__(**kw)
+        self.mode = mode
+        self.store = store or ResponseStore()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def send(self, request, **kw):
+        key = request_key(request.method, request.url, request.body)
+        if self.mode != "record":
+            stored = self.store.load(key, self.ttl if self.mode == "cache" else None)
+            if stored is not None:
+                self.hits += 1
+                return self._build(request, *stored)
+            self.misses += 1
+            if self.mode == "replay":
+                raise ReplayMiss(f"no recorded response for {request.url} ({key[:12]})")
+        resp = super().send(request, **kw)
+        if 200 <= resp.status_code < 300:
+            meta = {
+                "status": resp.status_code,
+                "reason": resp.reason,
+                "headers": {h: resp.headers[h] for h in _KEPT_HEADERS if h in resp.headers},
+                "url": request.url,
+            }
+            self.store.save(key, meta, resp.content)
+        return resp
+
+    def _build(self, request, meta: dict, body: bytes) -> Response:
+        resp = Response()
+        resp.status_code = meta["status"]
+        resp.reason = meta.get("reason")
+        resp.headers = CaseInsensitiveDict(meta.get("headers") or {})
+        resp._content = body
+        resp.url = request.url
+        resp.request = request
+        resp.encoding = "utf-8"
+        resp.connection = self
+        return resp
+
+
+def adapter(mode: Optional[str] = None, **kw) -> HTTPAdapter:
+    """ReplayAdapter when ``mode`` (default: env SCRAPER_REPLAY) is set, else an HTTPAdapter."""
+    mode = MODE if mode is None else mode
+    return ReplayAdapter(mode=mode, **kw) if mode else HTTPAdapter(**kw)
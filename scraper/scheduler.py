@@ -0,0 +1,338 @@
+"""Run a (model, market) scrape matrix concurrently under one per-host rate limit.
+
+Every job walks its pages through a shared ``HostThrottle`` for
+``pc-api.polestar.com``:
+
+- a token bucket caps the global request rate (SCRAPE_RATE req/s, SCRAPE_BURST)
+- an AIMD window caps in-flight requests: +1 per window of successes, halved
+  on every 429
+- a 429's ``Retry-After`` pauses the whole host, not just the failing job
+
+429s are handled here instead of by the urllib3 ``Retry`` in ``_session()`` (the
+session is built without 429 in its status list); 5xx retries stay with urllib3.
+
+Usage:
+  from scraper.scheduler import build_matrix, run_matrix
+  results = run_matrix(build_matrix(["PS2", "PS4"], ["us", "ca"]))
+  for r in results:
+      print(r.stats)
+"""
+
+from __future__ import annotations
+
+import email.utils
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from . import scraper
+from .code_parser import default_code_to_label
+
+DEFAULT_MARKETS = [
+    m.strip() for m in os.getenv("MARKETS", scraper.DEFAULT_MARKET).split(",") if m.strip()
+]
+DEFAULT_RATE = float(os.getenv("SCRAPE_RATE", "5"))  # requests per second, per host
+DEFAULT_BURST = int(os.getenv("SCRAPE_BURST", "5"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "8"))
+MAX_THROTTLE_RETRIES = 8
+DEFAULT_RETRY_AFTER = 1.0  # seconds, when a 429 carries no usable header
+
+
+class ThrottledError(RuntimeError):
+    """Raised when a request is still rate limited after MAX_THROTTLE_RETRIES."""
+
+
+# ---------- Limiters ----------
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens/s, at most ``burst`` banked."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, burst: int) -> None:
+        with self._lock:
+            self.rate = float(rate)
+            self.capacity = float(max(burst, 1))
+            self._tokens = min(self._tokens, self.capacity)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class AimdLimiter:
+    """Adaptive concurrency window (additive increase, multiplicative decrease)."""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 32):
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def configure(self, maximum: int) -> None:
+        with self._cond:
+            self.maximum = max(maximum, self.minimum)
+            self.limit = min(self.limit, self.maximum)
+            self._cond.notify_all()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            # +1 after a full window of successes
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Return seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(when.timestamp() - now, 0.0)
+
+
+class HostThrottle:
+    """Token bucket + AIMD window + Retry-After pause shared by all jobs of one host."""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        sleep=time.sleep,
+    ):
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.window = AimdLimiter(initial=max_concurrency, maximum=max_concurrency)
+        self._sleep = sleep
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        """Change the limits in place; jobs already using this throttle follow them."""
+        if rate is not None or burst is not None:
+            self.bucket.configure(
+                self.bucket.rate if rate is None else rate,
+                int(self.bucket.capacity) if burst is None else burst,
+            )
+        if max_concurrency is not None:
+            self.window.configure(max_concurrency)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_pause(self) -> None:
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            self._sleep(remaining)
+
+    def post(self, sess: requests.Session, url: str, payload: dict, stats: "JobStats"):
+        """POST through the limiter, absorbing 429s; returns the final response."""
+        for _ in range(MAX_THROTTLE_RETRIES + 1):
+            self._wait_pause()
+            self.bucket.acquire()
+            self.window.acquire()
+            try:
+                stats.requests += 1
+                resp = sess.post(url, json=payload, timeout=20)
+            finally:
+                self.window.release()
+            if resp.status_code != 429:
+                self.window.on_success()
+                return resp
+            stats.throttled += 1
+            self.window.on_throttle()
+            wait = parse_retry_after(resp.headers.get("Retry-After"))
+            self.pause(DEFAULT_RETRY_AFTER if wait is None else wait)
+        raise ThrottledError(f"still throttled after {MAX_THROTTLE_RETRIES} retries: {url}")
+
+
+_HOST_THROTTLES: Dict[str, HostThrottle] = {}
+_HOST_LOCK = threading.Lock()
+
+
+def host_throttle(url: str = scraper.API_URL, **kw) -> HostThrottle:
+    """Return the process-wide throttle for the host of ``url``.
+
+    There is exactly one throttle per host, so every caller shares its bucket.
+    A later call passing ``rate``/``burst``/``max_concurrency`` reconfigures
+    that shared throttle (last caller wins) instead of getting a second bucket
+    that would let the host see the sum of both rates.
+    """
+    host = urlsplit(url).netloc
+    with _HOST_LOCK:
+        throttle = _HOST_THROTTLES.get(host)
+        if throttle is None:
+            throttle = _HOST_THROTTLES[host] = HostThrottle(**kw)
+        else:
+            kw.pop("sleep", None)
+            throttle.configure(**kw)
+        return throttle
+
+
+# ---------- Jobs ----------
+@dataclass(frozen=True)
+class ScrapeJob:
+    model: str
+    market: str
+
+
+@dataclass
+class JobStats:
+    model: str
+    market: str
+    vehicles: int = 0
+    pages: int = 0
+    requests: int = 0
+    throttled: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class JobResult:
+    job: ScrapeJob
+    stats: JobStats
+    vehicles: List[Dict] = field(default_factory=list)
+
+
+def build_matrix(
+    models: Optional[Iterable[str]] = None, markets: Optional[Iterable[str]] = None
+) -> List[ScrapeJob]:
+    """Cartesian product of models x markets (defaults: MODELS x MARKETS envs)."""
+    models = list(models or scraper.DEFAULT_MODELS)
+    markets = list(markets or DEFAULT_MARKETS)
+    return [ScrapeJob(model, market) for model, market in product(models, markets)]
+
+
+def _run_job(
+    job: ScrapeJob,
+    sess: requests.Session,
+    throttle: HostThrottle,
+    limit: int,
+    code_to_label: Dict,
+) -> JobResult:
+    stats = JobStats(model=job.model, market=job.market)
+    result = JobResult(job=job, stats=stats)
+    started = time.monotonic()
+    offset = 0
+    total = None
+    try:
+        while True:
+            resp = throttle.post(
+                sess, scraper.API_URL, scraper._payload(job.model, job.market, offset, limit), stats
+            )
+            resp.raise_for_status()
+            meta, ads = scraper._page_parts(scraper._decode_json(resp))
+            stats.pages += 1
+            for ad in ads:
+                result.vehicles.append(scraper._build_vehicle(ad, job.model, code_to_label))
+            result_count = int(meta.get("resultCount") or len(ads))
+            total = int(
+                meta.get("totalCount") or (offset + result_count) if total is None else total
+            )
+            if result_count <= 0 or offset + result_count >= total:
+                break
+            offset += result_count
+    except Exception as e:
+        stats.error = str(e)
+        print(f"[scheduler] {job.model}/{job.market} failed at offset={offset}: {e}")
+    stats.vehicles = len(result.vehicles)
+    stats.seconds = round(time.monotonic() - started, 3)
+    return result
+
+
+def run_matrix(
+    jobs: Iterable[ScrapeJob],
+    page_limit: Optional[int] = None,
+    rate: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    throttle: Optional[HostThrottle] = None,
+) -> List[JobResult]:
+    """Scrape every job concurrently; results come back in job order.
+
+    A failing job records its error in ``stats.error`` and keeps whatever
+    vehicles it collected; other jobs are unaffected.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    limit = page_limit or scraper.DEFAULT_LIMIT
+    concurrency = max(int(max_concurrency or DEFAULT_MAX_CONCURRENCY), 1)
+    if throttle is None:
+        throttle = host_throttle(
+            scraper.API_URL,
+            rate=rate or DEFAULT_RATE,
+            burst=DEFAULT_BURST,
+            max_concurrency=concurrency,
+        )
+
+    code_to_label = default_code_to_label()
+
+    # 429 is handled by HostThrottle; leave only 5xx to urllib3
+    sess = scraper._session(
+        pool_size=concurrency,
+        retry_statuses=tuple(s for s in scraper.RETRY_STATUSES if s != 429),
+    )
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(jobs))) as pool:
+        return list(pool.map(lambda job: _run_job(job, sess, throttle, limit, code_to_label), jobs))
+
+
+if __name__ == "__main__":
+    for r in run_matrix(build_matrix()):
+        print(r.stats)
@@ -1,33 +1,35 @@
 from __future__ import annotations
 
 import datetime as dt
-import gzip
-import json
 import os
-from typing import Dict, List, Optional, Set
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 
-import brotli
 import requests
-from .code_parser import (
-    extract_option_codes,
-    build_reverse_maps,
-    classify_codes,
-    enrich_labels,
-)
-from .filters import filters as FILTERS  # type: ignore
-from requests.adapters import HTTPAdapter
+from . import decoding, replay
+from .code_parser import default_code_to_label, enrich_vehicle
+from .fingerprint import FingerprintCache
+from .pager import MAX_FAILURES, AdaptivePager, pager_key, retries_of
 from urllib3.util.retry import Retry
 
 # ---------- Config (env-tunable) ----------
-API_URL = "https://pc-api.polestar.com/eu-north-1/partner-rm-tool/public/"
+# Overridable to point at a local fake (loadtest.server) or a proxy
+API_URL = os.getenv(
+    "POLESTAR_API_URL", "https://pc-api.polestar.com/eu-north-1/partner-rm-tool/public/"
+)
 
 DEFAULT_MODELS = [m.strip() for m in os.getenv("MODELS", "PS2").split(",") if m.strip()]
 DEFAULT_MARKET = os.getenv("MARKET", "us")
 DEFAULT_LIMIT = int(os.getenv("PAGE_LIMIT", "200"))
+# >1 fetches the remaining pages of a model concurrently once totalCount is known
+DEFAULT_WORKERS = int(os.getenv("PAGE_WORKERS", "1"))
 
 HEADERS = {
     "Accept": "*/*",
-    "Accept-Encoding": "gzip, deflate, br, zstd",
+    "Accept-Encoding": decoding.ACCEPT_ENCODING,  # zstd only when a decoder is installed
     "Content-Type": "application/json",
     "Origin": "https://www.polestar.com",
     "Referer": "https://www.polestar.com/",
@@ -36,49 +38,47 @@ HEADERS = {
 
 
 # ---------- HTTP session with retries ----------
-def _session() -> requests.Session:
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _session(
+    pool_size: int = 10, retry_statuses=RETRY_STATUSES, read_retries: Optional[int] = None
+) -> requests.Session:
+    """Pooled session with urllib3 retries; ``read_retries=0`` surfaces read timeouts."""
     s = requests.Session()
     s.headers.update(HEADERS)
     retry = Retry(
         total=5,
+        read=read_retries,
         backoff_factor=0.5,
-        status_forcelist=(429, 500, 502, 503, 504),
+        status_forcelist=retry_statuses,
         allowed_methods=("POST",),
         raise_on_status=False,
+        # urllib3 retries any 429 carrying Retry-After even if 429 is not in the
+        # forcelist; callers that drop 429 (scheduler) handle it themselves
+        respect_retry_after_header=429 in retry_statuses,
     )
-    s.mount("https://", HTTPAdapter(max_retries=retry))
+    # pool_maxsize must cover the page workers sharing this session, otherwise
+    # urllib3 discards connections instead of keeping them alive.
+    # SCRAPER_REPLAY=record|replay|cache swaps in the record/replay transport
+    adapter = replay.adapter(max_retries=retry, pool_connections=1, pool_maxsize=max(pool_size, 1))
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)  # local fake API (loadtest.server)
     return s
 
 
-# ---------- GraphQL payload ----------
-def _payload(
-    model: str,
-    market: str,
-    offset: int,
-    limit: int,
-    equal_filters: Optional[List[Dict]] = None,
-    exclude_filters: Optional[List[Dict]] = None,
-) -> dict:
-    if equal_filters is None:
-        equal_filters = []
-    if exclude_filters is None:
-        # Exclude "New" cycle state by default (used/CPO focus)
-        exclude_filters = [{"filterType": "CycleState", "value": "New"}]
+def _walk_session(pool_size: int, pager: Optional[AdaptivePager], workers: int) -> requests.Session:
+    """Session for ``_walk``: an adaptive walk must see its read timeouts.
 
-    return {
-        "operationName": "SearchVehicleAds",
-        "variables": {
-            "carModel": model,
-            "market": market,
-            "region": None,
-            "offset": offset,
-            "limit": limit,
-            "sortOrder": "Ascending",
-            "sortProperty": "Price",
-            "equalFilters": equal_filters,
-            "excludeFilters": exclude_filters,
-        },
-        "query": """
+    urllib3 would otherwise re-send a timed-out page at the same limit, so the
+    pager only learns of the timeout after several full-size attempts.
+    """
+    adaptive = pager is not None and workers <= 1
+    return _session(pool_size=pool_size, read_retries=0 if adaptive else None)
+
+
+# ---------- GraphQL payload ----------
+_SEARCH_QUERY = """
         query SearchVehicleAds($carModel: CarModel!, $market: String!, $region: String, $offset: Int!,
                                $limit: Int!, $sortOrder: SortOrder2!, $sortProperty: SortProperty!,
                                $equalFilters: [EqualFilter!], $excludeFilters: [ExcludeFilter!]) {
@@ -93,7 +93,18 @@ def _payload(
             equalFilters: $equalFilters
             excludeFilters: $excludeFilters
           ) {
-            metadata { limit offset resultCount totalCount }
+            %s
+          }
+        }
+        """
+
+_METADATA_SELECTION = "metadata { limit offset resultCount totalCount }"
+
+# Selection sets per use case; pick the smallest one that covers what the caller reads.
+SHAPE_SELECTIONS: Dict[str, str] = {
+    # everything _normalize_vehicle reads
+    "listing": _METADATA_SELECTION
+    + """
             vehicleAds {
               id
               firstTimeRegistration
@@ -106,10 +117,52 @@ def _payload(
                 stockImages
                 cycleState
               }
-            }
-          }
-        }
-        """,
+            }""",
+    # feature deep scans only need the matching ids
+    "ids": _METADATA_SELECTION + " vehicleAds { id }",
+    # totalCount only; sent with limit 1
+    "count": _METADATA_SELECTION + " vehicleAds { id }",
+    # price refresh without images/location/mileage
+    "price": _METADATA_SELECTION + " vehicleAds { id price { retail dealer currency } }",
+}
+
+# Constant part of each payload (operation name + rendered query), built once per shape
+_SHAPE_BASE: Dict[str, dict] = {
+    shape: {"operationName": "SearchVehicleAds", "query": _SEARCH_QUERY % selection}
+    for shape, selection in SHAPE_SELECTIONS.items()
+}
+
+
+def _payload(
+    model: str,
+    market: str,
+    offset: int,
+    limit: int,
+    equal_filters: Optional[List[Dict]] = None,
+    exclude_filters: Optional[List[Dict]] = None,
+    shape: str = "listing",
+) -> dict:
+    if equal_filters is None:
+        equal_filters = []
+    if exclude_filters is None:
+        # Exclude "New" cycle state by default (used/CPO focus)
+        exclude_filters = [{"filterType": "CycleState", "value": "New"}]
+    if shape == "count":
+        limit = 1
+
+    return {
+        **_SHAPE_BASE[shape],
+        "variables": {
+            "carModel": model,
+            "market": market,
+            "region": None,
+            "offset": offset,
+            "limit": limit,
+            "sortOrder": "Ascending",
+            "sortProperty": "Price",
+            "equalFilters": equal_filters,
+            "excludeFilters": exclude_filters,
+        },
     }
 
 
@@ -121,11 +174,13 @@ def _build_feature_payload(
     code: str,
     offset: int,
     limit: int,
+    shape: str = "ids",
 ) -> dict:
     """Build a payload to retrieve only vehicles matching a specific feature code.
 
-    This reuses the main search query but injects a single equalFilter. We still
-    exclude 'New' by default for consistency with the primary scrape.
+    This reuses the main search query (ids-only selection by default) but injects
+    a single equalFilter. We still exclude 'New' by default for consistency with
+    the primary scrape.
     """
     return _payload(
         model=model,
@@ -134,6 +189,7 @@ def _build_feature_payload(
         limit=limit,
         equal_filters=[{"filterType": filter_type, "value": code}],
         exclude_filters=[{"filterType": "CycleState", "value": "New"}],
+        shape=shape,
     )
 
 
@@ -143,59 +199,187 @@ def fetch_ids_for_filter(
     model: str,
     market: str,
     page_limit: int = 200,
+    sess: Optional[requests.Session] = None,
+    workers: int = 1,
+    pager: Optional[AdaptivePager] = None,
+    strict: bool = False,
 ) -> Set[str]:  # type: ignore[name-defined]
     """Return a set of vehicle IDs that match the given filter.
 
-    Performs paginated queries until all results retrieved. Best-effort: any
-    network error logs and returns partial results.
+    Performs paginated queries until all results retrieved (pages after the
+    first run concurrently when workers > 1). Pass ``sess`` to reuse a pooled
+    session across calls and ``pager`` to size pages adaptively (shared by all
+    filters of a model/market). Best-effort: any network error logs and returns
+    partial results; with ``strict`` it is raised instead, so callers can tell a
+    truncated match set from a complete one.
     """
-    sess = _session()
+    sess = sess or _walk_session(max(workers, 1), pager, workers)
     ids: Set[str] = set()
-    offset = 0
-    total = None
-    while True:
-        try:
-            resp = sess.post(
-                API_URL,
-                json=_build_feature_payload(model, market, filter_type, code, offset, page_limit),
-                timeout=20,
-            )
-            resp.raise_for_status()
-            block = _decode_json(resp)
-        except Exception as e:  # pragma: no cover - network variability
-            print(f"[feature-scan] {filter_type}={code} failed page offset={offset}: {e}")
-            break
-        data = (block.get("data") or {}).get("searchVehicleAds") or {}
-        meta = data.get("metadata") or {}
-        ads = data.get("vehicleAds") or []
-        for ad in ads:
-            vid = ad.get("id")
-            if vid is not None:
-                ids.add(str(vid))
-        result_count = int(meta.get("resultCount") or len(ads))
-        total = int(meta.get("totalCount") or (offset + result_count) if total is None else total)
-        if result_count <= 0 or offset + result_count >= total:
-            break
-        offset += result_count
+    blocks = _walk(
+        sess,
+        lambda off, lim: _build_feature_payload(model, market, filter_type, code, off, lim),
+        page_limit,
+        workers,
+        pager,
+        pager_key(model, market, "ids"),
+    )
+    try:
+        for block in blocks:
+            _, ads = _page_parts(block)
+            for ad in ads:
+                vid = ad.get("id")
+                if vid is not None:
+                    ids.add(str(vid))
+    except Exception as e:  # pragma: no cover - network variability
+        if strict:
+            raise
+        print(f"[feature-scan] {filter_type}={code} failed: {e}")
     return ids
 
 
-# ---------- Response decoding (brotli/gzip safe) ----------
-def _decode_json(resp: requests.Response) -> dict:
-    enc = resp.headers.get("Content-Encoding", "")
-    if enc == "br":
-        try:
-            text = brotli.decompress(resp.content).decode("utf-8")
-        except Exception:
-            text = resp.text
-    elif enc == "gzip":
+# ---------- GraphQL alias batching ----------
+# Variables shared by every aliased selection of a batch document
+_BATCH_SHARED_VARS = (
+    "$carModel: CarModel!, $market: String!, $region: String, $limit: Int!, "
+    "$sortOrder: SortOrder2!, $sortProperty: SortProperty!, $excludeFilters: [ExcludeFilter!]"
+)
+
+
+class BatchRejected(RuntimeError):
+    """The server refused an aliased batch document (or one of its aliases)."""
+
+
+def _build_batch_payload(
+    model: str,
+    market: str,
+    pages: List[Tuple[str, str, int]],
+    limit: int,
+    shape: str = "ids",
+) -> dict:
+    """Build one document with an aliased ``searchVehicleAds`` per (filterType, code, offset).
+
+    Alias ``q{i}`` answers ``pages[i]``; see _split_batch_response.
+    """
+    variables: Dict[str, object] = {
+        "carModel": model,
+        "market": market,
+        "region": None,
+        "limit": limit,
+        "sortOrder": "Ascending",
+        "sortProperty": "Price",
+        "excludeFilters": [{"filterType": "CycleState", "value": "New"}],
+    }
+    decls = [_BATCH_SHARED_VARS]
+    fields = []
+    for i, (filter_type, code, offset) in enumerate(pages):
+        variables[f"o{i}"] = offset
+        variables[f"f{i}"] = [{"filterType": filter_type, "value": code}]
+        decls.append(f"$o{i}: Int!, $f{i}: [EqualFilter!]")
+        fields.append(
+            f"q{i}: searchVehicleAds(carModel: $carModel, market: $market, region: $region, "
+            f"offset: $o{i}, limit: $limit, sortOrder: $sortOrder, sortProperty: $sortProperty, "
+            f"equalFilters: $f{i}, excludeFilters: $excludeFilters) {{ {SHAPE_SELECTIONS[shape]} }}"
+        )
+    return {
+        "operationName": "SearchVehicleAdsBatch",
+        "variables": variables,
+        "query": "query SearchVehicleAdsBatch(%s) {\n  %s\n}"
+        % (", ".join(decls), "\n  ".join(fields)),
+    }
+
+
+def _split_batch_response(block: dict, count: int) -> List[dict]:
+    """Split a batch response into ``count`` single-query blocks (alias order).
+
+    Each block has the regular ``{"data": {"searchVehicleAds": ...}}`` shape.
+    Raises BatchRejected if the document or any alias came back without data.
+    """
+    data = block.get("data") or {}
+    out = []
+    for i in range(count):
+        part = data.get(f"q{i}")
+        if part is None:
+            raise BatchRejected(str(block.get("errors") or f"alias q{i} missing"))
+        out.append({"data": {"searchVehicleAds": part}})
+    return out
+
+
+def fetch_ids_for_filters_batched(
+    specs: List[Tuple[str, str]],
+    model: str,
+    market: str,
+    page_limit: int = 200,
+    batch_size: int = 10,
+    sess: Optional[requests.Session] = None,
+) -> Tuple[Dict[Tuple[str, str], Set[str]], Set[Tuple[str, str]]]:
+    """Return (matching ids, failed specs) for many (filterType, code) pairs using aliased batches.
+
+    The first page of every filter goes out in ceil(len(specs) / batch_size)
+    requests; the remaining offsets (known from totalCount) go out batched the
+    same way. If the server rejects a batch, that batch and every later page
+    fall back to one fetch_ids_for_filter-style request per page. A failing page
+    logs and puts its spec in the failed set; its ids are then only partial.
+    """
+    sess = sess or _session()
+    batch_size = max(int(batch_size), 1)
+    ids: Dict[Tuple[str, str], Set[str]] = {spec: set() for spec in specs}
+    failed: Set[Tuple[str, str]] = set()
+    pending: List[Tuple[str, str, int]] = [(ft, code, 0) for ft, code in specs]
+    batching = batch_size > 1
+
+    def _single(page: Tuple[str, str, int]) -> Optional[dict]:
+        ft, code, off = page
         try:
-            text = gzip.decompress(resp.content).decode("utf-8")
-        except Exception:
-            text = resp.text
-    else:
-        text = resp.text
-    return json.loads(text)
+            return _post_page(
+                sess, _build_feature_payload(model, market, ft, code, off, page_limit)
+            )
+        except Exception as e:  # pragma: no cover - network variability
+            print(f"[feature-scan] {ft}={code} failed page offset={off}: {e}")
+            return None
+
+    while pending:
+        follow_up: List[Tuple[str, str, int]] = []
+        i = 0
+        while i < len(pending):
+            chunk = pending[i : i + (batch_size if batching else 1)]
+            i += len(chunk)
+            blocks: List[Optional[dict]] = []
+            if batching and len(chunk) > 1:
+                try:
+                    resp = sess.post(
+                        API_URL,
+                        json=_build_batch_payload(model, market, chunk, page_limit),
+                        timeout=20,
+                    )
+                    resp.raise_for_status()
+                    blocks = _split_batch_response(_decode_json(resp), len(chunk))
+                except Exception as e:
+                    print(f"[feature-scan] batch rejected, falling back to single queries: {e}")
+                    batching = False
+            if not blocks:
+                blocks = [_single(page) for page in chunk]
+
+            for (ft, code, off), block in zip(chunk, blocks):
+                if block is None:
+                    failed.add((ft, code))
+                    continue
+                meta, ads = _page_parts(block)
+                for ad in ads:
+                    vid = ad.get("id")
+                    if vid is not None:
+                        ids[(ft, code)].add(str(vid))
+                if off == 0:
+                    step = int(meta.get("resultCount") or len(ads))
+                    total = int(meta.get("totalCount") or step)
+                    if step > 0:
+                        follow_up.extend((ft, code, o) for o in range(step, total, step))
+        pending = follow_up
+    return ids, failed
+
+
+# ---------- Response decoding (br/gzip/deflate/zstd, once) ----------
+def _decode_json(resp: requests.Response) -> dict:
+    return decoding.decode_json(resp.content, resp.headers.get("Content-Encoding", ""))
 
 
 # ---------- Helpers ----------
@@ -237,12 +421,174 @@ def _normalize_vehicle(ad: dict, model_family: str) -> dict:
     }
 
 
-def _fetch_page(sess: requests.Session, model: str, market: str, offset: int, limit: int) -> dict:
-    resp = sess.post(API_URL, json=_payload(model, market, offset, limit), timeout=20)
+def _post_page(sess: requests.Session, payload: dict) -> dict:
+    resp = sess.post(API_URL, json=payload, timeout=20)
     resp.raise_for_status()
     return _decode_json(resp)
 
 
+def _fetch_page(sess: requests.Session, model: str, market: str, offset: int, limit: int) -> dict:
+    return _post_page(sess, _payload(model, market, offset, limit))
+
+
+def _page_parts(block: dict):
+    """Split a SearchVehicleAds response into (metadata, vehicleAds)."""
+    data = (block.get("data") or {}).get("searchVehicleAds") or {}
+    return data.get("metadata") or {}, data.get("vehicleAds") or []
+
+
+def _fetch_pages_sequential(
+    sess: requests.Session, payload_for: Callable[[int], dict], offset: int = 0
+):
+    """Yield raw page blocks (payload_for(offset) per page), one round trip after another."""
+    total = None
+    while True:
+        block = _post_page(sess, payload_for(offset))
+        yield block
+        meta, ads = _page_parts(block)
+        result_count = int(meta.get("resultCount") or len(ads))
+        total = int(meta.get("totalCount") or (offset + result_count) if total is None else total)
+
+        if result_count <= 0 or offset + result_count >= total:
+            break
+        offset += result_count  # or += limit
+
+
+def _fetch_pages_parallel(
+    sess: requests.Session, payload_for: Callable[[int], dict], workers: int, offset: int = 0
+):
+    """Fetch the first page, then the remaining offsets concurrently.
+
+    Offsets advance by the first page's resultCount, exactly like the sequential
+    walk. Blocks are yielded in offset order and at most ``workers`` pages are
+    in flight (or buffered) at a time, so memory does not grow with totalCount.
+    """
+    first = _post_page(sess, payload_for(offset))
+    yield first
+    meta, ads = _page_parts(first)
+    step = int(meta.get("resultCount") or len(ads))
+    total = int(meta.get("totalCount") or offset + step)
+    if step <= 0 or offset + step >= total:
+        return
+    del first, ads
+
+    offsets = iter(range(offset + step, total, step))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(
+            pool.submit(_post_page, sess, payload_for(off)) for off in islice(offsets, workers)
+        )
+        while pending:
+            block = pending.popleft().result()
+            nxt = next(offsets, None)
+            if nxt is not None:
+                pending.append(pool.submit(_post_page, sess, payload_for(nxt)))
+            yield block
+
+
+def _fetch_pages_adaptive(
+    sess: requests.Session,
+    payload_for: Callable[[int, int], dict],
+    pager: AdaptivePager,
+    key: str,
+    limit: int,
+    offset: int = 0,
+):
+    """Sequential walk where each page's limit comes from ``pager``.
+
+    payload_for(offset, limit) builds the request. Timeouts, connection errors
+    and 5xx responses retry the same offset with a smaller limit (up to
+    MAX_FAILURES times) instead of failing the walk.
+    """
+    total = None
+    limit = pager.start(key, limit)
+    failures = 0
+    while True:
+        started = time.monotonic()
+        try:
+            resp = sess.post(API_URL, json=payload_for(offset, limit), timeout=20)
+            resp.raise_for_status()
+        except (requests.Timeout, requests.ConnectionError, requests.HTTPError) as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            failures += 1
+            if (status is not None and status < 500) or failures >= MAX_FAILURES:
+                raise
+            limit = pager.on_failure(key, limit)
+            print(f"[pager] {key} offset={offset} failed ({e}); retrying with limit={limit}")
+            continue
+        failures = 0
+        elapsed = time.monotonic() - started
+        next_limit = pager.observe(key, limit, elapsed, len(resp.content), retries_of(resp))
+        block = _decode_json(resp)
+        yield block
+        meta, ads = _page_parts(block)
+        result_count = int(meta.get("resultCount") or len(ads))
+        total = int(meta.get("totalCount") or (offset + result_count) if total is None else total)
+
+        if result_count <= 0 or offset + result_count >= total:
+            break
+        offset += result_count
+        limit = next_limit
+
+
+def _fetch_pages(
+    sess: requests.Session, payload_for: Callable[[int], dict], workers: int = 1, offset: int = 0
+):
+    if workers > 1:
+        return _fetch_pages_parallel(sess, payload_for, workers, offset)
+    return _fetch_pages_sequential(sess, payload_for, offset)
+
+
+def _walk(
+    sess: requests.Session,
+    payload_for: Callable[[int, int], dict],
+    limit: int,
+    workers: int,
+    pager: Optional[AdaptivePager],
+    key: str,
+    offset: int = 0,
+):
+    """Pick the page walker: adaptive when a pager is given and pages are sequential.
+
+    Parallel walks need a fixed step, so there the pager only supplies the
+    starting limit remembered from earlier runs. ``offset`` starts the walk
+    part-way through (resuming a checkpointed scrape).
+    """
+    if pager is not None:
+        if workers <= 1:
+            return _fetch_pages_adaptive(sess, payload_for, pager, key, limit, offset)
+        limit = pager.start(key, limit)
+    return _fetch_pages(sess, lambda off: payload_for(off, limit), workers, offset)
+
+
+def _build_vehicle(
+    ad: dict,
+    model: str,
+    code_to_label: Dict,
+    include_details: bool = False,
+) -> dict:
+    """Normalize one ad and apply option-code enrichment (and optional details)."""
+    v = _normalize_vehicle(ad, model_family=model)
+
+    # Phase A enrichment: parse stock image URLs for option codes (memoized per configuration)
+    try:
+        enrich_vehicle(v, code_to_label)
+    except Exception as e:  # pragma: no cover - enrichment best-effort
+        print(f"[enrich] failed for {v.get('id')}: {e}")
+
+    if include_details:
+        try:
+            details = fetch_details(v["id"])
+            if details:
+                # Prefer deep-scan values (only overwrite if deep scan supplies)
+                for k, val in details.items():
+                    if val is not None:
+                        v[k] = val
+        except Exception as e:
+            print(f"[deep-scan] {v['id']} failed: {e}")
+
+    return v
+
+
 # ---------- (Optional) deep details hook ----------
 def fetch_details(vehicle_id: str) -> dict:
     """
@@ -253,86 +599,99 @@ def fetch_details(vehicle_id: str) -> dict:
 
 
 # ---------- Public API ----------
-def fetch_raw(
+def iter_vehicles(
     models: Optional[List[str]] = None,
     market: Optional[str] = None,
     page_limit: Optional[int] = None,
     include_details: bool = False,
-) -> List[Dict]:
+    workers: Optional[int] = None,
+    fingerprints: Optional[FingerprintCache] = None,
+    pager: Optional[AdaptivePager] = None,
+    start: Optional[Tuple[str, int]] = None,
+    on_page: Optional[Callable[[str, int], None]] = None,
+    offset_range: Optional[Tuple[int, Optional[int]]] = None,
+) -> Iterator[Dict]:
     """
-    Fetch ALL vehicles for the given model list with pagination.
-    Returns a list of normalized dicts, one per vehicle.
-    Set include_details=True later if you wire up fetch_details().
+    Yield normalized, enriched vehicles page by page for the given model list.
+    Pass a scraper.fingerprint.FingerprintCache to reuse the previous record of
+    every ad whose content is unchanged (and to count changed/unchanged ads).
+    Pass a scraper.pager.AdaptivePager to size pages from measured latency/bytes.
+    ``start=(model, offset)`` skips the models listed before ``model`` and
+    begins that model at ``offset``; ``on_page(model, next_offset)`` is called
+    once every vehicle of a page has been consumed. Together they let
+    scraper.checkpoint resume an interrupted scrape.
+    ``offset_range=(lo, hi)`` limits every model to results [lo, hi) (hi None:
+    to the end), which is how scraper.shards splits one model across shards.
+    Only the current page (or ``workers`` pages in parallel mode) is held in
+    memory, so peak memory does not depend on inventory size.
+    With workers > 1 (or PAGE_WORKERS), the first page of each model is read to
+    learn totalCount and the remaining offsets are fetched concurrently; vehicles
+    are still yielded in offset order, identical to the sequential walk.
     """
     models = models or DEFAULT_MODELS
     market = market or DEFAULT_MARKET
     limit = page_limit or DEFAULT_LIMIT
 
-    sess = _session()
-    out: List[Dict] = []
-
-    # Build reverse maps once per run for enrichment
-    try:
-        _code_to_label, _ = build_reverse_maps(FILTERS)
-    except Exception:
-        _code_to_label = {}
+    workers = max(int(workers or DEFAULT_WORKERS), 1)
 
-    for model in models:
-        offset = 0
-        total = None
-        while True:
-            block = _fetch_page(sess, model, market, offset, limit)
-            data = (block.get("data") or {}).get("searchVehicleAds") or {}
-            meta = data.get("metadata") or {}
-            ads = data.get("vehicleAds") or []
+    sess = _walk_session(workers, pager, workers)
 
-            for ad in ads:
-                v = _normalize_vehicle(ad, model_family=model)
+    # Reverse maps are built once per process; enrichment caches key off this map
+    _code_to_label = default_code_to_label()
 
-                # Phase A enrichment: parse stock image URLs for option codes
-                try:
-                    image_urls = v.get("stock_images") or []
-                    raw_codes = extract_option_codes(image_urls)
-                    classified = classify_codes(raw_codes, _code_to_label)
-                    enriched = enrich_labels(classified, _code_to_label)
-
-                    # Attach raw codes (list for JSON friendliness) for future heuristic use
-                    v["raw_option_codes"] = sorted(list(classified.get("raw_option_codes") or []))
-
-                    # Populate primary descriptive fields if discovered (do not overwrite if already present in future deep scan phases)
-                    if not v.get("exterior") and enriched.get("exterior_label"):
-                        v["exterior"] = enriched["exterior_label"]
-                    if not v.get("interior") and enriched.get("interior_label"):
-                        v["interior"] = enriched["interior_label"]
-                    if not v.get("motor") and enriched.get("motor_label"):
-                        v["motor"] = enriched["motor_label"]
-                    # Wheel label intentionally not populated from URL parsing (unreliable)
-                except Exception as e:  # pragma: no cover - enrichment best-effort
-                    print(f"[enrich] failed for {v.get('id')}: {e}")
-
-                if include_details:
-                    try:
-                        details = fetch_details(v["id"])
-                        if details:
-                            # Prefer deep-scan values (only overwrite if deep scan supplies)
-                            for k, val in details.items():
-                                if val is not None:
-                                    v[k] = val
-                    except Exception as e:
-                        print(f"[deep-scan] {v['id']} failed: {e}")
-
-                out.append(v)
-
-            result_count = int(meta.get("resultCount") or len(ads))
-            total = int(
-                meta.get("totalCount") or (offset + result_count) if total is None else total
-            )
+    start_model, start_offset = start or (None, 0)
+    if start_model is not None:
+        models = models[models.index(start_model) :]
+    lo, hi = offset_range or (0, None)
 
-            if result_count <= 0 or offset + result_count >= total:
+    for model in models:
+        offset = start_offset if model == start_model else lo
+        blocks = _walk(
+            sess,
+            lambda off, lim, m=model: _payload(m, market, off, lim),
+            limit,
+            workers,
+            pager,
+            pager_key(model, market),
+            offset,
+        )
+        for block in blocks:
+            meta, ads = _page_parts(block)
+            step = int(meta.get("resultCount") or len(ads))
+            if hi is not None:
+                ads = ads[: max(hi - offset, 0)]
+            for ad in ads:
+                v = fingerprints.check(ad, _code_to_label) if fingerprints is not None else None
+                yield v or _build_vehicle(ad, model, _code_to_label, include_details)
+            offset += step
+            if on_page is not None:
+                on_page(model, offset)
+            if hi is not None and offset >= hi:
                 break
-            offset += result_count  # or += limit
 
-    return out
+
+def fetch_raw(
+    models: Optional[List[str]] = None,
+    market: Optional[str] = None,
+    page_limit: Optional[int] = None,
+    include_details: bool = False,
+    workers: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Fetch ALL vehicles for the given model list with pagination.
+    Returns a list of normalized dicts, one per vehicle.
+    Set include_details=True later if you wire up fetch_details().
+    Prefer iter_vehicles() when the caller can consume vehicles as a stream.
+    """
+    return list(
+        iter_vehicles(
+            models=models,
+            market=market,
+            page_limit=page_limit,
+            include_details=include_details,
+            workers=workers,
+        )
+    )
 
 
 # ---------- CLI test ----------
@@ -0,0 +1,164 @@
+"""Sharded fan-out scraping: shard specs, shard keys and the shard merge.
+
+One scrape run can be split across concurrent ``scrape_to_s3`` invocations.
+Every invocation of a run gets the same ``run`` id and its own shard spec:
+
+  {"run": "20261016-060000",
+   "shard": {"index": 3, "models": ["PS2"], "market": "us", "offsets": [2000, 4000]}}
+
+``models``/``market`` default to MODELS/MARKET; ``offsets`` is [lo, hi) over
+each model's results (hi null: to the end). A shard writes
+``raw/{run}/shard-{index}.json`` (plus ``.fingerprints.json``) instead of
+``raw/latest.json``.
+
+The feature deep scan runs once per run, not once per shard: invoke
+``scrape_to_s3`` with ``{"scan_run": run}`` before fanning out; it writes
+``raw/{run}/scan.json`` and every shard applies that shared result. A shard
+that would scan (no ``skip_deep_scan``) but finds no shared scan is rejected.
+
+Once all shards are in, either run the merge step
+(``scrape_to_s3`` with ``{"merge_run": run}``), which writes the merged
+snapshot and moves ``raw/latest.json`` to it, or point ``daily_refresh`` at
+the shards directly with ``{"run": run}``. Both de-duplicate by id; when two
+shards saw the same vehicle (overlapping ranges, listings moving between
+pages) the record with the newest scrape_date wins.
+
+Run-wide state is saved by the merge step only: the feature model is trained
+from the shared scan and the merged vehicles, and the adaptive page sizes each
+shard stored in ``raw/{run}/shard-{index}.pages.json`` are combined (smallest
+size per key). Reading the shards directly from daily_refresh updates neither.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+RAW_PREFIX = "raw"
+
+_SHARD_RE = re.compile(r"/shard-(\d+)\.json$")
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    index: int
+    models: Tuple[str, ...] = ()
+    market: Optional[str] = None
+    offset_start: int = 0
+    offset_end: Optional[int] = None
+
+    @classmethod
+    def from_event(cls, data: dict) -> "ShardSpec":
+        """Parse an event's ``shard`` object; raises ValueError on a bad spec."""
+        if not isinstance(data, dict) or "index" not in data:
+            raise ValueError(f"shard spec needs an index: {data!r}")
+        lo, hi = (list(data.get("offsets") or []) + [0, None])[:2]
+        spec = cls(
+            index=int(data["index"]),
+            models=tuple(data.get("models") or ()),
+            market=data.get("market") or None,
+            offset_start=int(lo or 0),
+            offset_end=None if hi is None else int(hi),
+        )
+        if spec.index < 0 or spec.offset_start < 0:
+            raise ValueError(f"shard index and offsets must be >= 0: {data!r}")
+        if spec.offset_end is not None and spec.offset_end <= spec.offset_start:
+            raise ValueError(f"empty shard offset range: {data!r}")
+        return spec
+
+    @property
+    def offset_range(self) -> Optional[Tuple[int, Optional[int]]]:
+        if self.offset_start == 0 and self.offset_end is None:
+            return None
+        return self.offset_start, self.offset_end
+
+
+def shard_key(run: str, index: int, prefix: str = RAW_PREFIX) -> str:
+    return f"{prefix}/{run}/shard-{index}.json"
+
+
+def scan_key(run: str, prefix: str = RAW_PREFIX) -> str:
+    return f"{prefix}/{run}/scan.json"
+
+
+def fingerprints_key(run: str, index: int, prefix: str = RAW_PREFIX) -> str:
+    return f"{prefix}/{run}/shard-{index}.fingerprints.json"
+
+
+def list_shards(client, bucket: str, run: str, prefix: str = RAW_PREFIX) -> List[Tuple[int, str]]:
+    """(index, key) of every shard snapshot of ``run``, by index."""
+    found = []
+    kw = {"Bucket": bucket, "Prefix": f"{prefix}/{run}/shard-"}
+    while True:
+        page = client.list_objects_v2(**kw)
+        for obj in page.get("Contents") or ():
+            m = _SHARD_RE.search(obj["Key"])
+            if m:
+                found.append((int(m.group(1)), obj["Key"]))
+        if not page.get("IsTruncated"):
+            break
+        kw["ContinuationToken"] = page["NextContinuationToken"]
+    return sorted(found)
+
+
+def merge_vehicles(shards: Iterable[Iterable[dict]]) -> List[dict]:
+    """One record per id, in first-seen order; the newest scrape_date wins."""
+    merged: Dict[str, dict] = {}
+    for vehicles in shards:
+        for v in vehicles:
+            vid = str(v.get("id"))
+            seen = merged.get(vid)
+            if seen is None or str(v.get("scrape_date") or "") > str(seen.get("scrape_date") or ""):
+                merged[vid] = v
+    return list(merged.values())
+
+
+def pages_key(run: str, index: int, prefix: str = RAW_PREFIX) -> str:
+    return f"{prefix}/{run}/shard-{index}.pages.json"
+
+
+def merge_page_sizes(states: Iterable[Optional[dict]]) -> Dict[str, int]:
+    """Combine AdaptivePager.to_dict() states: the smallest size per key."""
+    sizes: Dict[str, int] = {}
+    for state in states:
+        for key, size in ((state or {}).get("sizes") or {}).items():
+            sizes[key] = min(int(size), sizes.get(key, int(size)))
+    return sizes
+
+
+def load_page_sizes(
+    client, bucket: str, run: str, indexes: Iterable[int], prefix: str = RAW_PREFIX
+) -> Dict[str, int]:
+    """Merged page sizes of the given shards (shards without a state are skipped)."""
+    states = []
+    for index in indexes:
+        try:
+            states.append(_read(client, bucket, pages_key(run, index, prefix)))
+        except Exception:
+            continue
+    return merge_page_sizes(states)
+
+
+def _read(client, bucket: str, key: str):
+    return json.loads(client.get_object(Bucket=bucket, Key=key)["Body"].read())
+
+
+def load_merged(
+    client, bucket: str, run: str, prefix: str = RAW_PREFIX
+) -> Tuple[List[dict], Dict[str, str], List[int]]:
+    """Merge every shard of ``run``: (vehicles, fingerprints, shard indexes found)."""
+    shards = list_shards(client, bucket, run, prefix)
+    snapshots = []
+    fingerprints: Dict[str, str] = {}
+    for index, key in shards:
+        snapshots.append(_read(client, bucket, key).get("vehicles") or [])
+        try:
+            fingerprints.update(
+                _read(client, bucket, fingerprints_key(run, index, prefix)).get("fingerprints")
+                or {}
+            )
+        except Exception as e:
+            print(f"[shards] no fingerprints for shard {index} of {run}: {e}")
+    return merge_vehicles(snapshots), fingerprints, [index for index, _ in shards]
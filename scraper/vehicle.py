@@ -0,0 +1,174 @@
+"""Compact vehicle record for large batches (100k+ listings held at once).
+
+Scraper records are plain dicts with ~25 string keys; a dict per vehicle plus
+the ``{**base, **v}`` copies in the loader cost several KB each. ``Vehicle`` is
+a slotted dataclass (no per-instance ``__dict__``) whose categorical strings
+(model, location, colors, motor, option tokens, stock image URLs, ...) are
+interned, so 100k vehicles share one copy of each distinct value. List fields
+are stored as tuples.
+
+Conversions are lossless for every key the scraper and enrichment produce;
+unknown keys are kept in ``extra``. Optional enrichment fields that are None
+are left out of ``to_dict`` so snapshots look like the scraper's own output.
+
+Exposed:
+- Vehicle.from_dict(d) / Vehicle.to_dict() -> snapshot/JSON record
+- Vehicle.to_db_params() -> params for the vehicles upsert (all DB keys present)
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, fields
+from typing import Dict, Optional, Tuple
+
+# Fields set by the feature deep scan / inference (never by the scraper itself,
+# except a motor label code_parser reads from the image URLs)
+FEATURE_FIELDS = ("wheels", "motor", "performance", "pilot", "plus")
+# Enrichment/feature fields that may be absent from a scraper record
+OPTIONAL = ("exterior", "interior", "wheels", "motor", "edition", "performance", "pilot", "plus")
+DB_KEYS = (
+    "id", "vin", "model", "year", "partner_location", "state", "mileage",
+    "first_time_registration", "retail_price", "dealer_price",
+    "exterior", "interior", "wheels", "motor", "edition",
+    "performance", "pilot", "plus", "stock_images",
+)  # fmt: skip
+
+
+class _Interned(dict):
+    """str -> its interned copy; lookups of strings already seen stay in C."""
+
+    def __missing__(self, value):
+        if not isinstance(value, str):
+            return value
+        shared = self[value] = sys.intern(value)
+        return shared
+
+
+_interned = _Interned({None: None})
+# Categorical fields, in the order from_dict unpacks them
+_CATEGORICAL = (
+    "model", "partner_location", "state", "currency", "model_family", "scrape_date",
+    "exterior", "interior", "wheels", "motor", "edition",
+)  # fmt: skip
+
+
+@dataclass(slots=True)
+class Vehicle:
+    id: str
+    vin: Optional[str] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    partner_location: Optional[str] = None
+    state: Optional[str] = None
+    mileage: Optional[int] = None
+    first_time_registration: Optional[str] = None
+    retail_price: Optional[float] = None
+    dealer_price: Optional[float] = None
+    currency: Optional[str] = None
+    stock_images: Tuple[str, ...] = ()
+    model_family: Optional[str] = None
+    scrape_date: Optional[str] = None
+    raw_option_codes: Optional[Tuple[str, ...]] = None
+    exterior: Optional[str] = None
+    interior: Optional[str] = None
+    wheels: Optional[str] = None
+    motor: Optional[str] = None
+    edition: Optional[str] = None
+    performance: Optional[bool] = None
+    pilot: Optional[bool] = None
+    plus: Optional[bool] = None
+    extra: Optional[Dict[str, object]] = None  # keys not modelled above
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Vehicle":
+        # Hot path (one call per vehicle of a batch): no per-field Python calls,
+        # and the extra-keys scan only runs when the record has unknown keys
+        get = d.get
+        share = _interned.__getitem__
+        imgs = get("stock_images") or ()
+        if isinstance(imgs, str):
+            imgs = [p.strip() for p in imgs.split(",") if p.strip()]
+        raw = get("raw_option_codes")
+        if _FIELD_SET.issuperset(d):
+            extra = None
+        else:
+            extra = {k: v for k, v in d.items() if k not in _FIELD_SET} or None
+        (
+            model,
+            location,
+            state,
+            currency,
+            family,
+            scraped,
+            exterior,
+            interior,
+            wheels,
+            motor,
+            edition,
+        ) = map(share, map(get, _CATEGORICAL))
+        return cls(
+            str(get("id")),
+            get("vin"),
+            model,
+            get("year"),
+            location,
+            state,
+            get("mileage"),
+            get("first_time_registration"),
+            get("retail_price"),
+            get("dealer_price"),
+            currency,
+            tuple(map(share, imgs)),
+            family,
+            scraped,
+            None if raw is None else tuple(map(share, raw)),
+            exterior,
+            interior,
+            wheels,
+            motor,
+            edition,
+            get("performance"),
+            get("pilot"),
+            get("plus"),
+            extra,
+        )
+
+    def to_dict(self) -> dict:
+        """Snapshot/JSON form (lists instead of tuples, unset optionals omitted)."""
+        out = {
+            "id": self.id,
+            "vin": self.vin,
+            "model": self.model,
+            "year": self.year,
+            "partner_location": self.partner_location,
+            "state": self.state,
+            "mileage": self.mileage,
+            "first_time_registration": self.first_time_registration,
+            "retail_price": self.retail_price,
+            "dealer_price": self.dealer_price,
+            "currency": self.currency,
+            "stock_images": list(self.stock_images),
+            "model_family": self.model_family,
+            "scrape_date": self.scrape_date,
+        }
+        if self.raw_option_codes is not None:
+            out["raw_option_codes"] = list(self.raw_option_codes)
+        for name in OPTIONAL:
+            value = getattr(self, name)
+            if value is not None:
+                out[name] = value
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+    def to_db_params(self) -> dict:
+        """Every column of the vehicles upsert; package flags default to False."""
+        out = {k: getattr(self, k) for k in DB_KEYS}
+        out["stock_images"] = list(self.stock_images)
+        for k in ("performance", "pilot", "plus"):
+            out[k] = bool(out[k])
+        return out
+
+
+_FIELD_SET = frozenset(f.name for f in fields(Vehicle)) - {"extra"}
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+import scraper.async_scraper as async_scraper
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession, strip_dates
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.sync = FakeSession()
+
+    async def post(self, url, json=None, timeout=0):  # noqa: A002
+        await asyncio.sleep(0)
+        return self.sync.post(url, json=json, timeout=timeout)
+
+
+def test_fetch_raw_async_matches_sync(monkeypatch):
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    expected = scraper.fetch_raw(models=["PS2", "PS3"], market="us", page_limit=200)
+
+    client = FakeAsyncClient()
+    got = asyncio.run(
+        async_scraper.fetch_raw_async(
+            models=["PS2", "PS3"], market="us", page_limit=200, client=client
+        )
+    )
+    assert len(got) == 2 * TOTAL
+    assert strip_dates(got) == strip_dates(expected)
+    assert sorted(client.sync.offsets) == [0, 0, 200, 200, 400, 400]
+
+
+def test_fetch_ids_for_filter_async_collects_all_pages():
+    client = FakeAsyncClient()
+    ids = asyncio.run(
+        async_scraper.fetch_ids_for_filter_async(
+            "Wheels", "R184", "PS2", "us", page_limit=100, client=client
+        )
+    )
+    assert ids == {f"ad-{i:04d}" for i in range(TOTAL)}
+    assert sorted(client.sync.offsets) == [0, 100, 200, 300, 400]
+
+
+class FlakyAsyncClient(FakeAsyncClient):
+    """Raises (or returns) the queued ``errors`` for the first requests, then serves pages."""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+        self.attempts = 0
+
+    async def post(self, url, json=None, timeout=0):  # noqa: A002
+        self.attempts += 1
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            return error
+        return await super().post(url, json=json, timeout=timeout)
+
+
+@pytest.fixture
+def httpx():
+    return pytest.importorskip("httpx")
+
+
+@pytest.fixture
+def slept(monkeypatch):
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        delays.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(async_scraper.asyncio, "sleep", sleep)
+    return delays
+
+
+def _throttled(httpx, retry_after):
+    resp = httpx.Response(429, headers={"Retry-After": retry_after})
+    resp.request = httpx.Request("POST", scraper.API_URL)
+    return resp
+
+
+def test_transport_error_is_retried(httpx, slept):
+    client = FlakyAsyncClient([httpx.ConnectError("connection reset")])
+    got = asyncio.run(
+        async_scraper.fetch_raw_async(models=["PS2"], market="us", page_limit=200, client=client)
+    )
+    assert len(got) == TOTAL
+    assert client.attempts == 1 + 3
+    assert slept[0] == async_scraper.BACKOFF_FACTOR
+
+
+def test_429_waits_for_retry_after(httpx, slept):
+    client = FlakyAsyncClient([_throttled(httpx, "7")])
+    got = asyncio.run(
+        async_scraper.fetch_raw_async(models=["PS2"], market="us", page_limit=200, client=client)
+    )
+    assert len(got) == TOTAL
+    assert slept[0] == 7.0
+
+
+def test_transport_errors_give_up_after_max_retries(httpx, slept):
+    errors = [httpx.ReadTimeout("slow")] * (async_scraper.MAX_RETRIES + 1)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(
+            async_scraper.fetch_raw_async(
+                models=["PS2"], market="us", page_limit=200, client=FlakyAsyncClient(errors)
+            )
+        )
+    assert len(slept) == async_scraper.MAX_RETRIES
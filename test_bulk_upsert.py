@@ -0,0 +1,179 @@
+import contextlib
+
+from database import db
+from jobs import daily_refresh
+from scraper.feature_scan import FeatureDef, FeatureScan
+from scraper.vehicle import DB_KEYS, Vehicle
+
+
+def test_copy_reader_escapes_and_chunks():
+    rows = [
+        ("a", None, True, ["u1", "u2"], "tab\there"),
+        ("b", "back\\slash", False, [], "new\nline"),
+    ]
+    reader = db._CopyReader(rows)
+
+    chunks = []
+    while True:
+        part = reader.read(7)
+        if not part:
+            break
+        assert len(part) <= 7
+        chunks.append(part)
+
+    assert "".join(chunks) == (
+        'a\t\\N\tt\t["u1","u2"]\ttab\\there\n' "b\tback\\\\slash\tf\t[]\tnew\\nline\n"
+    )
+    assert reader.rows == 2
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+        self.copied = ""
+        self.rowcount = 1
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, reader, size):
+        self.statements.append(sql)
+        self.copied = reader.read()
+
+    def fetchone(self):
+        return {"rows": 2, "wheels": 1, "motor": 0, "performance": 1, "pilot": 0, "plus": 0}
+
+    def fetchall(self):
+        return [{"id": "v1", "inserted": True, "old_price": None, "new_price": "30000.00"}]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    def __init__(self):
+        self.cur = FakeCursor()
+        self.commits = 0
+
+    def cursor(self, cursor_factory=None):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_copy_upsert_stages_then_merges_in_one_transaction(monkeypatch):
+    fake = FakeConn()
+    monkeypatch.setattr(daily_refresh, "conn", lambda: contextlib.nullcontext(fake))
+    vehicles = [
+        Vehicle(id="v1", model="Polestar 2", year=2024, retail_price="30000.00"),
+        Vehicle(id="v2", model="Polestar 2", year=2023, stock_images=("https://x/1.png",)),
+    ]
+
+    changes, touched = daily_refresh._upsert_copy(vehicles)
+
+    create, copy, touch, merge = fake.cur.statements
+    assert create == daily_refresh.CREATE_STAGE
+    assert copy.startswith(f"COPY vehicles_stage ({', '.join(DB_KEYS)}, row_hash) FROM STDIN")
+    assert touch == daily_refresh.TOUCH_FROM_STAGE and touched == 1
+    assert merge == daily_refresh.UPSERT_FROM_STAGE and "ON CONFLICT (id)" in merge
+    assert "INSERT INTO price_history" in merge and changes[0]["id"] == "v1"
+    lines = fake.cur.copied.splitlines()
+    assert [line.split("\t")[0] for line in lines] == ["v1", "v2"]
+    assert lines[1].split("\t")[-2] == '["https://x/1.png"]'
+    assert lines[1].split("\t")[-1] == daily_refresh._row_hash(vehicles[1])
+    assert fake.commits == 0  # committed by db.conn() / the enclosing transaction()
+
+
+def test_row_hash_tracks_upserted_columns_only():
+    v = Vehicle(id="v1", model="Polestar 2", retail_price="30000.00", stock_images=("a", "b"))
+
+    assert daily_refresh._row_hash(v) == daily_refresh._row_hash(
+        Vehicle(id="v1", model="Polestar 2", retail_price="30000.00", stock_images=("a", "b"))
+    )
+    # scrape metadata is not stored, so it must not force a rewrite
+    assert daily_refresh._row_hash(v) == daily_refresh._row_hash(
+        Vehicle.from_dict({**v.to_dict(), "scrape_date": "2026-10-16"})
+    )
+    for changed in ({"retail_price": "29500.00"}, {"stock_images": ["b", "a"]}):
+        assert daily_refresh._row_hash(v) != daily_refresh._row_hash(
+            Vehicle.from_dict({**v.to_dict(), **changed})
+        )
+
+
+def test_unchanged_rows_are_skipped_by_the_upsert():
+    for sql in (daily_refresh.UPSERT_VEHICLE_BULK, daily_refresh.UPSERT_FROM_STAGE):
+        assert "WHERE vehicles.row_hash IS DISTINCT FROM EXCLUDED.row_hash" in sql
+    assert "v.row_hash = s.row_hash" in daily_refresh.TOUCH_UNCHANGED
+
+
+def test_deep_scan_is_applied_as_one_table_in_one_update(monkeypatch):
+    fake = FakeConn()
+    monkeypatch.setattr(daily_refresh, "conn", lambda: contextlib.nullcontext(fake))
+    scan = FeatureScan()
+    scan.add(FeatureDef("Wheels", "R1", "20in", "wheels"), {"v1", "v2"})
+    scan.add(FeatureDef("Wheels", "R2", "21in", "wheels"), {"v2"})
+    scan.add(FeatureDef("Package", "P1", "Performance", "performance"), {"v3"})
+
+    counts = daily_refresh._apply_features(scan)
+
+    create, copy, update = fake.cur.statements
+    assert create == daily_refresh.CREATE_FEATURE_STAGE
+    assert copy.startswith("COPY feature_stage (id, wheels, motor, performance, pilot, plus)")
+    assert update == daily_refresh.APPLY_FEATURES
+    assert sorted(fake.cur.copied.splitlines()) == [
+        "v1\t20in\t\\N\tf\tf\tf",
+        "v2\t21in\t\\N\tf\tf\tf",  # later code wins, as in filters.py order
+        "v3\t\\N\t\\N\tt\tf\tf",
+    ]
+    assert counts["rows"] == 2 and counts["wheels"] == 1
+
+
+def _patch_refresh(monkeypatch, events, scan):
+    @contextlib.contextmanager
+    def transaction():
+        events.append("begin")
+        yield
+        events.append("commit")
+
+    def apply_features(scan):
+        events.append("apply")
+        return dict.fromkeys(("rows", "wheels", "motor", "performance", "pilot", "plus"), 0)
+
+    monkeypatch.setattr(daily_refresh, "transaction", transaction)
+    monkeypatch.setattr(daily_refresh, "_load_raw_from_s3", lambda run_id=None: [])
+    monkeypatch.setattr(
+        daily_refresh.feature_scan, "scan_features", lambda: events.append("scan") or scan
+    )
+    monkeypatch.setattr(
+        daily_refresh, "_upsert_values", lambda rows: events.append("upsert") or ([], 0)
+    )
+    monkeypatch.setattr(daily_refresh, "_apply_features", apply_features)
+    monkeypatch.setattr(daily_refresh, "execute", lambda sql: events.append("mark"))
+    monkeypatch.setattr(daily_refresh, "fetch_all", lambda sql: [])
+    monkeypatch.setattr(daily_refresh, "_export_json", lambda rows: events.append("export"))
+
+
+def test_single_transaction_opens_after_the_network_work(monkeypatch):
+    events = []
+    _patch_refresh(monkeypatch, events, FeatureScan())
+
+    summary = daily_refresh.handler({"single_transaction": True, "skip_deep_scan": False})
+
+    assert events == ["scan", "begin", "upsert", "apply", "mark", "commit", "export"]
+    assert summary["deep_scan_skipped"] is False and summary["deep_scan_failed_codes"] == []
+
+
+def test_failed_scan_codes_are_reported(monkeypatch):
+    scan = FeatureScan()
+    scan.add(FeatureDef("Wheels", "R1", "20in", "wheels"), {"v1"})
+    scan.failed.append(FeatureDef("Package", "P1", "Performance", "performance"))
+    _patch_refresh(monkeypatch, [], scan)
+
+    summary = daily_refresh.handler({"skip_deep_scan": False})
+
+    assert summary["deep_scan_skipped"] is False
+    assert summary["deep_scan_failed_codes"] == ["P1"]
@@ -0,0 +1,86 @@
+import json
+
+import jobs.scrape_to_s3 as scrape_to_s3
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession
+from scraper import checkpoint
+from test_scrape_to_s3 import FakeS3
+
+
+class CheckpointS3(FakeS3):
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+class LambdaContext:
+    """Reports ``remaining_ms`` values in turn, then plenty of time."""
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = list(remaining_ms)
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms.pop(0) if self.remaining_ms else 900_000
+
+
+def _setup(monkeypatch):
+    fake = CheckpointS3()
+    sessions = []
+
+    def factory(**kw):
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scraper, "_session", factory)
+    monkeypatch.setattr(scrape_to_s3, "CHECKPOINT_EVERY_PAGES", 1)
+    return fake, sessions
+
+
+def test_timed_out_scrape_resumes_from_checkpoint(monkeypatch):
+    fake, sessions = _setup(monkeypatch)
+
+    # deadline hits after the second page (pages of 200)
+    first = scrape_to_s3.handler({"skip_deep_scan": True}, LambdaContext([900_000, 1_000]))
+
+    assert first["complete"] is False and first["vehicles"] == 400
+    assert first["cursor"] == ["PS2", "us", 400]
+    assert scrape_to_s3.CHECKPOINT_KEY in fake.objects
+    assert scrape_to_s3.RAW_KEY not in fake.objects
+
+    second = scrape_to_s3.handler({"skip_deep_scan": True}, LambdaContext([]))
+
+    assert second["complete"] is True and second["vehicles"] == TOTAL
+    assert sessions[-1].offsets == [400]
+    assert second["changed"] == TOTAL
+    snapshot = json.loads(fake.objects[scrape_to_s3.RAW_KEY])
+    assert [v["id"] for v in snapshot["vehicles"]] == [f"ad-{i:04d}" for i in range(TOTAL)]
+    assert scrape_to_s3.CHECKPOINT_KEY not in fake.objects
+
+
+def test_stale_checkpoint_is_discarded(monkeypatch):
+    fake, sessions = _setup(monkeypatch)
+    stale = checkpoint.ScrapeCheckpoint.new(skip_scan=True)
+    stale.started_at -= checkpoint.MAX_AGE_SECONDS + 1
+    stale.cursor = ["PS2", "us", 400]
+    stale.vehicles = [{"id": "gone"}]
+    fake.objects[scrape_to_s3.CHECKPOINT_KEY] = stale.to_bytes()
+
+    out = scrape_to_s3.handler({"skip_deep_scan": True})
+
+    assert out["complete"] is True and out["vehicles"] == TOTAL
+    assert sessions[-1].offsets == [0, 200, 400]
+    assert b"gone" not in fake.objects[scrape_to_s3.RAW_KEY]
+
+
+def test_local_store_round_trip(tmp_path):
+    store = checkpoint.LocalCheckpointStore(str(tmp_path / "raw" / "checkpoint.json"))
+    assert checkpoint.load(store) is None
+
+    ckpt = checkpoint.ScrapeCheckpoint.new()
+    ckpt.cursor = ["PS2", "us", 200]
+    store.save(ckpt.to_bytes())
+    loaded = checkpoint.load(store)
+    assert loaded.run_id == ckpt.run_id and loaded.cursor == ["PS2", "us", 200]
+
+    store.clear()
+    assert checkpoint.load(store) is None
@@ -1,8 +1,11 @@
 from scraper.code_parser import (
     extract_option_codes,
     build_reverse_maps,
+    cache_stats,
     classify_codes,
+    configuration_key,
     enrich_labels,
+    enrich_many,
 )
 from scraper.filters import filters as FILTERS
 
@@ -30,3 +33,42 @@ def test_code_parser_sample():
 
     # Ensure raw_option_codes retained
     assert "raw_option_codes" in classified
+
+
+def test_configuration_key_ignores_angle():
+    base = (
+        "https://cas.polestar.com/image/dynamic/MY24_2335/534/summary-transparent-v1/FD/1/31/73600/"
+        "R6B000/R184/LR01/default.png"
+    )
+    keys = {configuration_key(f"{base}?market=us&angle={a}&bg=00000000") for a in range(3)}
+    assert keys == {base.split("//", 1)[1].split("/", 1)[1]}
+
+
+def test_enrich_many_parses_each_configuration_once():
+    from scraper import code_parser
+
+    url = (
+        "https://cas.polestar.com/image/dynamic/MY24_2335/534/summary-transparent-v1/FE/1/31/72900/"
+        "R60000/LR01/_/default.png?market=us&angle={}&bg=00000000"
+    )
+    vehicles = [
+        {"id": str(i), "stock_images": [url.format(a) for a in range(3)]} for i in range(10)
+    ]
+    code_parser._KEY_CACHE.clear()
+    code_parser._ENRICH_CACHE.clear()
+
+    enrich_many(vehicles)
+
+    stats = cache_stats()
+    assert stats["config_keys"]["misses"] == 1
+    assert stats["enrichment"]["misses"] == 1 and stats["enrichment"]["hits"] == 9
+
+    # same result as the uncached classify/enrich pipeline
+    code_to_label, _ = build_reverse_maps(FILTERS)
+    raw = extract_option_codes(vehicles[0]["stock_images"])
+    enriched = enrich_labels(classify_codes(raw, code_to_label), code_to_label)
+    for v in vehicles:
+        assert v["raw_option_codes"] == sorted(raw)
+        assert v["exterior"] == enriched["exterior_label"] == "Magnesium"
+        assert v["interior"] == enriched["interior_label"]
+        assert v["motor"] == enriched["motor_label"]
@@ -0,0 +1,122 @@
+import psycopg2
+import pytest
+
+from database import db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if self.conn.dead:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.conn.executed.append(sql)
+        self.conn.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    def __init__(self, n):
+        self.n = n
+        self.closed = 0
+        self.dead = False
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.commits += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    conns = []
+
+    def connect():
+        conns.append(FakeConn(len(conns)))
+        return conns[-1]
+
+    monkeypatch.setattr(db, "_pool", db.ConnectionPool(size=2, ping_after=60, connect=connect))
+    return conns
+
+
+def test_helpers_reuse_one_pooled_connection(opened):
+    db.execute("UPDATE a")
+    db.execute("UPDATE b")
+
+    assert len(opened) == 1 and opened[0].commits == 2
+    assert db.pool().stats() == {"opened": 1, "reused": 1, "idle": 1}
+
+
+def test_stale_connection_is_replaced(opened):
+    db.execute("UPDATE a")
+    opened[0].dead = True
+    db.pool().ping_after = 0
+
+    db.execute("UPDATE b")
+
+    assert len(opened) == 2 and opened[0].closed
+    assert opened[1].executed == ["UPDATE b"]
+
+
+def test_transaction_shares_connection_and_commits_once(opened):
+    with db.transaction():
+        db.execute("UPDATE a")
+        with db.transaction():
+            db.execute("UPDATE b")
+        db.execute_values("INSERT INTO t VALUES %s", [])
+
+    assert len(opened) == 1
+    assert opened[0].executed == ["UPDATE a", "UPDATE b"]
+    assert opened[0].commits == 1
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.execute("UPDATE c")
+            raise RuntimeError("boom")
+    assert opened[0].commits == 1 and opened[0].rollbacks == 1
+    assert len(opened) == 1  # rolled back and returned to the pool
+
+
+def test_savepoint_keeps_the_transaction_usable(opened):
+    with db.transaction():
+        db.execute("UPDATE a")
+        with pytest.raises(RuntimeError):
+            with db.savepoint("coverage"):
+                db.execute("SELECT broken")
+                raise RuntimeError("boom")
+        db.execute("UPDATE b")
+
+    assert opened[0].executed == [
+        "UPDATE a",
+        "SAVEPOINT coverage",
+        "SELECT broken",
+        "ROLLBACK TO SAVEPOINT coverage",
+        "UPDATE b",
+    ]
+    assert opened[0].commits == 1 and opened[0].rollbacks == 0
+
+    with db.savepoint():
+        db.execute("UPDATE c")
+    assert opened[0].executed[-1] == "UPDATE c"
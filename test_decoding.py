@@ -0,0 +1,62 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+from scraper import decoding
+from scraper.scraper import _decode_json
+
+DOC = {"data": {"searchVehicleAds": {"metadata": {"totalCount": 1}, "vehicleAds": [{"id": "a"}]}}}
+RAW = json.dumps(DOC).encode()
+
+
+class Resp:
+    def __init__(self, content, encoding=""):
+        self.content = content
+        self.headers = {"Content-Encoding": encoding} if encoding else {}
+
+
+@pytest.mark.parametrize(
+    "body,encoding",
+    [
+        (RAW, ""),
+        (RAW, "br"),  # already decoded by the transport, header still present
+        (brotli.compress(RAW), "br"),
+        (gzip.compress(RAW), "gzip"),
+        (gzip.compress(RAW), ""),
+    ],
+)
+def test_decode_json_decompresses_at_most_once(body, encoding):
+    assert _decode_json(Resp(body, encoding)) == DOC
+
+
+@pytest.mark.skipif("zstd" not in decoding.DECOMPRESSORS, reason="no zstd decoder installed")
+def test_decode_zstd():
+    import zstandard
+
+    body = zstandard.ZstdCompressor().compress(RAW)
+    assert _decode_json(Resp(body, "zstd")) == DOC
+
+
+def test_accept_encoding_only_lists_decodable_codecs():
+    advertised = [c.strip() for c in decoding.ACCEPT_ENCODING.split(",")]
+    assert set(advertised) == set(decoding.DECOMPRESSORS)
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson", "msgspec"])
+def test_backends_agree(backend):
+    try:
+        loads = decoding.get_loads(backend)
+    except ImportError:
+        pytest.skip(f"{backend} not installed")
+    assert loads(RAW) == DOC
+
+
+def test_brotli_body_that_starts_like_json():
+    # brotli has no magic number; large bodies commonly start with b"["
+    ads = [{"id": f"ad-{i:05d}"} for i in range(10000)]
+    doc = {"data": {"searchVehicleAds": {"metadata": {"totalCount": len(ads)}, "vehicleAds": ads}}}
+    body = brotli.compress(json.dumps(doc).encode())
+    assert body[:1] in (b"[", b"{")
+    assert decoding.decode_json(body, "br") == doc
@@ -50,7 +50,7 @@ def test_fetch_ids_for_filter_builds_expected_payload(monkeypatch):
         def post(self, *a, **kw):
             return dummy_post(*a, **kw)
 
-    monkeypatch.setattr(scraper, "_session", lambda: DummySession())
+    monkeypatch.setattr(scraper, "_session", lambda **kw: DummySession())
 
     ids = scraper.fetch_ids_for_filter(
         "Wheels",
@@ -72,3 +72,15 @@ def test_fetch_ids_for_filter_builds_expected_payload(monkeypatch):
     # Ensure default exclude for New cycle state applied
     ex = vars_["excludeFilters"]
     assert any(f.get("filterType") == "CycleState" and f.get("value") == "New" for f in ex)
+
+
+def test_query_shapes_select_only_needed_fields():
+    listing = scraper._payload("PS2", "us", 0, 200)
+    ids_only = scraper._build_feature_payload("PS2", "us", "Wheels", "R184", 0, 200)
+    count = scraper._payload("PS2", "us", 0, 200, shape="count")
+
+    assert "stockImages" in listing["query"]
+    assert "stockImages" not in ids_only["query"] and "price" not in ids_only["query"]
+    assert count["variables"]["limit"] == 1
+    # constant query text is shared per shape, not rebuilt per page
+    assert scraper._payload("PS2", "us", 200, 200)["query"] is listing["query"]
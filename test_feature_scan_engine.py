@@ -0,0 +1,205 @@
+import json as jsonlib
+import threading
+
+import scraper.feature_scan as feature_scan
+import scraper.scraper as scraper
+from fakes import FakeResp
+
+# filter value -> matching ids
+MATCHES = {
+    "R184": [f"w{i}" for i in range(5)],
+    "XPEWHE": ["w4", "x1"],
+    "FD": ["w0", "m1"],
+    "1040": ["w1"],
+}
+
+
+class FilterSession:
+    def __init__(self):
+        self.headers = {}
+        self.posted = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        vars_ = json["variables"]
+        code = vars_["equalFilters"][0]["value"]
+        with self.lock:
+            self.posted.append((code, vars_["offset"]))
+        ids = MATCHES.get(code, [])
+        page = ids[vars_["offset"] : vars_["offset"] + vars_["limit"]]
+        meta = {"resultCount": len(page), "totalCount": len(ids)}
+        ads = [{"id": vid} for vid in page]
+        return FakeResp({"data": {"searchVehicleAds": {"metadata": meta, "vehicleAds": ads}}})
+
+
+def test_scan_features_builds_id_map_over_one_session(monkeypatch):
+    sessions = []
+
+    def factory(**kw):
+        sessions.append(FilterSession())
+        return sessions[-1]
+
+    monkeypatch.setattr(scraper, "_session", factory)
+
+    scan = feature_scan.scan_features("PS2", "us", workers=4, page_workers=2, page_limit=2)
+
+    assert len(sessions) == 1
+    defs = feature_scan.feature_defs()
+    assert {code for code, _ in sessions[0].posted} == {d.code for d in defs}
+    assert sorted(off for code, off in sessions[0].posted if code == "R184") == [0, 2, 4]
+
+    # XPEWHE is listed after R184 in filters.py, so it wins for w4
+    assert scan.features["w4"] == {"wheels": '21" Gloss Black Diamond Cut Alloy Wheel BST edition'}
+    assert scan.features["w0"]["motor"] == "Long range Dual motor - All Wheel Drive (AWD)"
+    assert scan.features["w1"]["pilot"] is True
+    assert scan.field_counts()["wheels"] == 6
+
+    v = {"id": "m1"}
+    assert scan.apply(v) == ["motor"] and v["motor"].startswith("Long range Dual")
+
+
+class FailingSession(FilterSession):
+    """Fails every page of ``code`` after its first one (a code that breaks mid-walk)."""
+
+    def __init__(self, code="R184"):
+        super().__init__()
+        self.code = code
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        vars_ = json["variables"]
+        if vars_["equalFilters"][0]["value"] == self.code and vars_["offset"] > 0:
+            raise ConnectionError("connection reset")
+        return super().post(url, json=json, timeout=timeout)
+
+
+def test_code_failing_mid_walk_is_recorded_as_failed(monkeypatch):
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FailingSession())
+
+    scan = feature_scan.scan_features("PS2", "us", workers=4, page_workers=1, page_limit=2)
+
+    assert [d.code for d in scan.failed] == ["R184"]
+    assert all(d.code != "R184" for d in scan.ids_by_def)
+    assert "w2" not in scan.features  # only R184 matched it
+    assert scan.features["x1"]["wheels"]  # other codes still apply
+
+
+class BatchSession(FilterSession):
+    """Answers aliased batch documents (or rejects them when ``reject``)."""
+
+    def __init__(self, reject=False):
+        super().__init__()
+        self.reject = reject
+        self.requests = 0
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        self.requests += 1
+        if json["operationName"] != "SearchVehicleAdsBatch":
+            return super().post(url, json=json, timeout=timeout)
+        if self.reject:
+            return FakeResp({"errors": [{"message": "batching disabled"}]})
+        vars_ = json["variables"]
+        data = {}
+        i = 0
+        while f"o{i}" in vars_:
+            single = {
+                "variables": {
+                    "offset": vars_[f"o{i}"],
+                    "limit": vars_["limit"],
+                    "equalFilters": vars_[f"f{i}"],
+                }
+            }
+            block = jsonlib.loads(super().post(url, json=single).content)
+            data[f"q{i}"] = block["data"]["searchVehicleAds"]
+            i += 1
+        return FakeResp({"data": data})
+
+
+def _expected_ids(defs):
+    return {(d.filter_type, d.code): set(MATCHES.get(d.code, [])) for d in defs}
+
+
+def test_batched_fetch_uses_few_round_trips(monkeypatch):
+    sess = BatchSession()
+    defs = feature_scan.feature_defs()
+    specs = [(d.filter_type, d.code) for d in defs]
+
+    got, failed = scraper.fetch_ids_for_filters_batched(
+        specs, "PS2", "us", page_limit=2, batch_size=20, sess=sess
+    )
+
+    assert got == _expected_ids(defs) and failed == set()
+    # one batch for every first page, one for R184's remaining pages (offsets 2, 4)
+    assert sess.requests == 2
+
+
+def test_batched_fetch_falls_back_to_single_queries(monkeypatch):
+    sess = BatchSession(reject=True)
+    defs = feature_scan.feature_defs()
+    specs = [(d.filter_type, d.code) for d in defs]
+
+    got, failed = scraper.fetch_ids_for_filters_batched(
+        specs, "PS2", "us", page_limit=2, batch_size=5, sess=sess
+    )
+
+    assert got == _expected_ids(defs) and failed == set()
+    # the rejected batch, then one request per page
+    assert sess.requests == 1 + len(specs) + 2
+
+
+class FailingBatchSession(BatchSession):
+    """Batches rejected; single pages of ``code`` after the first one fail."""
+
+    def __init__(self, code="R184"):
+        super().__init__(reject=True)
+        self.failing = FailingSession(code)
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        if json["operationName"] != "SearchVehicleAdsBatch":
+            self.requests += 1
+            return self.failing.post(url, json=json, timeout=timeout)
+        return super().post(url, json=json, timeout=timeout)
+
+
+def test_batched_scan_records_codes_with_a_failed_page(monkeypatch):
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FailingBatchSession())
+
+    scan = feature_scan.scan_features("PS2", "us", page_limit=2, batch_size=5)
+
+    assert [d.code for d in scan.failed] == ["R184"]
+    assert all(d.code != "R184" for d in scan.ids_by_def)
+    assert scan.features["x1"]["wheels"]
+
+
+def test_batch_payload_aliases_each_page():
+    payload = scraper._build_batch_payload(
+        "PS2", "us", [("Wheels", "R184", 0), ("Motor", "FD", 200)], 200
+    )
+    vars_ = payload["variables"]
+    assert vars_["o1"] == 200 and vars_["f1"] == [{"filterType": "Motor", "value": "FD"}]
+    assert (
+        "q0: searchVehicleAds(" in payload["query"] and "q1: searchVehicleAds(" in payload["query"]
+    )
+    assert "$f1: [EqualFilter!]" in payload["query"]
+
+
+def test_stopped_scan_resumes_from_checkpoint(monkeypatch):
+    sess = FilterSession()
+    monkeypatch.setattr(scraper, "_session", lambda **kw: sess)
+    defs = feature_scan.feature_defs()
+    calls = []
+
+    def stop():
+        calls.append(1)
+        return len(calls) > 3
+
+    first = feature_scan.scan_features("PS2", "us", workers=1, page_limit=2, stop=stop)
+    assert len(first.ids_by_def) == 3 and len(first.pending) == len(defs) - 3
+
+    restored = feature_scan.FeatureScan.from_dict(jsonlib.loads(jsonlib.dumps(first.to_dict())))
+    sess.posted.clear()
+    second = feature_scan.scan_features("PS2", "us", workers=4, page_limit=2, previous=restored)
+
+    assert {code for code, _ in sess.posted} == {d.code for d in first.pending}
+    assert not second.pending
+    full = feature_scan.scan_features("PS2", "us", workers=4, page_limit=2)
+    assert second.features == full.features
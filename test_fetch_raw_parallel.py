@@ -0,0 +1,20 @@
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession, strip_dates
+
+
+def test_parallel_fetch_matches_sequential(monkeypatch):
+    sessions = []
+
+    def factory(**kw):
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    monkeypatch.setattr(scraper, "_session", factory)
+
+    seq = scraper.fetch_raw(models=["PS2"], market="us", page_limit=200, workers=1)
+    par = scraper.fetch_raw(models=["PS2"], market="us", page_limit=200, workers=4)
+
+    assert len(seq) == TOTAL
+    assert strip_dates(par) == strip_dates(seq)
+    assert [v["id"] for v in par] == [f"ad-{i:04d}" for i in range(TOTAL)]
+    assert sorted(sessions[1].offsets) == [0, 200, 400]
@@ -0,0 +1,50 @@
+from scraper.inference import FeatureModel
+
+
+def _fleet():
+    """20 cars: token XW19 <-> 19" wheels, PLUS2 <-> Plus pack, FE/SKR shared by all."""
+    tokens, features = {}, {}
+    for i in range(20):
+        vid = f"ad-{i}"
+        toks = ["FE", "SKR"]
+        found = {}
+        if i % 2:
+            toks.append("XW19")
+            found["wheels"] = '19" Wheels'
+        else:
+            toks.append("XW20")
+            found["wheels"] = '20" Wheels'
+        if i % 4 == 0:
+            toks.append("PLUS2")
+            found["plus"] = True
+        tokens[vid] = toks
+        if found:
+            features[vid] = found
+    return tokens, features
+
+
+def test_train_learns_token_rules_and_skips_shared_tokens():
+    tokens, features = _fleet()
+    model = FeatureModel.train(tokens, features, min_support=3, min_confidence=0.9)
+
+    pred = model.predict(["FE", "XW19", "PLUS2"])
+    assert pred["wheels"] == ('19" Wheels', 1.0)
+    assert pred["plus"] == (True, 1.0)
+    # only positive package rules are learned
+    assert "plus" not in model.predict(["FE", "XW19"])
+    # tokens every car shares do not beat the threshold for any wheel value
+    assert "wheels" not in model.predict(["FE", "SKR"])
+    assert model.predict(["UNKNOWN"]) == {}
+
+
+def test_apply_evaluate_and_round_trip():
+    tokens, features = _fleet()
+    model = FeatureModel.train(tokens, features, min_support=3)
+    restored = FeatureModel.from_dict(model.to_dict())
+
+    v = {"id": "x", "raw_option_codes": ["XW20", "PLUS2"], "wheels": None, "plus": False}
+    assert sorted(restored.apply(v)) == ["plus", "wheels"]
+    assert v["wheels"] == '20" Wheels' and v["plus"] is True
+
+    report = restored.evaluate(tokens, features)
+    assert report["wheels"] == {"coverage": 1.0, "precision": 1.0}
@@ -0,0 +1,47 @@
+import scraper.scraper as scraper
+from loadtest.server import FakeApiConfig, serve
+from loadtest.synthetic import SyntheticInventory
+from scraper import feature_scan
+from scraper.scheduler import HostThrottle, ScrapeJob, run_matrix
+
+
+def test_inventory_is_deterministic_and_uses_filter_codes():
+    a = SyntheticInventory(500, seed=3)
+    b = SyntheticInventory(500, seed=3)
+    assert a.ad(42) == b.ad(42)
+    ad = a.ad(7)
+    assert ad["vehicleDetails"]["stockImages"][0].startswith("https://cas.polestar.com/image/")
+    wheels = [i for i in range(500) if a.matches(i, "Wheels", "R184")]
+    assert 0 < len(wheels) < 500
+    assert all("/R184/" in a.ad(i)["vehicleDetails"]["stockImages"][0] for i in wheels)
+    prices = [a.columns["price"][i] for i in a.select(sort_order="Descending")]
+    assert prices == sorted(prices, reverse=True)
+
+
+def test_scraper_and_feature_scan_against_fake_server(monkeypatch):
+    with serve(FakeApiConfig(count=1200, seed=1)) as (url, api):
+        monkeypatch.setattr(scraper, "API_URL", url)
+        inv = api.inventory("PS2", "us")
+        expected = inv.select(exclude=[{"filterType": "CycleState", "value": "New"}])
+
+        cars = scraper.fetch_raw(models=["PS2"], market="us", page_limit=250, workers=3)
+        assert [v["id"] for v in cars] == [inv.ad_id(i) for i in expected]
+
+        defs = [d for d in feature_scan.feature_defs() if d.field in ("plus", "wheels")]
+        scan = feature_scan.scan_features("PS2", "us", defs=defs, batch_size=4)
+        plus = {inv.ad_id(i) for i in expected if inv.matches(i, "Package", "1050")}
+        assert scan.ids_by_def[next(d for d in defs if d.field == "plus")] == plus
+
+
+def test_scheduler_absorbs_injected_throttling(monkeypatch):
+    config = FakeApiConfig(count=300, throttle_rate=0.3, retry_after=0)
+    with serve(config) as (url, api):
+        monkeypatch.setattr(scraper, "API_URL", url)
+        throttle = HostThrottle(rate=1000, burst=50, max_concurrency=4)
+        results = run_matrix(
+            [ScrapeJob("PS2", "us"), ScrapeJob("PS4", "us")], page_limit=50, throttle=throttle
+        )
+
+    assert all(r.stats.error is None for r in results)
+    assert sum(r.stats.throttled for r in results) == api.stats.throttled > 0
+    assert results[1].vehicles[0]["model"] == "Polestar 4"
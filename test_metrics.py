@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from jobs import metrics
+
+
+def test_instrumented_handler_emits_one_emf_record(capsys):
+    @metrics.instrumented("demo")
+    def handler(event=None, context=None):
+        run = metrics.current()
+        with run.span("load"):
+            pass
+        with run.span("load"):
+            pass
+        run.count("rows", 3)
+        return {"ok": True}
+
+    out = handler({})
+
+    record = json.loads(capsys.readouterr().out.strip())
+    assert set(out["timings_ms"]) == {"load", "total"}
+    assert record["Job"] == "demo" and record["rows"] == 3
+    assert record["load_ms"] == out["timings_ms"]["load"]
+    (directive,) = record["_aws"]["CloudWatchMetrics"]
+    assert directive["Dimensions"] == [["Job"]]
+    assert {"Name": "total_ms", "Unit": "Milliseconds"} in directive["Metrics"]
+    assert {"Name": "rows", "Unit": "Count"} in directive["Metrics"]
+
+
+def test_failed_run_still_emits(capsys):
+    @metrics.instrumented("demo")
+    def handler(event=None, context=None):
+        with metrics.current().span("upsert"):
+            raise ValueError("db down")
+
+    with pytest.raises(ValueError):
+        handler()
+
+    record = json.loads(capsys.readouterr().out.strip())
+    assert record["Error"] == "ValueError" and record["errors"] == 1
+    assert "upsert_ms" in record
@@ -0,0 +1,76 @@
+import requests
+
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession
+from scraper.pager import AdaptivePager, pager_key
+
+
+def test_pager_grows_shrinks_and_backs_off():
+    pager = AdaptivePager(initial=100, minimum=10, maximum=400, target_seconds=1.0, max_bytes=10**6)
+    key = pager_key("PS2", "us")
+
+    assert pager.observe(key, 100, 0.2, 1000) == 150  # fast and small: grow
+    assert pager.observe(key, 150, 3.0, 1000) == 50  # 3x over target: shrink
+    assert pager.observe(key, 100, 0.2, 4 * 10**6) == 25  # 4x over byte budget
+    assert pager.observe(key, 100, 0.7, 1000, retries=2) == 50  # retried: halve
+    assert pager.on_failure(key, 20) == 10  # clamped to minimum
+    assert pager.observe(pager_key("PS2", "ca"), 400, 0.1, 10) == 400  # clamped to maximum
+
+    restored = AdaptivePager.from_dict(pager.to_dict(), minimum=10, maximum=400)
+    assert restored.start(key) == pager.sizes[key]
+    assert restored.start(pager_key("PS4", "us"), 300) == 300
+
+
+def test_only_a_failed_probe_caps_growth():
+    pager = AdaptivePager(initial=100, minimum=10, maximum=400, target_seconds=1.0, max_bytes=10**6)
+    key = pager_key("PS2", "us")
+
+    assert pager.observe(key, 100, 0.2, 1000) == 150
+    assert pager.on_failure(key, 100) == 50  # 100 already worked: transient
+    assert pager.observe(key, 100, 0.2, 1000) == 150
+    assert pager.on_failure(key, 150) == 75  # probe above what worked
+    assert pager.observe(key, 100, 0.2, 1000) == 149
+
+
+class FlakySession(FakeSession):
+    """Times out whenever more than 100 ads are requested."""
+
+    def __init__(self):
+        super().__init__()
+        self.limits = []
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        self.limits.append(json["variables"]["limit"])
+        if json["variables"]["limit"] > 100:
+            raise requests.Timeout("too big")
+        return super().post(url, json=json, timeout=timeout)
+
+
+def test_adaptive_walk_recovers_from_timeouts(monkeypatch):
+    sess = FlakySession()
+    opened = []
+    monkeypatch.setattr(scraper, "_session", lambda **kw: opened.append(kw) or sess)
+    pager = AdaptivePager(initial=400, minimum=10, maximum=400, target_seconds=60)
+
+    cars = list(scraper.iter_vehicles(models=["PS2"], market="us", page_limit=400, pager=pager))
+
+    # timeouts reach the pager instead of being re-sent at the same limit by urllib3
+    assert opened == [{"pool_size": 1, "read_retries": 0}]
+
+    assert [v["id"] for v in cars] == [f"ad-{i:04d}" for i in range(TOTAL)]
+    assert sess.limits[:3] == [400, 200, 100]
+    assert pager.sizes[pager_key("PS2", "us")] <= 100
+    # never grows back to a size that already failed
+    smallest_failed = 401
+    for limit in sess.limits:
+        assert limit < smallest_failed
+        if limit > 100:
+            smallest_failed = limit
+    assert pager.summary()[pager_key("PS2", "us")]["failures"] == sum(
+        1 for limit in sess.limits if limit > 100
+    )
+
+
+def test_read_retries_reach_the_urllib3_retry():
+    assert scraper._session(read_retries=0).get_adapter("https://x").max_retries.read == 0
+    assert scraper._session().get_adapter("https://x").max_retries.read is None
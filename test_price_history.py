@@ -0,0 +1,33 @@
+from decimal import Decimal
+
+from jobs.daily_refresh import UPSERT_VEHICLE_BULK, _split_changes
+
+
+def _row(vid, inserted, old, new):
+    return {"id": vid, "inserted": inserted, "old_price": old, "new_price": new}
+
+
+def test_split_changes_classifies_upsert_rows():
+    rows = [
+        _row("new", True, None, Decimal("30000.00")),
+        _row("same", False, Decimal("31000.00"), Decimal("31000.00")),
+        _row("cut", False, Decimal("30000.00"), Decimal("29500.00")),
+        _row("unpriced", False, Decimal("28000.00"), None),
+        _row("first_price", False, None, Decimal("27000.00")),
+    ]
+
+    inserted_ids, changes = _split_changes(rows)
+
+    assert inserted_ids == ["new"]
+    assert changes == [
+        {"id": "cut", "old_price": Decimal("30000.00"), "new_price": "29500.00", "delta": -500.0},
+        {"id": "first_price", "old_price": None, "new_price": "27000.00", "delta": None},
+    ]
+
+
+def test_upsert_writes_history_in_the_same_statement():
+    sql = UPSERT_VEHICLE_BULK
+    assert sql.startswith("WITH upserted AS (") and sql.count("%s") == 1
+    assert "RETURNING id, retail_price, (xmax = 0) AS inserted" in sql
+    assert "INSERT INTO price_history" in sql
+    assert "old_price IS DISTINCT FROM new_price" in sql
@@ -0,0 +1,47 @@
+import os
+import pstats
+
+import pytest
+
+from jobs import profiling
+
+
+@pytest.fixture
+def local_profiles(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_BUCKET", "")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE", "")
+    return tmp_path
+
+
+@profiling.profiled("demo")
+def _handler(event=None, context=None):
+    if isinstance(event, dict) and event.get("fail"):
+        raise RuntimeError("boom")
+    return {"ok": True, "total": sum(len(str(i)) for i in range(20_000))}
+
+
+def test_disabled_by_default(local_profiles):
+    assert _handler({}) == {"ok": True, "total": 88890}
+    assert list(local_profiles.iterdir()) == []
+
+
+def test_cpu_profile_from_event(local_profiles):
+    out = _handler({"profile": "cpu"})
+
+    location = out["profile"]["location"]
+    assert out["profile"]["kind"] == "cpu" and location.startswith(str(local_profiles))
+    stats = pstats.Stats(location + ".prof")
+    assert any(func[2] == "_handler" for func in stats.stats)
+    assert "cumulative" in open(location + ".txt").read()
+
+
+def test_mem_profile_from_env_written_on_failure(local_profiles, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE", "mem")
+    with pytest.raises(RuntimeError):
+        _handler({"fail": True})
+
+    (txt,) = [p for p in os.listdir(local_profiles) if p.endswith(".txt")]
+    assert txt.startswith("demo-mem-")
+    assert "peak traced memory" in (local_profiles / txt).read_text()
+    assert _handler({"profile": "off"}) == {"ok": True, "total": 88890}
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession, strip_dates
+from scraper import replay
+
+
+@pytest.fixture
+def network(monkeypatch):
+    """Stand-in for the wire: answers via FakeSession and counts round trips."""
+    fake = FakeSession()
+    calls = []
+
+    def send(self, request, **kw):
+        calls.append(request)
+        resp = Response()
+        resp.status_code = 200
+        resp._content = fake.post(request.url, json=json.loads(request.body)).content
+        resp.headers["Content-Type"] = "application/json"
+        resp.request = request
+        return resp
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    return calls
+
+
+def test_record_then_replay_without_network(monkeypatch, tmp_path, network):
+    monkeypatch.setattr(replay, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(replay, "MODE", "record")
+    recorded = scraper.fetch_raw(models=["PS2"], market="us", page_limit=200)
+    assert len(network) == 3 and len(recorded) == TOTAL
+
+    monkeypatch.setattr(replay, "MODE", "replay")
+    replayed = scraper.fetch_raw(models=["PS2"], market="us", page_limit=200)
+    assert len(network) == 3
+    assert strip_dates(replayed) == strip_dates(recorded)
+
+    with pytest.raises(replay.ReplayMiss):
+        scraper.fetch_raw(models=["PS2"], market="us", page_limit=100)
+
+
+def test_cache_mode_honours_ttl(tmp_path, network):
+    adapter = replay.ReplayAdapter(mode="cache", store=replay.ResponseStore(str(tmp_path)), ttl=60)
+    sess = scraper._session()
+    sess.mount("https://", adapter)
+    payload = scraper._payload("PS2", "us", 0, 10)
+
+    first = sess.post(scraper.API_URL, json=payload).json()
+    second = sess.post(scraper.API_URL, json=dict(reversed(payload.items()))).json()
+    assert first == second and len(network) == 1 and adapter.hits == 1
+
+    adapter.ttl = -1
+    sess.post(scraper.API_URL, json=payload)
+    assert len(network) == 2
@@ -0,0 +1,64 @@
+import scraper.scheduler as scheduler
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeResp, FakeSession
+
+
+class ThrottlingSession(FakeSession):
+    """Answers the first request of every 'ca' page with a 429."""
+
+    def __init__(self):
+        super().__init__()
+        self.seen = set()
+
+    def post(self, url, json=None, timeout=0):  # noqa: A002
+        vars_ = json["variables"]
+        key = (vars_["market"], vars_["offset"])
+        if vars_["market"] == "ca" and key not in self.seen:
+            self.seen.add(key)
+            resp = FakeResp({})
+            resp.status_code = 429
+            resp.headers = {"Retry-After": "0"}
+            return resp
+        return super().post(url, json=json, timeout=timeout)
+
+
+def test_run_matrix_reports_per_job_throttling(monkeypatch):
+    sess = ThrottlingSession()
+    monkeypatch.setattr(scraper, "_session", lambda **kw: sess)
+    throttle = scheduler.HostThrottle(rate=1000, burst=100, max_concurrency=4)
+
+    jobs = scheduler.build_matrix(["PS2"], ["us", "ca"])
+    results = scheduler.run_matrix(jobs, page_limit=200, throttle=throttle)
+
+    by_market = {r.job.market: r.stats for r in results}
+    assert [r.job for r in results] == jobs
+    assert by_market["us"].throttled == 0 and by_market["us"].vehicles == TOTAL
+    assert by_market["ca"].throttled == 3 and by_market["ca"].vehicles == TOTAL
+    assert by_market["ca"].requests == 6 and by_market["ca"].error is None
+    assert throttle.window.limit < 4
+
+
+def test_parse_retry_after():
+    assert scheduler.parse_retry_after("3") == 3.0
+    assert scheduler.parse_retry_after(None) is None
+    assert scheduler.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470) == 10.0
+
+
+def test_aimd_halves_on_throttle_and_grows_back():
+    lim = scheduler.AimdLimiter(initial=8, maximum=8)
+    lim.on_throttle()
+    assert lim.limit == 4
+    for _ in range(4):
+        lim.on_success()
+    assert 4 < lim.limit <= 5
+
+
+def test_host_throttle_shares_one_bucket_per_host(monkeypatch):
+    monkeypatch.setattr(scheduler, "_HOST_THROTTLES", {})
+
+    a = scheduler.host_throttle("https://api.example/graphql", rate=5.0, burst=2)
+    b = scheduler.host_throttle("https://api.example/other", rate=10.0, burst=4, max_concurrency=3)
+    assert b is a
+    assert a.bucket.rate == 10.0 and a.bucket.capacity == 4
+    assert a.window.maximum == 3 and a.window.limit <= 3
+    assert scheduler.host_throttle("https://other.example/", rate=5.0, burst=2) is not a
@@ -0,0 +1,129 @@
+import io
+import json
+
+import jobs.scrape_to_s3 as scrape_to_s3
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession, strip_dates
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def upload_fileobj(self, fh, bucket, key, ExtraArgs=None):
+        self.objects[key] = fh.read()
+
+    def copy_object(self, Bucket, Key, CopySource, **kw):
+        self.objects[Key] = self.objects[CopySource["Key"]]
+
+    def put_object(self, Bucket, Key, Body, **kw):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise KeyError(Key)
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+
+def test_handler_streams_snapshot(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+
+    out = scrape_to_s3.handler({"skip_deep_scan": True})
+
+    assert out["ok"] and out["vehicles"] == TOTAL
+    snapshot = json.loads(fake.objects[out["snapshot_key"]])
+    assert [v["id"] for v in snapshot["vehicles"]] == [f"ad-{i:04d}" for i in range(TOTAL)]
+    assert fake.objects[out["latest_key"]] == fake.objects[out["snapshot_key"]]
+    assert {"scrape", "upload", "copy_latest", "total"} <= set(out["timings_ms"])
+
+
+def test_second_run_reuses_unchanged_records(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    monkeypatch.setattr(scrape_to_s3, "REUSE_UNCHANGED", True)
+
+    first = scrape_to_s3.handler({"skip_deep_scan": True})
+    assert first["changed"] == TOTAL and first["unchanged"] == 0
+    first_rows = json.loads(fake.objects[first["snapshot_key"]])["vehicles"]
+
+    built = []
+    original = scraper._build_vehicle
+    monkeypatch.setattr(
+        scraper, "_build_vehicle", lambda ad, *a, **kw: built.append(ad) or original(ad, *a, **kw)
+    )
+    second = scrape_to_s3.handler({"skip_deep_scan": True})
+
+    assert second["unchanged"] == TOTAL and second["reused"] == TOTAL
+    assert built == []
+    second_rows = json.loads(fake.objects[second["snapshot_key"]])["vehicles"]
+    assert strip_dates(second_rows) == strip_dates(first_rows)
+
+
+def test_reused_record_drops_previous_run_features(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    monkeypatch.setattr(scrape_to_s3, "REUSE_UNCHANGED", True)
+
+    first = scrape_to_s3.handler({"skip_deep_scan": True})
+    first_rows = json.loads(fake.objects[first["snapshot_key"]])["vehicles"]
+    # The previous run's deep scan tagged ad-0000; this run's scan does not.
+    snapshot = json.loads(fake.objects[scrape_to_s3.RAW_KEY])
+    stale = next(v for v in snapshot["vehicles"] if v["id"] == "ad-0000")
+    stale.update(pilot=True, wheels='22" Stale Wheels')
+    fake.objects[scrape_to_s3.RAW_KEY] = json.dumps(snapshot).encode()
+
+    second = scrape_to_s3.handler({"skip_deep_scan": True})
+
+    assert second["reused"] == TOTAL
+    second_rows = json.loads(fake.objects[second["snapshot_key"]])["vehicles"]
+    reused = next(v for v in second_rows if v["id"] == "ad-0000")
+    assert reused.get("pilot") is None and reused.get("wheels") is None
+    assert strip_dates(second_rows) == strip_dates(first_rows)
+
+
+def test_skipped_scan_applies_stored_feature_model(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    rules = [
+        {
+            "token": "R60000",
+            "field": "wheels",
+            "value": '20" Wheels',
+            "support": 9,
+            "confidence": 1.0,
+        },
+        {"token": "LR01", "field": "plus", "value": True, "support": 9, "confidence": 0.5},
+    ]
+    fake.objects[scrape_to_s3.FEATURE_MODEL_KEY] = json.dumps({"rules": rules}).encode()
+
+    out = scrape_to_s3.handler({"skip_deep_scan": True})
+
+    rows = json.loads(fake.objects[out["snapshot_key"]])["vehicles"]
+    assert all(v["wheels"] == '20" Wheels' for v in rows)
+    assert not any(v.get("plus") for v in rows)  # below INFERENCE_MIN_CONFIDENCE
+
+
+def test_partly_failed_scan_does_not_train_feature_model(monkeypatch):
+    from scraper import feature_scan
+    from test_feature_scan_engine import FailingSession, FilterSession
+
+    fake = FakeS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    tokens = {vid: ["R184" if vid.startswith("w") else "X"] for vid in ("w0", "w1", "w2", "x1")}
+
+    # R184 breaks after its first page: w2..w4 would become negatives for its wheel
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FailingSession())
+    scan = feature_scan.scan_features("PS2", "us", workers=2, page_workers=1, page_limit=2)
+    assert [d.code for d in scan.failed] == ["R184"]
+    scrape_to_s3._save_feature_model(tokens, scan)
+    assert scrape_to_s3.FEATURE_MODEL_KEY not in fake.objects
+
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FilterSession())
+    scan = feature_scan.scan_features("PS2", "us", workers=2, page_workers=1, page_limit=2)
+    scrape_to_s3._save_feature_model(tokens, scan)
+    assert scrape_to_s3.FEATURE_MODEL_KEY in fake.objects
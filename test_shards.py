@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+import jobs.scrape_to_s3 as scrape_to_s3
+import scraper.scraper as scraper
+from fakes import TOTAL, FakeSession
+from scraper import shards
+from test_scrape_to_s3 import FakeS3
+
+
+class ListingS3(FakeS3):
+    def list_objects_v2(self, Bucket, Prefix, **kw):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        return {"Contents": [{"Key": k} for k in keys], "IsTruncated": False}
+
+
+def test_shard_spec_from_event():
+    spec = shards.ShardSpec.from_event({"index": 2, "models": ["PS2"], "offsets": [200, None]})
+    assert spec.offset_range == (200, None) and spec.models == ("PS2",)
+    assert shards.ShardSpec.from_event({"index": 0}).offset_range is None
+    with pytest.raises(ValueError):
+        shards.ShardSpec.from_event({"index": 1, "offsets": [400, 200]})
+
+
+def test_offset_range_limits_each_model(monkeypatch):
+    sess = FakeSession()
+    monkeypatch.setattr(scraper, "_session", lambda **kw: sess)
+
+    cars = list(scraper.iter_vehicles(models=["PS2"], market="us", offset_range=(100, 350)))
+
+    assert [v["id"] for v in cars] == [f"ad-{i:04d}" for i in range(100, 350)]
+    assert sess.offsets == [100, 300]
+
+
+def test_shards_merge_into_latest(monkeypatch):
+    fake = ListingS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    run = "20261016-060000"
+
+    # overlapping ranges: ads 200..249 are scraped by both shards
+    for index, offsets in enumerate([[0, 250], [200, None]]):
+        event = {"skip_deep_scan": True, "run": run, "shard": {"index": index, "offsets": offsets}}
+        out = scrape_to_s3.handler(event)
+        assert out["snapshot_key"] == shards.shard_key(run, index)
+    assert scrape_to_s3.RAW_KEY not in fake.objects
+
+    assert scrape_to_s3.handler({"merge_run": run, "shards": 3})["ok"] is False
+    merged = scrape_to_s3.handler({"merge_run": run, "shards": 2})
+
+    assert merged["ok"] and merged["vehicles"] == TOTAL and merged["shards"] == [0, 1]
+    rows = json.loads(fake.objects[scrape_to_s3.RAW_KEY])["vehicles"]
+    assert [v["id"] for v in rows] == [f"ad-{i:04d}" for i in range(TOTAL)]
+    prints = json.loads(fake.objects[scrape_to_s3.FINGERPRINT_KEY])["fingerprints"]
+    assert len(prints) == TOTAL
+
+
+def test_shards_share_one_deep_scan(monkeypatch):
+    from test_feature_scan_engine import FilterSession
+
+    fake = ListingS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    run = "20261016-070000"
+    shard = {"run": run, "shard": {"index": 0, "offsets": [0, 250]}}
+
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    with pytest.raises(ValueError, match="scan_run"):
+        scrape_to_s3.handler(shard)
+
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FilterSession())
+    out = scrape_to_s3.handler({"scan_run": run})
+    assert out["ok"] and out["failed"] == [] and out["wheels"] == 6
+    assert shards.scan_key(run) in fake.objects
+
+    sess = FakeSession()
+    monkeypatch.setattr(scraper, "_session", lambda **kw: sess)
+    assert scrape_to_s3.handler(shard)["vehicles"] == 250
+    assert sess.offsets == [0, 200]  # listing pages only: no filter queries from the shard
+
+
+def test_merge_step_saves_run_wide_state(monkeypatch):
+    from test_feature_scan_engine import FilterSession
+
+    fake = ListingS3()
+    monkeypatch.setattr(scrape_to_s3, "s3", fake)
+    monkeypatch.setattr(scrape_to_s3, "ADAPTIVE_PAGING", True)
+    run = "20261016-080000"
+
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FilterSession())
+    scrape_to_s3.handler({"scan_run": run})
+    monkeypatch.setattr(scraper, "_session", lambda **kw: FakeSession())
+    for index, offsets in enumerate([[0, 250], [250, None]]):
+        scrape_to_s3.handler({"run": run, "shard": {"index": index, "offsets": offsets}})
+        assert shards.pages_key(run, index) in fake.objects
+    # shards leave run-wide state alone
+    assert scrape_to_s3.PAGE_SIZES_KEY not in fake.objects
+    assert scrape_to_s3.FEATURE_MODEL_KEY not in fake.objects
+
+    assert scrape_to_s3.handler({"merge_run": run, "shards": 2})["ok"]
+
+    assert scrape_to_s3.FEATURE_MODEL_KEY in fake.objects
+    sizes = json.loads(fake.objects[scrape_to_s3.PAGE_SIZES_KEY])["sizes"]
+    assert sizes and all(isinstance(v, int) for v in sizes.values())
+
+
+def test_merge_page_sizes_keeps_smallest_per_key():
+    states = [{"sizes": {"a": 200, "b": 100}}, None, {"sizes": {"a": 150, "c": 50}}]
+    assert shards.merge_page_sizes(states) == {"a": 150, "b": 100, "c": 50}
@@ -0,0 +1,29 @@
+import scraper.scraper as scraper
+from fakes import make_ad
+from scraper.code_parser import default_code_to_label
+from scraper.vehicle import Vehicle
+
+
+def test_round_trip_is_lossless_and_interns_categoricals():
+    records = [scraper._build_vehicle(make_ad(i), "PS2", default_code_to_label()) for i in range(3)]
+    records[0]["plus"] = True
+    records[1]["custom"] = {"kept": 1}
+
+    vehicles = [Vehicle.from_dict(r) for r in records]
+
+    assert [v.to_dict() for v in vehicles] == records
+    a, b = (Vehicle.from_dict(dict(r)) for r in records[:2])
+    assert a.partner_location is b.partner_location
+    assert a.raw_option_codes[0] is b.raw_option_codes[0]
+    assert not hasattr(a, "__dict__")
+
+
+def test_db_params_fill_optional_columns():
+    v = Vehicle.from_dict({"id": 7, "stock_images": "a.png, b.png", "pilot": True})
+
+    params = v.to_db_params()
+
+    assert params["id"] == "7"
+    assert params["stock_images"] == ["a.png", "b.png"]
+    assert (params["performance"], params["pilot"], params["plus"]) == (False, True, False)
+    assert params["wheels"] is None and params["exterior"] is None